@@ -0,0 +1 @@
+"""Offline benchmarks of Drift Python Client against in-process fake servers"""
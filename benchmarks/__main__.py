@@ -0,0 +1,95 @@
+"""Run benchmarks against fake servers of a Drift device on localhost
+
+Usage:
+    python -m benchmarks [--packages N] [--signal-size N] [--json results.json]
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+
+from benchmarks.data import make_topics
+from benchmarks.scenarios import SCENARIOS, Options, Result, run
+from benchmarks.servers import FakeDevice
+
+_COLUMNS = ("scenario", "packages", "packages/s", "MB/s", "p50 ms", "p99 ms", "RSS MB")
+
+
+def _format(result: Result) -> tuple:
+    return (
+        result.name,
+        str(result.packages),
+        f"{result.packages_per_second:.1f}",
+        f"{result.mb_per_second:.2f}" if result.bytes else "-",
+        f"{result.p50 * 1000:.3f}",
+        f"{result.p99 * 1000:.3f}",
+        f"{result.peak_rss / 1e6:.1f}" if result.peak_rss is not None else "-",
+    )
+
+
+def _print_table(rows: list):
+    widths = [max(len(row[idx]) for row in rows) for idx in range(len(_COLUMNS))]
+    for row in rows:
+        print("  ".join(cell.rjust(width) for cell, width in zip(row, widths)))
+
+
+def main() -> int:
+    """Entry point"""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__)
+    parser.add_argument("--packages", type=int, default=1000, help="packages per topic")
+    parser.add_argument(
+        "--signal-size", type=int, default=4096, help="samples in a signal"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="requests in metrics scenarios"
+    )
+    parser.add_argument(
+        "--scenarios",
+        default=",".join(SCENARIOS),
+        help=f"comma separated scenarios, default: {','.join(SCENARIOS)}",
+    )
+    parser.add_argument("--json", help="file to write results to")
+    args = parser.parse_args()
+
+    names = args.scenarios.split(",")
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    logging.basicConfig(level=logging.ERROR)
+    topics = make_topics(args.packages, args.signal_size)
+    options = Options(
+        start=topics["signal"].start,
+        stop=topics["signal"].stop,
+        packages=args.packages,
+        repeat=args.repeat,
+    )
+
+    results = []
+    with FakeDevice(topics) as device, FakeDevice(topics, reduct=False) as minio:
+        devices = {"reduct": device, "minio": minio}
+        for name in names:
+            _, storage = SCENARIOS[name]
+            results.append(run(name, devices[storage], options, topics["signal"]))
+
+    _print_table([_COLUMNS] + [_format(result) for result in results])
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "time": time.time(),
+                    "packages": args.packages,
+                    "signal_size": args.signal_size,
+                    "results": [result.summary() for result in results],
+                },
+                file,
+                indent=2,
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
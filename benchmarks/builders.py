@@ -0,0 +1,77 @@
+"""Builders of serialized Drift packages for tests and benchmarks"""
+
+from typing import Dict
+
+# pylint: disable=no-member
+import numpy as np
+from drift_bytes import OutputBuffer, Variant
+from drift_protocol.common import DataPayload, DriftPackage, StatusCode
+from drift_protocol.meta import MetaInfo, TypedDataInfo
+from google.protobuf.any_pb2 import Any  # pylint: disable=no-name-in-module
+from wavelet_buffer import (  # pylint: disable=no-name-in-module
+    WaveletBuffer,
+    WaveletType,
+    denoise,
+)
+
+
+def make_package(
+    package_id: int = 0, timestamp: int = 0, status: int = StatusCode.GOOD
+) -> DriftPackage:
+    """Package without payload
+
+    Args:
+        package_id: ID of the package
+        timestamp: Source timestamp in milliseconds
+        status: Status of the package
+    """
+    pkg = DriftPackage()
+    pkg.id = package_id
+    pkg.status = status
+    pkg.source_timestamp.FromMilliseconds(timestamp)
+    return pkg
+
+
+def add_payload(pkg: DriftPackage, data: bytes) -> bytes:
+    """Append data payload to package and serialize it"""
+    payload = DataPayload()
+    payload.data = data
+    any_msg = Any()
+    any_msg.Pack(payload)
+    pkg.data.append(any_msg)
+    return pkg.SerializeToString()
+
+
+def add_typed_data(pkg: DriftPackage, values: Dict) -> bytes:
+    """Append values as typed data payload to package and serialize it"""
+    buffer = OutputBuffer()
+    for value in values.values():
+        buffer.push(Variant(value))
+
+    pkg.meta.type = MetaInfo.TYPED_DATA
+    pkg.meta.typed_data_info.items.extend(
+        TypedDataInfo.Item(name=name, status=StatusCode.GOOD) for name in values
+    )
+    return add_payload(pkg, buffer.bytes())
+
+
+def serialize_signal(
+    signal: np.ndarray, steps: int = 0, wavelet_type: int = WaveletType.NONE
+) -> bytes:
+    """Signal decomposed into serialized WaveletBuffer"""
+    buffer = WaveletBuffer(signal.shape, 1, steps, wavelet_type)
+    buffer.decompose(signal, denoise.Null())
+    return buffer.serialize()
+
+
+def make_signal_blob(
+    signal: np.ndarray, timestamp: int = 0, package_id: int = 0
+) -> bytes:
+    """Serialized package with signal in WaveletBuffer
+
+    Args:
+        signal: Signal
+        timestamp: Source timestamp in milliseconds
+        package_id: ID of the package
+    """
+    return add_payload(make_package(package_id, timestamp), serialize_signal(signal))
@@ -0,0 +1,117 @@
+"""Synthetic Drift packages and metrics for the fake servers"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+import numpy as np
+from wavelet_buffer import WaveletType  # pylint: disable=no-name-in-module
+
+from benchmarks.builders import (
+    add_payload,
+    add_typed_data,
+    make_package,
+    serialize_signal,
+)
+
+START = 1_700_000_000  # seconds since UNIX epoch
+INTERVAL_MS = 100
+
+
+@dataclass
+class Topic:
+    """Packages of a topic ordered by timestamp and their metrics"""
+
+    name: str
+    timestamps: List[int] = field(default_factory=list)  # milliseconds
+    blobs: List[bytes] = field(default_factory=list)
+    metrics: Dict[str, np.ndarray] = field(default_factory=dict)
+
+    @property
+    def start(self) -> float:
+        """Timestamp of the first package in seconds"""
+        return self.timestamps[0] / 1000
+
+    @property
+    def stop(self) -> float:
+        """Timestamp after the last package in seconds"""
+        return self.timestamps[-1] / 1000 + 1
+
+    @property
+    def size(self) -> int:
+        """Size of all packages in bytes"""
+        return sum(len(blob) for blob in self.blobs)
+
+
+def make_wavelet_package(package_id: int, timestamp: int, signal: np.ndarray) -> bytes:
+    """Serialize package with a signal in WaveletBuffer
+
+    Args:
+        package_id: ID of the package
+        timestamp: Source timestamp in milliseconds
+        signal: 1D signal
+    Returns:
+        Serialized package
+    """
+    pkg = make_package(package_id, timestamp)
+    pkg.publish_timestamp.FromMilliseconds(timestamp)
+    pkg.meta.type = pkg.meta.TIME_SERIES
+    return add_payload(pkg, serialize_signal(signal, 3, WaveletType.DB3))
+
+
+def make_typed_data_package(package_id: int, timestamp: int, values: Dict) -> bytes:
+    """Serialize package with typed data
+
+    Args:
+        package_id: ID of the package
+        timestamp: Source timestamp in milliseconds
+        values: Names and values of the items
+    Returns:
+        Serialized package
+    """
+    pkg = make_package(package_id, timestamp)
+    pkg.publish_timestamp.FromMilliseconds(timestamp)
+    return add_typed_data(pkg, values)
+
+
+def make_topics(packages: int, signal_size: int, seed: int = 0) -> Dict[str, Topic]:
+    """Generate a topic with wavelet packages and a topic with typed data
+
+    Args:
+        packages: Number of packages in each topic
+        signal_size: Number of samples in a wavelet package
+        seed: Seed of random generator
+    Returns:
+        Topics by name
+    """
+    rng = np.random.default_rng(seed)
+    timestamps = [START * 1000 + idx * INTERVAL_MS for idx in range(packages)]
+    signals = Topic("signal", timestamps=list(timestamps))
+    typed = Topic("typed", timestamps=list(timestamps))
+
+    phase = np.linspace(0, 2 * np.pi, signal_size, dtype=np.float32)
+    metrics: Dict[str, Dict[str, list]] = {signals.name: {}, typed.name: {}}
+    for idx, timestamp in enumerate(timestamps):
+        signal = np.sin(phase * (1 + idx % 10)) + rng.normal(
+            0, 0.1, signal_size
+        ).astype(np.float32)
+        signals.blobs.append(make_wavelet_package(idx, timestamp, signal))
+        typed.blobs.append(
+            make_typed_data_package(
+                idx,
+                timestamp,
+                {"count": idx, "value": float(signal[0]), "ok": True, "unit": "mm/s"},
+            )
+        )
+
+        for topic, values in ((signals, signal), (typed, signal[:4])):
+            metrics[topic.name].setdefault("mean", []).append(float(np.mean(values)))
+            metrics[topic.name].setdefault("rms", []).append(
+                float(np.sqrt(np.mean(values**2)))
+            )
+
+    for topic in (signals, typed):
+        topic.metrics = {
+            name: np.array(values) for name, values in metrics[topic.name].items()
+        }
+        topic.metrics["status"] = np.zeros(packages, dtype=np.int64)
+    return {topic.name: topic for topic in (signals, typed)}
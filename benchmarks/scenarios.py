@@ -0,0 +1,258 @@
+"""Benchmark scenarios, each of them runs in a fresh process
+to measure its peak memory"""
+
+import logging
+import multiprocessing
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from drift_client import DriftClient, DriftDataPackage
+from benchmarks.data import Topic
+from benchmarks.servers import FakeDevice
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+@dataclass
+class Result:
+    """Measurements of a scenario"""
+
+    name: str
+    packages: int
+    bytes: int
+    seconds: float
+    peak_rss: Optional[int]
+    latencies: List[float] = field(default_factory=list, repr=False)
+
+    @property
+    def packages_per_second(self) -> float:
+        """Handled packages (or rows) per second"""
+        return self.packages / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        """Transferred megabytes per second"""
+        return self.bytes / self.seconds / 1e6 if self.seconds > 0 else 0.0
+
+    @property
+    def p50(self) -> float:
+        """Median latency in seconds"""
+        return float(np.percentile(self.latencies, 50)) if self.latencies else 0.0
+
+    @property
+    def p99(self) -> float:
+        """99th percentile of latency in seconds"""
+        return float(np.percentile(self.latencies, 99)) if self.latencies else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        """Measurements without raw latencies"""
+        result = asdict(self)
+        del result["latencies"]
+        result.update(
+            packages_per_second=self.packages_per_second,
+            mb_per_second=self.mb_per_second,
+            p50=self.p50,
+            p99=self.p99,
+        )
+        return result
+
+
+@dataclass
+class Options:
+    """Parameters of scenarios"""
+
+    start: float
+    stop: float
+    packages: int
+    repeat: int = 5
+    timeout: float = 60.0
+
+
+def _walk(client: DriftClient, topic: str, options: Options, decode: Callable):
+    latencies = []
+    size = 0
+    started = time.perf_counter()
+    last = started
+    for pkg in client.walk(topic, options.start, options.stop):
+        decode(pkg)
+        size += len(pkg.blob)
+        now = time.perf_counter()
+        latencies.append(now - last)
+        last = now
+    return len(latencies), size, last - started, latencies
+
+
+def walk(client: DriftClient, options: Options, _ready):
+    """Walk through packages with signals and decode them to numpy,
+    latency is time to get the next package"""
+    return _walk(client, "signal", options, DriftDataPackage.as_np)
+
+
+def walk_typed(client: DriftClient, options: Options, _ready):
+    """Walk through packages with typed data and decode them,
+    latency is time to get the next package"""
+    return _walk(client, "typed", options, DriftDataPackage.as_typed_data)
+
+
+def get_items(client: DriftClient, options: Options, _ready):
+    """Get names of packages with signals, fetch them concurrently and
+    decode them to numpy, latency is time to get the next package"""
+    latencies = []
+    size = 0
+    started = time.perf_counter()
+    names = client.get_package_names("signal", options.start, options.stop)
+    last = time.perf_counter()
+    for pkg in client.get_items(names):
+        pkg.as_np()
+        size += len(pkg.blob)
+        now = time.perf_counter()
+        latencies.append(now - last)
+        last = now
+    return len(latencies), size, last - started, latencies
+
+
+def _get_metrics(client: DriftClient, options: Options, **kwargs):
+    latencies = []
+    rows = 0
+    for _ in range(options.repeat):
+        started = time.perf_counter()
+        metrics = client.get_metrics("signal", options.start, options.stop, **kwargs)
+        latencies.append(time.perf_counter() - started)
+        rows += len(metrics["time"]) if isinstance(metrics, dict) else len(metrics)
+    return rows, 0, sum(latencies), latencies
+
+
+def get_metrics(client: DriftClient, options: Options, _ready):
+    """Get metrics as rows, latency is time of a request"""
+    return _get_metrics(client, options)
+
+
+def get_metrics_columns(client: DriftClient, options: Options, _ready):
+    """Get metrics as columns, latency is time of a request"""
+    return _get_metrics(client, options, format="columns")
+
+
+def subscribe_data(client: DriftClient, options: Options, ready):
+    """Receive packages with signals published by the main process,
+    returns receive times by package ID to compute latency"""
+    received = {}
+    size = [0]
+
+    def handler(pkg: DriftDataPackage):
+        received[pkg.package_id] = time.perf_counter()
+        size[0] += len(pkg.blob)
+
+    dispatcher = client.subscribe_data("signal", handler, blocking=False)
+    ready.set()
+
+    deadline = time.perf_counter() + options.timeout
+    while len(received) < options.packages and time.perf_counter() < deadline:
+        time.sleep(0.001)
+    dispatcher.join()
+    return len(received), size[0], 0.0, received
+
+
+# name: (function, storage)
+SCENARIOS: Dict[str, Tuple[Callable, str]] = {
+    "walk": (walk, "reduct"),
+    "walk[typed]": (walk_typed, "reduct"),
+    "get_items": (get_items, "reduct"),
+    "get_items[minio]": (get_items, "minio"),
+    "get_metrics": (get_metrics, "reduct"),
+    "get_metrics[columns]": (get_metrics_columns, "reduct"),
+    "subscribe_data": (subscribe_data, "reduct"),
+}
+
+
+def _run_child(
+    name: str, ports: Dict[str, int], options: Options, ready, conn
+):  # pylint: disable=too-many-arguments
+    logging.basicConfig(level=logging.ERROR)
+    scenario, _ = SCENARIOS[name]
+    with DriftClient("127.0.0.1", "password", **ports) as client:
+        packages, size, seconds, latencies = scenario(client, options, ready)
+
+    peak_rss = None
+    if resource is not None:
+        # bytes on macOS, kilobytes on Linux and BSD
+        scale = 1 if sys.platform == "darwin" else 1024
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    conn.send((packages, size, seconds, latencies, peak_rss))
+    conn.close()
+
+
+def _publish(client: DriftClient, topic: Topic) -> Dict[int, float]:
+    sent = {}
+    for package_id, blob in enumerate(topic.blobs):
+        sent[package_id] = time.perf_counter()
+        client.publish_data("signal", blob)
+    return sent
+
+
+def run(  # pylint: disable=too-many-locals
+    name: str, device: FakeDevice, options: Options, topic: Optional[Topic] = None
+) -> Result:
+    """Run scenario in a new process
+
+    Args:
+        name: Name of the scenario
+        device: Fake servers for DriftClient
+        options: Parameters of the scenario
+        topic: Packages to publish for "subscribe_data"
+    Returns:
+        Measurements
+    Raises:
+        RuntimeError: if the scenario failed
+    """
+    context = multiprocessing.get_context("spawn")
+    ready = context.Event()
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    ports = device.ports
+    process = context.Process(
+        target=_run_child, args=(name, ports, options, ready, child_conn)
+    )
+    process.start()
+    child_conn.close()
+
+    sent = None
+    publisher = None
+    try:
+        if name == "subscribe_data":
+            if not ready.wait(options.timeout) or not device.wait_subscribed(
+                "signal", options.timeout
+            ):
+                raise RuntimeError(f"Scenario {name} isn't ready in time")
+            publisher = DriftClient("127.0.0.1", "password", **ports)
+            sent = _publish(publisher, topic)
+
+        packages, size, seconds, latencies, peak_rss = parent_conn.recv()
+    except EOFError as err:
+        raise RuntimeError(f"Scenario {name} failed") from err
+    finally:
+        if publisher is not None:
+            publisher.close()
+        process.join(options.timeout)
+        if process.is_alive():
+            process.kill()
+
+    if sent is not None:
+        received = latencies
+        latencies = [received[idx] - sent[idx] for idx in received]
+        if received:
+            seconds = max(received.values()) - min(sent.values())
+
+    return Result(
+        name=name,
+        packages=packages,
+        bytes=size,
+        seconds=seconds,
+        peak_rss=peak_rss,
+        latencies=latencies,
+    )
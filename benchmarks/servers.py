@@ -0,0 +1,483 @@
+"""In-process fake servers which speak enough of the ReductStore HTTP API,
+the InfluxDB query API, the S3 GET API and MQTT 3.1.1 to serve DriftClient"""
+
+import asyncio
+import itertools
+import re
+import socket
+import struct
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from aiohttp import web
+
+from drift_client.mqtt_client import TopicTree
+from benchmarks.data import Topic
+
+_BATCH_RECORDS = 64
+_BATCH_SIZE = 8_000_000
+
+_RANGE = re.compile(r"range\(start:\s*(-?\d+),\s*stop:\s*(-?\d+)\)")
+_MEASUREMENT = re.compile(r'r\._measurement == "([^"]*)"')
+_FIELD = re.compile(r'r\._field == "([^"]*)"')
+
+_DATATYPES = {"i": "long", "f": "double", "b": "boolean"}
+
+
+def _rfc3339(timestamps_ms: np.ndarray) -> List[str]:
+    return [f"{value}Z" for value in timestamps_ms.astype("datetime64[ms]").tolist()]
+
+
+def _reduct_error(status: int, message: str) -> web.Response:
+    return web.Response(status=status, headers={"x-reduct-error": message})
+
+
+class FakeReductStore:  # pylint: disable=too-few-public-methods
+    """ReductStore API v1.7 with a single bucket "data" and an entry per topic"""
+
+    def __init__(self, topics: Dict[str, Topic]):
+        self._entries = {
+            name: (np.array(topic.timestamps, dtype=np.int64) * 1000, topic.blobs)
+            for name, topic in topics.items()
+        }
+        self._queries: Dict[int, Tuple[str, int, int]] = {}
+        self._query_ids = itertools.count(1)
+
+    def app(self) -> web.Application:
+        """Application with routes of the API"""
+
+        @web.middleware
+        async def api_version(request, handler):
+            response = await handler(request)
+            response.headers["x-reduct-api"] = "1.7"
+            return response
+
+        app = web.Application(middlewares=[api_version])
+        app.router.add_get("/api/v1/info", self._info)
+        app.router.add_get("/api/v1/b/{bucket}", self._bucket)
+        app.router.add_get("/api/v1/b/{bucket}/{entry}/q", self._query)
+        app.router.add_route("*", "/api/v1/b/{bucket}/{entry}/batch", self._batch)
+        app.router.add_route("*", "/api/v1/b/{bucket}/{entry}", self._read)
+        return app
+
+    def _entry_info(self, name: str) -> dict:
+        times, blobs = self._entries[name]
+        return {
+            "name": name,
+            "size": sum(len(blob) for blob in blobs),
+            "block_count": 1,
+            "record_count": len(blobs),
+            "oldest_record": int(times[0]),
+            "latest_record": int(times[-1]),
+        }
+
+    async def _info(self, _request):
+        entries = [self._entry_info(name) for name in self._entries]
+        return web.json_response(
+            {
+                "version": "1.7.0",
+                "bucket_count": 1,
+                "usage": sum(entry["size"] for entry in entries),
+                "uptime": 1,
+                "oldest_record": min(entry["oldest_record"] for entry in entries),
+                "latest_record": max(entry["latest_record"] for entry in entries),
+                "defaults": {"bucket": {}},
+            }
+        )
+
+    async def _bucket(self, request):
+        if request.match_info["bucket"] != "data":
+            return _reduct_error(404, "Bucket not found")
+
+        entries = [self._entry_info(name) for name in self._entries]
+        return web.json_response(
+            {
+                "info": {
+                    "name": "data",
+                    "entry_count": len(entries),
+                    "size": sum(entry["size"] for entry in entries),
+                    "oldest_record": min(entry["oldest_record"] for entry in entries),
+                    "latest_record": max(entry["latest_record"] for entry in entries),
+                },
+                "settings": {},
+                "entries": entries,
+            }
+        )
+
+    async def _query(self, request):
+        entry = request.match_info["entry"]
+        if entry not in self._entries:
+            return _reduct_error(404, f"Entry '{entry}' not found")
+
+        times, _ = self._entries[entry]
+        start = np.searchsorted(times, int(request.query.get("start", times[0])))
+        stop = np.searchsorted(times, int(request.query.get("stop", times[-1] + 1)))
+        if start >= stop:
+            return _reduct_error(404, "No records for the time interval")
+
+        query_id = next(self._query_ids)
+        self._queries[query_id] = (entry, int(start), int(stop))
+        return web.json_response({"id": query_id})
+
+    async def _batch(self, request):
+        query_id = int(request.query["q"])
+        if query_id not in self._queries:
+            return _reduct_error(404, f"Query {query_id} not found")
+
+        entry, start, stop = self._queries[query_id]
+        if start >= stop:
+            del self._queries[query_id]
+            return web.Response(status=204)
+
+        times, blobs = self._entries[entry]
+        headers = {}
+        end = start
+        size = 0
+        while end < stop and end - start < _BATCH_RECORDS and size < _BATCH_SIZE:
+            headers[
+                f"x-reduct-time-{times[end]}"
+            ] = f"{len(blobs[end])},application/octet-stream"
+            size += len(blobs[end])
+            end += 1
+
+        self._queries[query_id] = (entry, end, stop)
+        headers["x-reduct-last"] = "true" if end == stop else "false"
+        if request.method == "HEAD":
+            return web.Response(headers=headers)
+        return web.Response(body=b"".join(blobs[start:end]), headers=headers)
+
+    async def _read(self, request):
+        entry = request.match_info["entry"]
+        if entry not in self._entries:
+            return _reduct_error(404, f"Entry '{entry}' not found")
+
+        times, blobs = self._entries[entry]
+        timestamp = int(request.query.get("ts", times[-1]))
+        idx = np.searchsorted(times, timestamp)
+        if idx == len(times) or times[idx] != timestamp:
+            return _reduct_error(404, f"No record with timestamp {timestamp}")
+
+        headers = {"x-reduct-time": str(timestamp), "x-reduct-last": "1"}
+        headers["content-type"] = "application/octet-stream"
+        return web.Response(body=blobs[idx], headers=headers)
+
+
+class FakeInfluxDB:  # pylint: disable=too-few-public-methods
+    """InfluxDB query API which returns annotated CSV for Flux queries of
+    DriftClient, aggregations are ignored"""
+
+    def __init__(self, topics: Dict[str, Topic]):
+        self._topics = topics
+        self._times = {
+            name: np.array(topic.timestamps, dtype=np.int64)
+            for name, topic in topics.items()
+        }
+
+    def app(self) -> web.Application:
+        """Application with the query route"""
+        app = web.Application()
+        app.router.add_post("/api/v2/query", self._query)
+        return app
+
+    async def _query(self, request):
+        query = (await request.json())["query"]
+        measurement = _MEASUREMENT.search(query)
+        time_range = _RANGE.search(query)
+        if measurement is None or time_range is None:
+            return web.json_response(
+                {"code": "invalid", "message": "unsupported query"}, status=400
+            )
+
+        topic = self._topics.get(measurement.group(1))
+        if topic is None:
+            return web.Response(text="", content_type="text/csv")
+
+        times = self._times[topic.name]
+        start, stop = np.searchsorted(
+            times, [int(time_range.group(1)) * 1000, int(time_range.group(2)) * 1000]
+        )
+        fields = _FIELD.findall(query) or list(topic.metrics)
+        fields = [field for field in fields if field in topic.metrics]
+        if "pivot(" in query:
+            body = self._pivoted(topic, fields, start, stop)
+        else:
+            body = self._tables(topic, fields, start, stop)
+        return web.Response(text=body, content_type="text/csv")
+
+    def _tables(self, topic: Topic, fields: List[str], start: int, stop: int) -> str:
+        times = _rfc3339(self._times[topic.name][start:stop])
+        tables = []
+        for table, field in enumerate(fields):
+            values = topic.metrics[field][start:stop]
+            lines = [
+                f"#datatype,string,long,dateTime:RFC3339,"
+                f"{_DATATYPES[values.dtype.kind]},string,string",
+                "#group,false,false,false,false,true,true",
+                ",result,table,_time,_value,_field,_measurement",
+            ]
+            lines.extend(
+                f",_result,{table},{dt},{value},{field},{topic.name}"
+                for dt, value in zip(times, values.tolist())
+            )
+            tables.append("\n".join(lines) + "\n")
+        return "\n".join(tables)
+
+    def _pivoted(self, topic: Topic, fields: List[str], start: int, stop: int) -> str:
+        times = _rfc3339(self._times[topic.name][start:stop])
+        columns = [topic.metrics[field][start:stop] for field in fields]
+        datatypes = ",".join(_DATATYPES[values.dtype.kind] for values in columns)
+        lines = [
+            f"#datatype,string,long,dateTime:RFC3339,string,{datatypes}",
+            "#group,false,false,false,true" + ",false" * len(fields),
+            ",result,table,_time,_measurement," + ",".join(fields),
+        ]
+        rows = zip(times, *(values.tolist() for values in columns))
+        lines.extend(
+            f",_result,0,{row[0]},{topic.name}," + ",".join(map(str, row[1:]))
+            for row in rows
+        )
+        return "\n".join(lines) + "\n"
+
+
+class FakeS3:  # pylint: disable=too-few-public-methods
+    """S3 GET API with a single bucket "data" with objects `<topic>/<ts>.dp`"""
+
+    def __init__(self, topics: Dict[str, Topic]):
+        self._objects = {
+            f"{name}/{timestamp}.dp": blob
+            for name, topic in topics.items()
+            for timestamp, blob in zip(topic.timestamps, topic.blobs)
+        }
+
+    def app(self) -> web.Application:
+        """Application with bucket and object routes"""
+        app = web.Application()
+        app.router.add_get("/{bucket}", self._bucket)
+        app.router.add_get("/{bucket}/{key:.+}", self._object)
+        return app
+
+    @staticmethod
+    async def _bucket(request):
+        if "location" in request.query:
+            return web.Response(
+                text='<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<LocationConstraint xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+                "</LocationConstraint>",
+                content_type="application/xml",
+            )
+        return web.Response(status=501)
+
+    async def _object(self, request):
+        key = request.match_info["key"]
+        if request.match_info["bucket"] != "data" or key not in self._objects:
+            return web.Response(
+                status=404,
+                text="<Error><Code>NoSuchKey</Code>"
+                "<Message>The specified key does not exist.</Message>"
+                f"<Key>{key}</Key></Error>",
+                content_type="application/xml",
+            )
+        return web.Response(
+            body=self._objects[key], content_type="application/octet-stream"
+        )
+
+
+class FakeMQTTBroker:
+    """MQTT 3.1.1 broker without sessions and retained messages, messages
+    are delivered with QoS 0"""
+
+    def __init__(self):
+        self._subscribers = TopicTree()
+        self._filters: Dict[asyncio.StreamWriter, List[str]] = {}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve connection of a client"""
+        self._filters[writer] = []
+        try:
+            while True:
+                header = (await reader.readexactly(1))[0]
+                length = 0
+                for shift in range(0, 28, 7):
+                    byte = (await reader.readexactly(1))[0]
+                    length |= (byte & 0x7F) << shift
+                    if not byte & 0x80:
+                        break
+                body = await reader.readexactly(length)
+                if not self._on_packet(writer, header, body):
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for topic_filter in self._filters.pop(writer):
+                self._subscribers.remove(topic_filter, writer)
+            writer.close()
+
+    def subscribed(self, topic: str) -> bool:
+        """True if a client subscribed to the topic"""
+        return bool(self._subscribers.match(topic))
+
+    def _on_packet(self, writer: asyncio.StreamWriter, header: int, body: bytes):
+        kind = header >> 4
+        if kind == 1:  # CONNECT
+            writer.write(b"\x20\x02\x00\x00")
+        elif kind == 3:  # PUBLISH
+            self._publish(writer, header, body)
+        elif kind == 8:  # SUBSCRIBE
+            packet_id, filters = body[:2], _read_filters(body[2:], with_qos=True)
+            for topic_filter in filters:
+                self._subscribers.add(topic_filter, writer)
+                self._filters[writer].append(topic_filter)
+            writer.write(
+                bytes([0x90, 2 + len(filters)]) + packet_id + b"\x00" * len(filters)
+            )
+        elif kind == 10:  # UNSUBSCRIBE
+            for topic_filter in _read_filters(body[2:], with_qos=False):
+                if self._subscribers.remove(topic_filter, writer):
+                    self._filters[writer].remove(topic_filter)
+            writer.write(b"\xb0\x02" + body[:2])
+        elif kind == 6:  # PUBREL
+            writer.write(b"\x70\x02" + body[:2])
+        elif kind == 12:  # PINGREQ
+            writer.write(b"\xd0\x00")
+        elif kind == 14:  # DISCONNECT
+            return False
+        return True
+
+    def _publish(self, writer: asyncio.StreamWriter, header: int, body: bytes):
+        qos = (header >> 1) & 0x03
+        (topic_length,) = struct.unpack("!H", body[:2])
+        topic = body[2 : 2 + topic_length]
+        offset = 2 + topic_length
+        if qos == 1:
+            writer.write(b"\x40\x02" + body[offset : offset + 2])
+        elif qos == 2:
+            writer.write(b"\x50\x02" + body[offset : offset + 2])
+        if qos:
+            offset += 2
+
+        packet = _make_publish(topic, body[offset:])
+        for subscriber in set(self._subscribers.match(topic.decode())):
+            subscriber.write(packet)
+
+
+def _read_filters(body: bytes, with_qos: bool) -> List[str]:
+    filters = []
+    offset = 0
+    while offset < len(body):
+        (length,) = struct.unpack("!H", body[offset : offset + 2])
+        filters.append(body[offset + 2 : offset + 2 + length].decode())
+        offset += 2 + length + (1 if with_qos else 0)
+    return filters
+
+
+def _make_publish(topic: bytes, payload: bytes) -> bytes:
+    body = struct.pack("!H", len(topic)) + topic + payload
+    length = len(body)
+    header = bytearray([0x30])
+    while True:
+        byte = length & 0x7F
+        length >>= 7
+        header.append(byte | 0x80 if length else byte)
+        if not length:
+            break
+    return bytes(header) + body
+
+
+class FakeDevice:  # pylint: disable=too-many-instance-attributes
+    """Runs fake servers of a Drift device in a background thread on free
+    ports of localhost
+
+    Examples:
+        >>> with FakeDevice(make_topics(1000, 4096)) as device:
+        >>>     client = DriftClient("127.0.0.1", "password", **device.ports)
+    """
+
+    def __init__(self, topics: Dict[str, Topic], reduct: bool = True):
+        """
+        Args:
+            topics: Packages and metrics to serve
+            reduct: If False, ReductStore isn't started and DriftClient
+                falls back to MinIO
+        """
+        self._topics = topics
+        self._reduct = reduct
+        self._loop = asyncio.new_event_loop()
+        self._thread: Optional[threading.Thread] = None
+        self._runners: List[web.AppRunner] = []
+        self._mqtt_server: Optional[asyncio.AbstractServer] = None
+        self._broker = FakeMQTTBroker()
+        self.ports: Dict[str, int] = {}
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        asyncio.run_coroutine_threadsafe(self._stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def wait_subscribed(self, topic: str, timeout: float) -> bool:
+        """Wait until a client subscribes to the topic in the MQTT broker
+
+        Args:
+            topic: MQTT topic
+            timeout: Time to wait in seconds
+        Returns:
+            False if nobody subscribed in time
+        """
+
+        async def wait():
+            while not self._broker.subscribed(topic):
+                await asyncio.sleep(0.001)
+
+        future = asyncio.run_coroutine_threadsafe(
+            asyncio.wait_for(wait(), timeout), self._loop
+        )
+        try:
+            future.result()
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def _start(self):
+        apps = {
+            "influx_port": FakeInfluxDB(self._topics).app(),
+            "minio_port": FakeS3(self._topics).app(),
+        }
+        if self._reduct:
+            apps["reduct_storage_port"] = FakeReductStore(self._topics).app()
+
+        for name, app in apps.items():
+            runner = web.AppRunner(app, access_log=None)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            self._runners.append(runner)
+            self.ports[name] = runner.addresses[0][1]
+
+        if not self._reduct:
+            # nothing listens on the port, so the client falls back to MinIO
+            self.ports["reduct_storage_port"] = _free_port()
+
+        self._mqtt_server = await asyncio.start_server(
+            self._broker.handle, "127.0.0.1", 0
+        )
+        self.ports["mqtt_port"] = self._mqtt_server.sockets[0].getsockname()[1]
+
+    async def _stop(self):
+        self._mqtt_server.close()
+        await self._mqtt_server.wait_closed()
+        for runner in self._runners:
+            await runner.cleanup()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
@@ -0,0 +1,28 @@
+import asyncio
+import os
+
+from drift_client import AsyncDriftClient
+
+import logging
+import sys
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+async def main():
+    # Init
+    async with AsyncDriftClient(
+        "drift-dev2.local", os.getenv("DRIFT_PASSWORD")
+    ) as drift_client:
+        # Download data for a few topics concurrently
+        async def read_topic(topic):
+            async for pkg in drift_client.walk(
+                topic, "2023-06-16T10:00", "2023-06-16T10:10"
+            ):
+                print(topic, pkg.package_id)
+
+        await asyncio.gather(read_topic("acc-5"), read_topic("acc-6"))
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
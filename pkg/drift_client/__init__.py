@@ -2,4 +2,5 @@
 """
 
 from drift_client.drift_client import DriftClient
+from drift_client.async_drift_client import AsyncDriftClient
 from drift_client.drift_data_package import DriftDataPackage
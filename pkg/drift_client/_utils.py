@@ -0,0 +1,51 @@
+"""Helpers shared by synchronous and asynchronous Drift clients"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Tuple, Union
+
+from drift_client.influxdb_client import Columns
+
+
+def _convert_type(timestamp: Union[float, datetime, str]) -> int:
+    if isinstance(timestamp, str):
+        return int(datetime.fromisoformat(timestamp.replace("Z", "+00:00")).timestamp())
+    if isinstance(timestamp, float):
+        return int(timestamp)
+    if isinstance(timestamp, datetime):
+        return int(timestamp.timestamp())
+    raise TypeError("Timestamp must be str, float or datetime")
+
+
+def _make_package_names(topic: str, columns: Columns) -> List[str]:
+    if "status" not in columns:
+        return []
+
+    times, _ = columns["status"]
+    return [f"{topic}/{timestamp}.dp" for timestamp in (times // 1_000_000).tolist()]
+
+
+def _align_metrics(columns: Columns) -> List[Dict[str, Any]]:
+    aligned_data = {}
+    for field, (times, values) in columns.items():
+        # float seconds with microsecond precision as datetime.timestamp()
+        for dt, value in zip(((times // 1000) / 1e6).tolist(), values.tolist()):
+            if dt not in aligned_data:
+                aligned_data[dt] = {}
+
+            aligned_data[dt][field] = value
+
+    data = []
+    for dt, fields in aligned_data.items():
+        fields["time"] = dt
+        data.append(fields)
+
+    return data
+
+
+def _parse_metrics_options(kwargs: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    metrics_format = kwargs.get("format", "rows")
+    if metrics_format not in ("rows", "columns"):
+        raise ValueError(f"Unknown format '{metrics_format}'")
+
+    aggregation = {"every": kwargs.get("every"), "fn": kwargs.get("fn", "mean")}
+    return metrics_format, aggregation
@@ -0,0 +1,314 @@
+"""Windowed aggregation of signals in Drift packages"""
+
+import math
+import re
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+
+from drift_client.drift_data_package import DriftDataPackage
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h|d)")
+_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+class Reducer(ABC):
+    """Base class for reducers which accumulate signals of a window
+    into a single value"""
+
+    name: str = ""
+
+    @abstractmethod
+    def reset(self):
+        """Start a new window"""
+
+    @abstractmethod
+    def update(self, signal: np.ndarray):
+        """Add signal of a package to the window"""
+
+    @abstractmethod
+    def result(self) -> Any:
+        """Value of the window"""
+
+
+class Mean(Reducer):
+    """Mean value of all samples in the window"""
+
+    name = "mean"
+
+    def __init__(self):
+        self._sum = 0.0
+        self._count = 0
+
+    def reset(self):
+        self._sum = 0.0
+        self._count = 0
+
+    def update(self, signal: np.ndarray):
+        self._sum += np.sum(signal, dtype=np.float64)
+        self._count += signal.size
+
+    def result(self) -> float:
+        return float(self._sum / self._count) if self._count else math.nan
+
+
+class Energy(Reducer):
+    """Sum of squared samples in the window"""
+
+    name = "energy"
+
+    def __init__(self):
+        self._sum = 0.0
+        self._count = 0
+
+    def reset(self):
+        self._sum = 0.0
+        self._count = 0
+
+    def update(self, signal: np.ndarray):
+        signal = signal.astype(np.float64, copy=False)
+        self._sum += np.vdot(signal, signal).real
+        self._count += signal.size
+
+    def result(self) -> float:
+        return float(self._sum)
+
+
+class RMS(Energy):
+    """Root mean square of all samples in the window"""
+
+    name = "rms"
+
+    def result(self) -> float:
+        return math.sqrt(self._sum / self._count) if self._count else math.nan
+
+
+class Std(Reducer):
+    """Standard deviation of all samples in the window
+
+    The mean and the sum of squared deviations of each package are merged
+    into the ones of the window (Chan et al.), so large offsets
+    don't cancel out the variance.
+    """
+
+    name = "std"
+
+    def __init__(self):
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._count = 0
+
+    def reset(self):
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._count = 0
+
+    def update(self, signal: np.ndarray):
+        if not signal.size:
+            return
+
+        signal = signal.astype(np.float64, copy=False)
+        mean = np.mean(signal)
+        deviations = signal - mean
+        squares = np.vdot(deviations, deviations).real
+
+        count = self._count + signal.size
+        delta = mean - self._mean
+        self._mean += delta * signal.size / count
+        self._m2 += squares + abs(delta) ** 2 * self._count * signal.size / count
+        self._count = count
+
+    def result(self) -> float:
+        return math.sqrt(self._m2 / self._count) if self._count else math.nan
+
+
+class Min(Reducer):
+    """Minimal sample in the window"""
+
+    name = "min"
+
+    def __init__(self):
+        self._value = math.inf
+
+    def reset(self):
+        self._value = math.inf
+
+    def update(self, signal: np.ndarray):
+        if signal.size:
+            self._value = min(self._value, float(np.min(signal)))
+
+    def result(self) -> float:
+        return self._value if self._value != math.inf else math.nan
+
+
+class Max(Reducer):
+    """Maximal sample in the window"""
+
+    name = "max"
+
+    def __init__(self):
+        self._value = -math.inf
+
+    def reset(self):
+        self._value = -math.inf
+
+    def update(self, signal: np.ndarray):
+        if signal.size:
+            self._value = max(self._value, float(np.max(signal)))
+
+    def result(self) -> float:
+        return self._value if self._value != -math.inf else math.nan
+
+
+class Peak(Max):
+    """Maximal absolute value of samples in the window"""
+
+    name = "peak"
+
+    def update(self, signal: np.ndarray):
+        if signal.size:
+            self._value = max(self._value, float(np.max(np.abs(signal))))
+
+
+class BandEnergy(Energy):
+    """Energy of the signals in a frequency band, the spectrum is computed
+    along the last axis of each signal"""
+
+    def __init__(
+        self,
+        low: float,
+        high: float,
+        sample_rate: float,
+        name: Optional[str] = None,
+    ):
+        """
+        Args:
+            low: Lower frequency of the band in Hz, inclusive
+            high: Upper frequency of the band in Hz, exclusive
+            sample_rate: Sample rate of the signals in Hz
+            name: Name of the result. Default: "band_energy_<low>_<high>"
+        """
+        super().__init__()
+        self._low = low
+        self._high = high
+        self._sample_rate = sample_rate
+        self.name = name if name else f"band_energy_{low:g}_{high:g}"
+
+    def update(self, signal: np.ndarray):
+        length = signal.shape[-1]
+        if length == 0:
+            return
+
+        # one-sided power spectrum, its sum is the energy of the signal
+        power = np.abs(np.fft.rfft(signal, axis=-1)) ** 2 / length
+        power[..., 1 : (length + 1) // 2] *= 2
+
+        freqs = np.fft.rfftfreq(length, 1 / self._sample_rate)
+        band = (freqs >= self._low) & (freqs < self._high)
+        self._sum += float(np.sum(power[..., band]))
+        self._count += signal.size
+
+
+REDUCERS = {
+    reducer.name: reducer for reducer in (Mean, RMS, Std, Energy, Min, Max, Peak)
+}
+
+
+def parse_window(window: Union[float, str]) -> float:
+    """Convert window to seconds
+
+    Args:
+        window: Seconds or duration like "500ms", "10s", "1m", "1h30m"
+    Returns:
+        Window in seconds
+    Raises:
+        ValueError: if window is invalid
+    """
+    if isinstance(window, str):
+        parts = _DURATION.findall(window)
+        if not parts or "".join(value + unit for value, unit in parts) != window:
+            raise ValueError(f"Invalid window '{window}'")
+        window = sum(float(value) * _UNITS[unit] for value, unit in parts)
+
+    if window <= 0:
+        raise ValueError("Window must be positive")
+    return float(window)
+
+
+def make_reducers(reducers: Iterable[Union[str, Reducer]]) -> List[Reducer]:
+    """Create reducers by names
+
+    Args:
+        reducers: Names of built-in reducers or Reducer instances
+    Returns:
+        List of reducers
+    Raises:
+        ValueError: if a name is unknown
+    """
+    result = []
+    for reducer in reducers:
+        if isinstance(reducer, Reducer):
+            result.append(reducer)
+        elif reducer in REDUCERS:
+            result.append(REDUCERS[reducer]())
+        else:
+            raise ValueError(
+                f"Unknown reducer '{reducer}', supported: {', '.join(REDUCERS)}"
+            )
+    return result
+
+
+def aggregate(
+    packages: Iterable[DriftDataPackage],
+    window: Union[float, str],
+    reducers: Iterable[Union[str, Reducer]],
+    scale_factor: int = 0,
+    decode: Optional[Callable[[DriftDataPackage], np.ndarray]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Aggregate signals of packages in time windows. The windows are aligned
+    to multiples of the window size since UNIX epoch and the packages are
+    assigned to them by source timestamp. Empty windows are skipped.
+
+    Args:
+        packages: Packages ordered by source timestamp
+        window: Window in seconds or duration like "10s", "1m"
+        reducers: Names of built-in reducers ("mean", "rms", "std", "energy",
+            "min", "max", "peak") or Reducer instances
+        scale_factor: Wavelet composition factor
+        decode: Function which composes the signal of a package,
+            `DriftDataPackage.as_np` with `scale_factor` if None
+    Returns:
+        Iterator with a dictionary for each window with keys "start", "stop",
+            "count" (number of packages) and the names of the reducers
+    Raises:
+        ValueError: if window or reducers are invalid or a package is bad
+    """
+    window = parse_window(window)
+    reducers = make_reducers(reducers)
+
+    def make_result(window_start: float, count: int) -> Dict[str, Any]:
+        result = {"start": window_start, "stop": window_start + window}
+        result["count"] = count
+        result.update((reducer.name, reducer.result()) for reducer in reducers)
+        return result
+
+    current = None
+    count = 0
+    for pkg in packages:
+        window_start = math.floor(pkg.source_timestamp / window) * window
+        if window_start != current:
+            if current is not None:
+                yield make_result(current, count)
+            current = window_start
+            count = 0
+            for reducer in reducers:
+                reducer.reset()
+
+        signal = decode(pkg) if decode else pkg.as_np(scale_factor)
+        for reducer in reducers:
+            reducer.update(signal)
+        count += 1
+
+    if current is not None:
+        yield make_result(current, count)
@@ -0,0 +1,369 @@
+"""Asynchronous Drift Python Client
+
+Drift Client Module for access to Compute Devices on the Drift Platform
+from asyncio code
+
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Union, Any, Optional, AsyncIterator
+
+import numpy as np
+from aiohttp import ClientSession, ClientTimeout
+from reduct import ReductError
+
+from drift_client._utils import (
+    _align_metrics,
+    _convert_type,
+    _make_package_names,
+    _parse_metrics_options,
+)
+from drift_client.drift_data_package import DriftDataPackage
+from drift_client.influxdb_client import AsyncInfluxDBClient
+from drift_client.minio_client import AsyncMinIOClient
+from drift_client.reduct_client import AsyncReductStoreClient
+
+logger = logging.getLogger("drift-client")
+
+
+class AsyncDriftClient:  # pylint: disable=too-many-instance-attributes
+    """Asynchronous Drift Python Client Class"""
+
+    def __init__(self, host: str, password: str, **kwargs):
+        """
+        Asynchronous Drift Client for access to Compute Devices
+        on the Drift Platform. All requests to ReductStore share one event loop
+        and one HTTP session which is opened with `connect` or `async with`
+        and closed with `close`.
+
+        Args:
+            host: hostname or IP of Compute Device
+            password: password to access data
+        Keyword Args:
+            user (str): A user of the platform. Default: "panda"
+            org (str): An organisation name. Default: "panda"
+            secure (bool): Use HTTPS protocol to access data: Default: False
+            minio_port (int): Minio port. Default: 9000
+            reduct_storage_port (int): Reduct port. Default: 8383
+            influx_port (int): InfluxDB port. Default: 8086,
+            timeout (float): Timeout for requests. Default: 30 seconds
+
+        Examples:
+            >>> async with AsyncDriftClient("127.0.0.1", "PASSWORD") as client:
+            >>>     topics = await client.get_topics()
+        """
+        if password is None or password == "":
+            raise ValueError("Password is required")
+
+        self._host = host
+        self._password = password
+        self._user = kwargs["user"] if "user" in kwargs else "panda"
+        self._org = kwargs["org"] if "org" in kwargs else "panda"
+        self._secure = kwargs["secure"] if "secure" in kwargs else False
+        self._influx_port = kwargs["influx_port"] if "influx_port" in kwargs else 8086
+        self._minio_port = kwargs["minio_port"] if "minio_port" in kwargs else 9000
+        self._reduct_storage_port = (
+            kwargs["reduct_storage_port"] if "reduct_storage_port" in kwargs else 8383
+        )
+        self._timeout = kwargs["timeout"] if "timeout" in kwargs else 30
+
+        self._lock: Optional[asyncio.Lock] = None
+        self._session: Optional[ClientSession] = None
+        self._influx_client: Optional[AsyncInfluxDBClient] = None
+        self._blob_storage = None
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def connect(self):
+        """Opens HTTP session and checks if ReductStore is available,
+        MinIO is used if it is not. It is called implicitly by the first request.
+        """
+        if self._blob_storage is not None:
+            return
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            if self._blob_storage is not None:
+                return
+
+            protocol = "https://" if self._secure else "http://"
+            self._influx_client = AsyncInfluxDBClient(
+                f"{protocol}{self._host}:{self._influx_port}",
+                self._org,
+                self._password,
+                False,
+                self._timeout,
+            )  # TBD!!! --> SSL handling!
+
+            self._session = ClientSession(timeout=ClientTimeout(self._timeout))
+            blob_storage = AsyncReductStoreClient(
+                f"{protocol}{self._host}:{self._reduct_storage_port}",
+                self._password,
+                self._timeout,
+                session=self._session,
+            )
+
+            try:
+                await blob_storage.check_connection()
+                self._blob_storage = blob_storage
+                return
+            except ReductError as err:
+                if err.status_code != 599:
+                    await self._close_sessions()
+                    raise err
+
+                logger.warning(
+                    "ReductStore not available. Using MinIO Storage instead."
+                )
+            except Exception:
+                await self._close_sessions()
+                raise
+
+            # Minio as fallback if ReductStore is not available
+            self._blob_storage = AsyncMinIOClient(
+                f"{protocol}{self._host}:{self._minio_port}",
+                self._user,
+                self._password,
+                False,
+            )  # TBD!!! --> SSL handling!
+
+    async def close(self):
+        """Closes HTTP sessions"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            await self._close_sessions()
+            self._blob_storage = None
+
+    async def get_topics(self) -> List[str]:
+        """Returns list of topics (measurements in InfluxDB)
+
+        Returns:
+            List of topics available
+
+        Examples:
+            >>> async with AsyncDriftClient("127.0.0.1", "PASSWORD") as client:
+            >>>     await client.get_topics() # => ['topic-1', 'topic-2', ...]
+        """
+        await self.connect()
+        return await self._influx_client.query_measurements()
+
+    async def get_package_names(
+        self,
+        topic: str,
+        start: Union[float, datetime, str],
+        stop: Union[float, datetime, str],
+    ) -> List[str]:
+        """Returns list of history data from initialised Device
+
+        Args:
+            topic: Topic name
+            start: Begin of request timeframe,
+                Format: ISO string, datetime or float timestamp
+            stop: End of request timeframe,
+                Format: ISO string, datetime or float timestamp
+
+        Returns:
+            List with item names available
+
+        Examples:
+            >>> async with AsyncDriftClient("127.0.0.1", "PASSWORD") as client:
+            >>>     await client.get_package_names("topic-1",
+            >>>         "2022-02-03 10:00:00", "2022-02-03 10:00:10")
+            >>> # => ['topic-1/1644750600291.dp',
+            >>> #                  'topic-1/1644750601291.dp', ...]
+        """
+        await self.connect()
+        start = _convert_type(start)
+        stop = _convert_type(stop)
+
+        columns = await self._influx_client.query_columns(
+            topic, start, stop, fields="status"
+        )
+        package_list = _make_package_names(topic, columns)
+
+        # Check if package_list is available (works only for Reduct Storage)
+        return await self._blob_storage.check_package_list(package_list)
+
+    async def get_item(self, path: str) -> DriftDataPackage:
+        """Returns requested single historic data from initialised Device
+        Args:
+            path: path of item in storage
+        Raises:
+            ValueError: In case of broken WaveletBuffer
+        Returns:
+            Parsed Drift Package
+
+        Examples:
+            >>> async with AsyncDriftClient("127.0.0.1", "PASSWORD") as client:
+            >>>     await client.get_item("topic-1/1644750605291.dp")
+        """
+        await self.connect()
+        blob = await self._blob_storage.fetch_data(path)
+        return DriftDataPackage(blob)
+
+    async def get_items(
+        self, paths: List[str], max_workers: int = 8, ordered: bool = True
+    ) -> AsyncIterator[DriftDataPackage]:
+        """Returns requested historic data from initialised Device
+        fetching a few items concurrently
+
+        Args:
+            paths: paths of items in storage
+            max_workers: Number of concurrent requests
+            ordered: If True returns the packages in order of paths,
+                otherwise in order of completion
+        Raises:
+            DriftClientError: if failed to fetch data
+        Returns:
+            Asynchronous iterator with parsed Drift Packages
+
+        Examples:
+            >>> async with AsyncDriftClient("127.0.0.1", "PASSWORD") as client:
+            >>>     async for pkg in client.get_items(paths, max_workers=16):
+            >>>         print(pkg)
+        """
+        await self.connect()
+        blobs = self._blob_storage.fetch_many(paths, max_workers, ordered)
+        try:
+            async for blob in blobs:
+                yield DriftDataPackage(blob)
+        finally:
+            await blobs.aclose()
+
+    async def walk(
+        self,
+        topic: str,
+        start: Union[float, datetime, str],
+        stop: Union[float, datetime, str],
+        **kwargs,
+    ) -> AsyncIterator[DriftDataPackage]:
+        """Walks through history data for selected topic
+
+        Args:
+            topic: Topic name
+            start: Begin of request timeframe,
+                Format: ISO string, datetime or float timestamp
+            stop: End of request timeframe,
+                Format: ISO string, datetime or float timestamp
+        KwArgs:
+            ttl: Time to live for the query only for ReductStore
+            prefetch: Number of packages to read ahead in background
+                while the current one is processed, only for ReductStore
+            shards: Number of concurrent queries over small sub-ranges of
+                the timeframe, the packages are returned in order, only for
+                ReductStore. Default: 1
+            shard_records: Expected number of packages in each sub-range
+                if shards > 1, only for ReductStore. Default: 64
+            max_workers: Number of concurrent requests only for MinIO. Default: 8
+            lazy: If True, only headers of the packages are parsed and
+                the data payload is parsed when it is accessed. Default: False
+        Returns:
+            Asynchronous iterator with DriftDataPackage
+        Raises:
+            DriftClientError: if failed to fetch data
+
+        Examples:
+            >>> async with AsyncDriftClient("127.0.0.1", "PASSWORD") as client:
+            >>>     async for pkg in client.walk("topic-1", "2022-02-03 10:00:00",
+            >>>         "2022-02-03 10:00:10"):
+            >>>         print(pkg)
+        """
+        await self.connect()
+        lazy = kwargs.pop("lazy", False)
+        if self._blob_storage.name() == "minio":
+            packages = await self.get_package_names(topic, start, stop)
+            blobs = self._blob_storage.fetch_many(
+                packages, kwargs.get("max_workers", 8)
+            )
+            try:
+                async for blob in blobs:
+                    yield DriftDataPackage(blob, lazy=lazy)
+            finally:
+                await blobs.aclose()
+        else:
+            start = _convert_type(start)
+            stop = _convert_type(stop)
+            blobs = self._blob_storage.walk(topic, start, stop, **kwargs)
+            try:
+                async for blob in blobs:
+                    yield DriftDataPackage(blob, lazy=lazy)
+            finally:
+                await blobs.aclose()
+
+    async def get_metrics(
+        self,
+        topic: str,
+        start: Union[float, datetime, str],
+        stop: Union[float, datetime, str],
+        names: Optional[List[str]] = None,
+        **kwargs,
+    ) -> Union[List[Dict[str, Any]], Dict[str, np.ndarray]]:
+        """Reads history metrics from timeseries database
+
+        Args:
+            topic: MQTT topic
+            start: Begin of request timeframe,
+                Format: ISO string, datetime or float timestamp
+            stop: End of request timeframe,
+                Format: ISO string, datetime or float timestamp
+            names: Name of metrics, if None get all metrics for the topic
+        KwArgs:
+            format: "rows" to return a dictionary for each timestamp or
+                "columns" to return numpy arrays pivoted on the server with
+                "time" column in nanoseconds, numeric metrics are float64 with
+                NaN for missing values. Default: "rows"
+            every: Duration of windows to aggregate metrics in InfluxDB,
+                e.g. "1s" or "1m". If None raw values are returned. Default: None
+            fn: Aggregate function or list of functions ("mean", "median",
+                "min", "max", "sum", "count", "first", "last", "spread",
+                "stddev"). For a list the names of metrics get suffix
+                "_<fn>", e.g. "field_mean". Default: "mean"
+        Raises:
+            ValueError: if format, every or fn is invalid
+
+        Examples
+
+            >>> async with AsyncDriftClient("127.0.0.1", "PASSWORD") as client:
+            >>>     await client.get_metrics("topic", "2022-02-03 10:00:00",
+            >>>         "2022-02-03 10:00:10", names=["status", "field"])
+            >>> #=> [{"status": 0, "field": 0.1231}, ....]
+            >>>     await client.get_metrics("topic", "2022-02-03 10:00:00",
+            >>>         "2022-02-03 10:00:10", format="columns")
+            >>> #=> {"time": array([...]), "status": array([...]), ...}
+            >>>     await client.get_metrics("topic", "2022-02-03 10:00:00",
+            >>>         "2022-02-03 11:00:00", every="1m", fn=["min", "max"])
+            >>> #=> [{"field_min": 0.1, "field_max": 0.3, "time": ...}, ....]
+        """
+        await self.connect()
+        start = _convert_type(start)
+        stop = _convert_type(stop)
+
+        metrics_format, aggregation = _parse_metrics_options(kwargs)
+        if metrics_format == "columns":
+            return await self._influx_client.query_table(
+                topic, start, stop, fields=names, **aggregation
+            )
+        columns = await self._influx_client.query_columns(
+            topic, start, stop, fields=names, **aggregation
+        )
+        return _align_metrics(columns)
+
+    async def _close_sessions(self):
+        if self._influx_client is not None:
+            await self._influx_client.close()
+            self._influx_client = None
+
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
@@ -0,0 +1,215 @@
+"""Persistent cache of Drift packages on local disk"""
+
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Union, List, Iterable, Iterator
+
+from drift_client.error import DriftClientError
+from drift_client.instrumentation import Hook
+
+
+class PackageCache:
+    """Size-bounded LRU cache of serialized packages on disk
+
+    Packages are stored as files `<path>/<topic>/<timestamp>.dp` with the same
+    names as in the storage. The least recently used packages are removed when
+    the size of the cache exceeds the limit. The order of usage is kept in
+    modification time of the files, so it survives restarts.
+
+    Files which are memory mapped can't be removed or replaced on Windows.
+    Such packages stay in the cache until the next eviction.
+    """
+
+    def __init__(self, path: Union[str, Path], max_size: int):
+        """
+        Args:
+            path: directory for the cache, created if it doesn't exist
+            max_size: maximum size of the cache in bytes
+        """
+        self._path = Path(path)
+        self._path.mkdir(parents=True, exist_ok=True)
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._size = 0
+
+        for tmp_file in self._path.glob("*/.*.tmp"):
+            try:
+                os.remove(tmp_file)
+            except OSError:
+                pass
+
+        files = [
+            (file.stat().st_mtime_ns, file.stat().st_size, file)
+            for file in self._path.glob("*/*.dp")
+        ]
+        for _, size, file in sorted(files):
+            self._entries[f"{file.parent.name}/{file.name}"] = size
+            self._size += size
+
+        with self._lock:
+            self._evict()
+
+    @property
+    def size(self) -> int:
+        """Size of cached packages in bytes"""
+        return self._size
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[memoryview]:
+        """Read package from cache
+
+        Args:
+            key: name of package in format `topic/timestamp.dp`
+        Returns:
+            Memory mapped package or None if it isn't in cache
+        """
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            size = self._entries[key]
+
+        file = self._file(key)
+        try:
+            os.utime(file)
+            if size == 0:
+                return memoryview(b"")
+            with open(file, "rb") as cached_file:
+                data = mmap.mmap(cached_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            with self._lock:
+                self._remove(key)
+            return None
+
+        return memoryview(data)
+
+    def put(self, key: str, blob: bytes):
+        """Write package into cache and evict the least recently used packages
+
+        Args:
+            key: name of package in format `topic/timestamp.dp`
+            blob: serialized package
+        """
+        file = self._file(key)
+        file.parent.mkdir(exist_ok=True)
+
+        tmp_file = file.with_name(f".{file.name}.{threading.get_ident()}.tmp")
+        with open(tmp_file, "wb") as cached_file:
+            cached_file.write(blob)
+        try:
+            os.replace(tmp_file, file)
+        except OSError:
+            # the cached file is mapped by a reader, keep it
+            os.remove(tmp_file)
+            return
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = len(blob)
+            self._size += len(blob)
+            self._evict()
+
+    def _evict(self):
+        for key in list(self._entries):
+            if self._size <= self._max_size:
+                break
+            try:
+                os.remove(self._file(key))
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue
+            self._remove(key)
+
+    def _remove(self, key: str):
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._size -= size
+
+    def _file(self, key: str) -> Path:
+        topic, name = key.split("/")
+        if topic in ("", ".", "..") or name in ("", ".", ".."):
+            raise ValueError(f"Invalid package name '{key}'")
+        return self._path / topic / name
+
+
+class CachedBlobStorage:
+    """Blob storage which reads packages through `PackageCache`"""
+
+    def __init__(self, storage, cache: PackageCache):
+        """
+        Args:
+            storage: ReductStoreClient or MinIOClient
+            cache: cache for the packages
+        """
+        self._storage = storage
+        self._cache = cache
+
+    def check_package_list(self, package_names: List[str]) -> list:
+        """Check if packages exist in storage"""
+        return self._storage.check_package_list(package_names)
+
+    def fetch_data(self, path: str) -> Optional[bytes]:
+        """Fetch package from cache or from storage if it isn't cached"""
+        data = self._cache.get(path)
+        if data is None:
+            data = self._store(path, self._storage.fetch_data(path))
+        return data
+
+    def fetch_many(
+        self, paths: Iterable[str], max_workers: int, ordered: bool = True
+    ) -> Iterator[bytes]:
+        """Fetch packages from cache and the missing ones from storage
+        concurrently. If ordered is False, the cached packages come first.
+        """
+        paths = list(paths)
+        missing = [path for path in paths if path not in self._cache]
+        missing_set = set(missing)
+        fetched = iter(())
+        if missing:
+            fetched = iter(self._storage.fetch_many(missing, max_workers))
+
+        if not ordered:
+            for path in paths:
+                if path not in missing_set:
+                    yield self.fetch_data(path)
+            for path in missing:
+                yield self._store(path, next(fetched, None))
+            return
+
+        for path in paths:
+            if path in missing_set:
+                yield self._store(path, next(fetched, None))
+            else:
+                yield self.fetch_data(path)
+
+    def _store(self, path: str, data: Optional[bytes]) -> bytes:
+        if data is None:
+            raise DriftClientError(f"Could not read item at {path}")
+        self._cache.put(path, data)
+        return data
+
+    def walk(self, entry: str, start: int, stop: int, **kwargs) -> Iterator[bytes]:
+        """Walk through the records of an entry in storage"""
+        return self._storage.walk(entry, start, stop, **kwargs)
+
+    def close(self):
+        """Close connections of the storage"""
+        self._storage.close()
+
+    def instrument(self, hook: Optional[Hook]):
+        """Set hook for measurements of the storage"""
+        self._storage.instrument(hook)
+
+    def name(self) -> str:
+        """Return name of the storage"""
+        return self._storage.name()
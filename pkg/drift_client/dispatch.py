@@ -0,0 +1,248 @@
+"""Dispatching of received messages to a pool of workers"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional
+
+from google.protobuf.message import DecodeError
+
+from drift_client.drift_data_package import DriftDataPackage
+from drift_client.instrumentation import (
+    HANDLER_SECONDS,
+    QUEUE_WAIT_SECONDS,
+    Instrumented,
+)
+
+logger = logging.getLogger("drift-client")
+
+OVERFLOW_POLICIES = ("block", "drop-oldest", "drop-newest")
+
+_POLL_INTERVAL = 0.1
+
+
+def handle_payload(handler: Callable[[DriftDataPackage], None], payload: bytes):
+    """Parse package and call handler, it can be used as a picklable
+    function in process pool
+
+    Args:
+        handler: Handler of the package
+        payload: Serialized package
+    Raises:
+        DecodeError: if payload is no Drift Package
+    """
+    try:
+        package = DriftDataPackage(payload)
+    except DecodeError as exc:
+        raise DecodeError("Payload is no Drift Package") from exc
+    handler(package)
+
+
+def check_overflow(overflow: str):
+    """Check overflow policy
+
+    Args:
+        overflow: Name of the policy
+    Raises:
+        ValueError: if overflow policy is unknown
+    """
+    if overflow not in OVERFLOW_POLICIES:
+        raise ValueError(
+            f"Unknown overflow policy '{overflow}', "
+            f"supported: {', '.join(OVERFLOW_POLICIES)}"
+        )
+
+
+def put_with_overflow(bounded_queue: queue.Queue, item: Any, overflow: str) -> bool:
+    """Put item into bounded queue according to the overflow policy
+
+    Args:
+        bounded_queue: Queue with maximal size
+        item: Item to put
+        overflow: "block" to wait for a free slot, "drop-oldest" to drop
+            the oldest item in the queue, "drop-newest" to drop the item
+    Returns:
+        False if an item was dropped
+    """
+    if overflow == "block":
+        bounded_queue.put(item)
+        return True
+
+    dropped = False
+    while True:
+        try:
+            bounded_queue.put_nowait(item)
+            return not dropped
+        except queue.Full:
+            if overflow == "drop-newest":
+                return False
+
+        try:
+            bounded_queue.get_nowait()
+            bounded_queue.task_done()
+            dropped = True
+        except queue.Empty:
+            pass
+
+
+@dataclass
+class DispatcherStats:
+    """Counters of a dispatcher"""
+
+    received: int = 0
+    processed: int = 0
+    dropped: int = 0
+    errors: int = 0
+    queue_depth: int = 0
+
+
+class MessageDispatcher(Instrumented):  # pylint: disable=too-many-instance-attributes
+    """Passes payloads through a bounded queue to worker threads or processes
+    which parse them and call the handler, so that the thread receiving
+    messages is never blocked by the handler
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[DriftDataPackage], None],
+        workers: int = 1,
+        queue_size: int = 1000,
+        overflow: str = "block",
+        processes: bool = False,
+        on_stop: Optional[Callable[[], None]] = None,
+    ):  # pylint: disable=too-many-arguments
+        """
+        Args:
+            handler: Handler of packages, it must be picklable for processes
+            workers: Number of workers
+            queue_size: Maximal number of payloads waiting for a worker
+            overflow: What to do if the queue is full: "block" to wait
+                for a free slot, "drop-oldest" to drop the oldest payload
+                in the queue, "drop-newest" to drop the received payload
+            processes: If True, payloads are parsed and handled in a pool
+                of processes, otherwise in threads
+            on_stop: Called once when the dispatcher is stopped, before
+                the queue is drained, e.g. to unsubscribe from the topic
+        Raises:
+            ValueError: if overflow policy is unknown
+        """
+        check_overflow(overflow)
+
+        self._handler = handler
+        self._overflow = overflow
+        self._on_stop = on_stop
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = DispatcherStats()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        if processes:
+            self._executor = ProcessPoolExecutor(max_workers=workers)
+
+        self._threads: List[threading.Thread] = []
+        for _ in range(workers):
+            thread = threading.Thread(target=self._work, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    @property
+    def stats(self) -> DispatcherStats:
+        """Snapshot of counters"""
+        with self._lock:
+            return DispatcherStats(
+                received=self._stats.received,
+                processed=self._stats.processed,
+                dropped=self._stats.dropped,
+                errors=self._stats.errors,
+                queue_depth=self._queue.qsize(),
+            )
+
+    @property
+    def stopped(self) -> bool:
+        """True if the dispatcher is stopped"""
+        return self._stopped.is_set()
+
+    def submit(self, payload: bytes):
+        """Put payload into queue according to the overflow policy,
+        payloads are ignored after the dispatcher is stopped
+
+        Args:
+            payload: Serialized package
+        """
+        if self._stopped.is_set():
+            return
+
+        self._count("received")
+        item = (payload, time.perf_counter() if self._hook else 0.0)
+        if self._overflow == "block":
+            while not self._stopped.is_set():
+                try:
+                    self._queue.put(item, timeout=_POLL_INTERVAL)
+                    return
+                except queue.Full:
+                    pass
+            self._count("dropped")
+        elif not put_with_overflow(self._queue, item, self._overflow):
+            self._count("dropped")
+
+    def join(self):
+        """Wait until all payloads in the queue are handled"""
+        self._queue.join()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop receiving payloads, handle payloads in the queue and stop workers.
+        Calling it again has no effect.
+
+        Args:
+            timeout: Time to wait for each worker
+        """
+        with self._lock:
+            if self._stopped.is_set():
+                return
+            self._stopped.set()
+
+        if self._on_stop is not None:
+            self._on_stop()
+        for thread in self._threads:
+            thread.join(timeout)
+
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def _work(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                if self._stopped.is_set():
+                    return
+                continue
+
+            try:
+                payload, enqueued = item
+                hook = self._hook
+                if hook and enqueued:
+                    started = time.perf_counter()
+                    hook("dispatcher", QUEUE_WAIT_SECONDS, started - enqueued)
+
+                if self._executor is not None:
+                    self._executor.submit(
+                        handle_payload, self._handler, payload
+                    ).result()
+                else:
+                    handle_payload(self._handler, payload)
+                if hook and enqueued:
+                    hook("dispatcher", HANDLER_SECONDS, time.perf_counter() - started)
+                self._count("processed")
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Error in a message handler")
+                self._count("errors")
+            finally:
+                self._queue.task_done()
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self._stats, name, getattr(self._stats, name) + 1)
@@ -4,39 +4,76 @@ Drift Client Module for easy access to Compute Devices on the Drift Platform
 
 """
 
+import asyncio
+import heapq
 import logging
+import os
+import queue
 import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Callable, Union, Any, Optional, Iterator
+from functools import partial
+from pathlib import Path
+from typing import (
+    Dict,
+    List,
+    Callable,
+    Union,
+    Any,
+    Optional,
+    Iterator,
+    Tuple,
+    Iterable,
+    AsyncIterator,
+)
 
 import deprecation
+import numpy as np
 from google.protobuf.message import DecodeError
+from paho.mqtt.client import MQTTMessageInfo
 from reduct import ReductError
 
-from drift_client.drift_data_package import DriftDataPackage
+from drift_client._utils import (
+    _align_metrics,
+    _convert_type,
+    _make_package_names,
+    _parse_metrics_options,
+)
+from drift_client.aggregation import Reducer, aggregate
+from drift_client.cache import PackageCache, CachedBlobStorage
+from drift_client.dispatch import (
+    MessageDispatcher,
+    check_overflow,
+    handle_payload,
+    put_with_overflow,
+)
+from drift_client.drift_data_package import DriftDataPackage, compose
 from drift_client.influxdb_client import InfluxDBClient
 from drift_client.minio_client import MinIOClient
-from drift_client.mqtt_client import MQTTClient
+from drift_client.error import DriftClientError
+from drift_client.export import export
+from drift_client.instrumentation import DECODE_SECONDS, PARSE_SECONDS, Hook
+from drift_client.local_storage import LocalMetricsClient, LocalStorageClient
+from drift_client.mqtt_client import MQTTClient, PublishStats
+from drift_client.pipeline import map_concurrently
 from drift_client.reduct_client import ReductStoreClient
 
 logger = logging.getLogger("drift-client")
 TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
 
 
-def _convert_type(timestamp: Union[float, datetime, str]) -> int:
-    if isinstance(timestamp, str):
-        return int(datetime.fromisoformat(timestamp.replace("Z", "+00:00")).timestamp())
-    if isinstance(timestamp, float):
-        return int(timestamp)
-    if isinstance(timestamp, datetime):
-        return int(timestamp.timestamp())
-    raise TypeError("Timestamp must be str, float or datetime")
+def _with_topic(
+    topic: str, blobs: Iterator[bytes], parse: Callable[[bytes], DriftDataPackage]
+) -> Iterator[Tuple[str, DriftDataPackage]]:
+    for blob in blobs:
+        yield topic, parse(blob)
 
 
 class DriftClient:
     """Drift Python Client Class"""
 
-    # pylint: disable=too-many-arguments
+    # pylint: disable=too-many-arguments, too-many-locals
 
     def __init__(self, host: str, password: str, **kwargs):
         """
@@ -55,8 +92,19 @@ class DriftClient:
             mqtt_port (int): MQTT port. Default: 1883
             loop: asyncio loop for integration into async code
             timeout (float): Timeout for requests. Default: 30 seconds
+            cache_dir (str): Directory to cache fetched packages on disk.
+                Default: None (no cache)
+            cache_size (int): Maximum size of the cache in bytes. Default: 1 GB
+            instrumentation (Callable): Hook called with source, metric and value
+                to measure requests, parsing and queues, e.g. `Stats`.
+                Default: None (no measurements)
+            archive_dir (str): Directory of a local archive to replay packages
+                and metrics from instead of the device, see
+                `drift_client.local_storage`. Host and password are ignored.
+                Default: None
         """
-        if password is None or password == "":
+        archive_dir = kwargs["archive_dir"] if "archive_dir" in kwargs else None
+        if archive_dir is None and (password is None or password == ""):
             raise ValueError("Password is required")
 
         user = kwargs["user"] if "user" in kwargs else "panda"
@@ -70,43 +118,110 @@ class DriftClient:
         mqtt_port = kwargs["mqtt_port"] if "mqtt_port" in kwargs else 1883
         loop = kwargs["loop"] if "loop" in kwargs else None
         timeout = kwargs["timeout"] if "timeout" in kwargs else 30
+        self._timeout = timeout
+        cache_dir = kwargs["cache_dir"] if "cache_dir" in kwargs else None
+        cache_size = kwargs["cache_size"] if "cache_size" in kwargs else 1_000_000_000
 
         self._mqtt_client = MQTTClient(
             f"mqtt://{host}:{mqtt_port}",
             client_id=f"drift_client_{int(time.time() * 1000)}",
         )
+        self._dispatchers: List[MessageDispatcher] = []
 
-        self._influx_client = InfluxDBClient(
-            f"{('https://' if secure else 'http://')}{host}:{influx_port}",
-            org,
-            password,
-            False,
-            timeout,
-        )  # TBD!!! --> SSL handling!
-
-        try:
-            self._blob_storage = ReductStoreClient(
-                f"{('https://' if secure else 'http://')}{host}:{reduct_storage_port}",
+        if archive_dir is not None:
+            # history is replayed from the archive, live data still goes via MQTT
+            self._influx_client = LocalMetricsClient(archive_dir)
+            self._blob_storage = LocalStorageClient(archive_dir)
+        else:
+            self._influx_client = InfluxDBClient(
+                f"{('https://' if secure else 'http://')}{host}:{influx_port}",
+                org,
                 password,
+                False,
                 timeout,
-                loop,
-            )
-            return
-        except ReductError as err:  # pylint: disable=broad-except
-            if err.status_code == 599:
-                logger.warning(
-                    "ReductStore not available. Using MinIO Storage instead."
+            )  # TBD!!! --> SSL handling!
+
+            try:
+                self._blob_storage = ReductStoreClient(
+                    f"{('https://' if secure else 'http://')}"
+                    f"{host}:{reduct_storage_port}",
+                    password,
+                    timeout,
+                    loop,
                 )
-            else:
-                raise err
+            except ReductError as err:  # pylint: disable=broad-except
+                if err.status_code == 599:
+                    logger.warning(
+                        "ReductStore not available. Using MinIO Storage instead."
+                    )
+                else:
+                    raise err
+
+                # Minio as fallback if ReductStore is not available
+                self._blob_storage = MinIOClient(
+                    f"{('https://' if secure else 'http://')}{host}:{minio_port}",
+                    user,
+                    password,
+                    False,
+                )  # TBD!!! --> SSL handling!
+
+        self._cache = None
+        if cache_dir is not None:
+            # Past packages are immutable, so they can be cached without validation
+            self._cache = PackageCache(cache_dir, cache_size)
+            self._blob_storage = CachedBlobStorage(self._blob_storage, self._cache)
+
+        self._hook: Optional[Hook] = None
+        self.instrument(kwargs.get("instrumentation"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Closes connections to the Compute Device
 
-        # Minio as fallback if ReductStore is not available
-        self._blob_storage = MinIOClient(
-            f"{('https://' if secure else 'http://')}{host}:{minio_port}",
-            user,
-            password,
-            False,
-        )  # TBD!!! --> SSL handling!
+        Examples:
+            >>> with DriftClient("127.0.0.1", "PASSWORD") as client:
+            >>>     client.get_topics()
+        """
+        self._blob_storage.close()
+        self._influx_client.close()
+        if self._mqtt_client.is_connected():
+            self._mqtt_client.disconnect()
+            self._mqtt_client.loop_stop()
+
+        for dispatcher in self._dispatchers:
+            dispatcher.stop()
+        self._dispatchers.clear()
+
+    def instrument(self, hook: Optional[Hook]):
+        """Sets hook for measurements of the client and its backends.
+        The hook is called with the source ("reductstore", "minio", "local",
+        "influxdb", "mqtt", "dispatcher" or "drift_client"), the name of the metric
+        (see `drift_client.instrumentation`) and the value.
+
+        Args:
+            hook: Function called with source, metric and value,
+                None disables instrumentation
+
+        Examples:
+            >>> from drift_client.instrumentation import Stats
+            >>> stats = Stats()
+            >>> client = DriftClient("127.0.0.1", "PASSWORD")
+            >>> client.instrument(stats)
+            >>> client.get_item("topic-1/1644750605291.dp")
+            >>> for line in stats.report():
+            >>>     print(line)
+        """
+        self._hook = hook
+        self._blob_storage.instrument(hook)
+        self._influx_client.instrument(hook)
+        self._mqtt_client.instrument(hook)
+        for dispatcher in self._dispatchers:
+            dispatcher.instrument(hook)
 
     def get_topics(self) -> List[str]:
         """Returns list of topics (measurements in InfluxDB)
@@ -189,14 +304,8 @@ class DriftClient:
         start = _convert_type(start)
         stop = _convert_type(stop)
 
-        package_list = []
-        influxdb_values = self._influx_client.query_data(
-            topic, start, stop, fields="status"
-        )
-
-        if influxdb_values:
-            for timestamp, _ in influxdb_values["status"]:
-                package_list.append(f"{topic}/{int(timestamp * 1000)}.dp")
+        columns = self._influx_client.query_columns(topic, start, stop, fields="status")
+        package_list = _make_package_names(topic, columns)
 
         # Check if package_list is available (works only for Reduct Storage)
         return self._blob_storage.check_package_list(package_list)
@@ -215,7 +324,33 @@ class DriftClient:
             >>> client.get_item("topic-1/1644750605291.dp")
         """
         blob = self._blob_storage.fetch_data(path)
-        return DriftDataPackage(blob)
+        return self._parse(blob)
+
+    def get_items(
+        self, paths: List[str], max_workers: int = 8, ordered: bool = True
+    ) -> Iterator[DriftDataPackage]:
+        """Returns requested historic data from initialised Device
+        fetching a few items concurrently
+
+        Args:
+            paths: paths of items in storage
+            max_workers: Number of concurrent requests
+            ordered: If True returns the packages in order of paths,
+                otherwise in order of completion
+        Raises:
+            DriftClientError: if failed to fetch data
+        Returns:
+            Iterator with parsed Drift Packages
+
+        Examples:
+            >>> client = DriftClient("127.0.0.1", "PASSWORD")
+            >>> paths = client.get_package_names("topic-1",
+            >>>         "2022-02-03 10:00:00", "2022-02-03 10:00:10")
+            >>> for pkg in client.get_items(paths, max_workers=16):
+            >>>     print(pkg)
+        """
+        for blob in self._blob_storage.fetch_many(paths, max_workers, ordered):
+            yield self._parse(blob)
 
     def walk(
         self,
@@ -223,8 +358,10 @@ class DriftClient:
         start: Union[float, datetime, str],
         stop: Union[float, datetime, str],
         **kwargs,
-    ) -> Iterator[DriftDataPackage]:
-        """Walks through history data for selected topic
+    ) -> Iterator[Union[DriftDataPackage, np.ndarray]]:
+        """Walks through history data for selected topic.
+        If the client has a cache, the packages are listed with
+        `get_package_names` and read through the cache.
 
         Args:
             topic: Topic name
@@ -234,35 +371,320 @@ class DriftClient:
                 Format: ISO string, datetime or float timestamp
         KwArgs:
             ttl: Time to live for the query only for ReductStore
+            prefetch: Number of packages to read ahead in background
+                while the current one is processed, only for ReductStore
+            shards: Number of concurrent queries over small sub-ranges of
+                the timeframe, the packages are returned in order, only for
+                ReductStore. Default: 1
+            shard_records: Expected number of packages in each sub-range
+                if shards > 1, only for ReductStore. Default: 64
+            max_workers: Number of concurrent requests only for MinIO. Default: 8
+            lazy: If True, only headers of the packages are parsed and
+                the data payload is parsed when it is accessed. Default: False
+            decode: If "np", packages are composed to NumPy arrays
+                in a process pool and the arrays are returned in order.
+                Default: None
+            workers: Number of processes to decode packages. Default: CPU count
+            scale_factor: Wavelet composition factor for decoding. Default: 0
         Returns:
-            Iterator with DriftDataPackage
+            Iterator with DriftDataPackage or NumPy arrays if decode is "np"
         Raises:
             DriftClientError: if failed to fetch data
+            ValueError: if decode is unknown or a package is bad
 
         Examples:
             >>> client = DriftClient("127.0.0.1", "PASSWORD")
             >>> for pkg in  client.walk("topic-1", "2022-02-03 10:00:00",
                 "2022-02-03 10:00:10")
             >>>     print(pkg)
+            >>> for signal in client.walk("topic-1", "2022-02-03 10:00:00",
+                "2022-02-03 10:00:10", decode="np", workers=8)
+            >>>     print(signal.shape)
         """
-
-        if self._blob_storage.name() == "minio":
-            packages = self.get_package_names(topic, start, stop)
-            for package in packages:
-                yield self.get_item(package)
+        decode = kwargs.pop("decode", None)
+        if decode is None:
+            lazy = kwargs.pop("lazy", False)
+            for blob in self._walk_blobs(topic, start, stop, **kwargs):
+                yield self._parse(blob, lazy=lazy)
+        elif decode == "np":
+            workers = kwargs.pop("workers", None) or os.cpu_count()
+            func = partial(compose, scale_factor=kwargs.pop("scale_factor", 0))
+            blobs = self._walk_blobs(topic, start, stop, **kwargs)
+            # memory mapped packages from cache can't be pickled
+            blobs = (bytes(blob) for blob in blobs)
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                yield from map_concurrently(func, blobs, executor, workers * 2)
         else:
-            start = _convert_type(start)
-            stop = _convert_type(stop)
-            for package in self._blob_storage.walk(topic, start, stop, **kwargs):
-                yield DriftDataPackage(package)
+            raise ValueError(f"Unknown decode '{decode}', only 'np' supported")
+
+    def walk_many(
+        self,
+        topics: List[str],
+        start: Union[float, datetime, str],
+        stop: Union[float, datetime, str],
+        **kwargs,
+    ) -> Iterator[Tuple[str, DriftDataPackage]]:
+        """Walks through history data for a few topics at once and returns
+        the packages of all topics ordered by source timestamp.
+        The queries for all the topics are sent at the same time
+        and read ahead in background.
+
+        Args:
+            topics: Topic names
+            start: Begin of request timeframe,
+                Format: ISO string, datetime or float timestamp
+            stop: End of request timeframe,
+                Format: ISO string, datetime or float timestamp
+        KwArgs:
+            ttl: Time to live for the queries only for ReductStore
+            prefetch: Number of packages to read ahead for each topic,
+                only for ReductStore. Default: 16
+            max_workers: Number of concurrent requests for each topic
+                only for MinIO. Default: 8
+            lazy: If True, only headers of the packages are parsed and
+                the data payload is parsed when it is accessed. Default: False
+        Returns:
+            Iterator with pairs of topic name and DriftDataPackage
+        Raises:
+            DriftClientError: if failed to fetch data
 
-    def subscribe_data(self, topic: str, handler: Callable[[DriftDataPackage], None]):
+        Examples:
+            >>> client = DriftClient("127.0.0.1", "PASSWORD")
+            >>> for topic, pkg in client.walk_many(["topic-1", "topic-2"],
+            >>>         "2022-02-03 10:00:00", "2022-02-03 10:00:10"):
+            >>>     print(topic, pkg.source_timestamp)
+        """
+        lazy = kwargs.pop("lazy", False)
+        kwargs.setdefault("prefetch", 16)
+
+        walks = []
+        try:
+            for topic in topics:
+                walks.append(self._walk_blobs(topic, start, stop, **kwargs))
+
+            yield from heapq.merge(
+                *(
+                    _with_topic(topic, blobs, partial(self._parse, lazy=lazy))
+                    for topic, blobs in zip(topics, walks)
+                ),
+                key=lambda item: item[1].source_timestamp,
+            )
+        finally:
+            for blobs in walks:
+                blobs.close()
+
+    def walk_batches(
+        self,
+        topic: str,
+        start: Union[float, datetime, str],
+        stop: Union[float, datetime, str],
+        batch_size: int = 32,
+        scale_factor: int = 0,
+        **kwargs,
+    ) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Walks through history data for selected topic and returns
+        the signals of packages stacked in batches.
+        The arrays of a batch are reused for the next one,
+        copy them if they are needed after the next iteration.
+
+        Args:
+            topic: Topic name
+            start: Begin of request timeframe,
+                Format: ISO string, datetime or float timestamp
+            stop: End of request timeframe,
+                Format: ISO string, datetime or float timestamp
+            batch_size: Number of packages in a batch, the last one can be smaller
+            scale_factor: Wavelet composition factor
+        KwArgs:
+            ttl: Time to live for the query only for ReductStore
+            prefetch: Number of packages to read ahead in background
+                while the current one is processed, only for ReductStore
+            shards: Number of concurrent queries over small sub-ranges of
+                the timeframe, only for ReductStore. Default: 1
+            max_workers: Number of concurrent requests only for MinIO. Default: 8
+        Returns:
+            Iterator with source timestamps, package IDs and signals
+                with shape (batch size, *signal shape)
+        Raises:
+            DriftClientError: if failed to fetch data
+            ValueError: if a package is bad or signals have different shapes
+
+        Examples:
+            >>> client = DriftClient("127.0.0.1", "PASSWORD")
+            >>> for timestamps, ids, signals in client.walk_batches("topic-1",
+            >>>         "2022-02-03 10:00:00", "2022-02-03 10:00:10",
+            >>>         batch_size=64):
+            >>>     print(signals.shape)
+        """
+        timestamps = np.empty(batch_size, dtype=np.float64)
+        package_ids = np.empty(batch_size, dtype=np.uint64)
+        signals = None
+        count = 0
+        for blob in self._walk_blobs(topic, start, stop, **kwargs):
+            pkg = self._parse(blob, lazy=True)
+            signal = self._decode(pkg, scale_factor)
+            if signals is None:
+                signals = np.empty((batch_size, *signal.shape), dtype=signal.dtype)
+            elif signal.shape != signals.shape[1:]:
+                raise ValueError(
+                    f"Signal of package {pkg.package_id} has shape {signal.shape}, "
+                    f"expected {signals.shape[1:]}"
+                )
+
+            timestamps[count] = pkg.source_timestamp
+            package_ids[count] = pkg.package_id
+            signals[count] = signal
+            count += 1
+            if count == batch_size:
+                yield timestamps, package_ids, signals
+                count = 0
+
+        if count > 0:
+            yield timestamps[:count], package_ids[:count], signals[:count]
+
+    def aggregate(
+        self,
+        topic: str,
+        start: Union[float, datetime, str],
+        stop: Union[float, datetime, str],
+        window: Union[float, str] = "10s",
+        reducers: Iterable[Union[str, Reducer]] = ("mean",),
+        **kwargs,
+    ) -> Iterator[Dict[str, Any]]:
+        """Walks through history data for selected topic and aggregates
+        the signals of packages in time windows. The packages are processed
+        one by one, so only the state of reducers is kept in memory.
+
+        Args:
+            topic: Topic name
+            start: Begin of request timeframe,
+                Format: ISO string, datetime or float timestamp
+            stop: End of request timeframe,
+                Format: ISO string, datetime or float timestamp
+            window: Window in seconds or duration like "10s", "1m", "1h"
+            reducers: Names of built-in reducers ("mean", "rms", "std",
+                "energy", "min", "max", "peak") or instances of
+                `drift_client.aggregation.Reducer`, e.g. `BandEnergy`
+        KwArgs:
+            scale_factor: Wavelet composition factor. Default: 0
+            ttl: Time to live for the query only for ReductStore
+            prefetch: Number of packages to read ahead in background
+                while the current one is processed, only for ReductStore
+            shards: Number of concurrent queries over small sub-ranges of
+                the timeframe, only for ReductStore. Default: 1
+            max_workers: Number of concurrent requests only for MinIO. Default: 8
+        Returns:
+            Iterator with a dictionary for each window with keys "start",
+                "stop", "count" (number of packages) and the names of reducers
+        Raises:
+            DriftClientError: if failed to fetch data
+            ValueError: if window or reducers are invalid or a package is bad
+
+        Examples:
+            >>> from drift_client.aggregation import BandEnergy
+            >>> client = DriftClient("127.0.0.1", "PASSWORD")
+            >>> for result in client.aggregate("topic-1", "2022-02-03 10:00:00",
+            >>>         "2022-02-04 10:00:00", window="1m",
+            >>>         reducers=["rms", "peak", BandEnergy(10, 100, 1000)]):
+            >>>     print(result)
+            >>> # => {"start": 1643882400.0, "stop": 1643882460.0, "count": 60,
+            >>> #     "rms": 0.12, "peak": 0.54, "band_energy_10_100": 3.2}
+        """
+        scale_factor = kwargs.pop("scale_factor", 0)
+        kwargs["lazy"] = True  # the payload is parsed only for decoding
+        packages = self.walk(topic, start, stop, **kwargs)
+        return aggregate(
+            packages,
+            window,
+            reducers,
+            decode=lambda package: self._decode(package, scale_factor),
+        )
+
+    def export(
+        self,
+        topic: str,
+        start: Union[float, datetime, str],
+        stop: Union[float, datetime, str],
+        path: Union[str, Path],
+        **kwargs,
+    ) -> List[Path]:
+        """Walks through history data for selected topic and writes
+        the packages to a directory as columnar files of `chunk_rows` packages.
+        The packages are read ahead while a chunk is decoded and the previous
+        chunk is written in background, so only two chunks are kept in memory.
+        See `drift_client.export.export` for the columns of the files.
+
+        Args:
+            topic: Topic name
+            start: Begin of request timeframe,
+                Format: ISO string, datetime or float timestamp
+            stop: End of request timeframe,
+                Format: ISO string, datetime or float timestamp
+            path: Directory for the files, created if it doesn't exist
+        KwArgs:
+            format: "parquet" (requires pyarrow) or "npz". Default: "parquet"
+            chunk_rows: Maximal number of packages in a file. Default: 10000
+            scale_factor: Wavelet composition factor. Default: 0
+            ttl: Time to live for the query only for ReductStore
+            prefetch: Number of packages to read ahead in background,
+                only for ReductStore. Default: 64
+            shards: Number of concurrent queries over small sub-ranges of
+                the timeframe, only for ReductStore. Default: 1
+            max_workers: Number of concurrent requests only for MinIO. Default: 8
+        Returns:
+            Paths of written files in order of timestamps
+        Raises:
+            DriftClientError: if failed to fetch data
+            ValueError: if format or chunk_rows is invalid or a package is bad
+            ImportError: if pyarrow isn't installed for Parquet
+
+        Examples:
+            >>> client = DriftClient("127.0.0.1", "PASSWORD")
+            >>> client.export("topic-1", "2022-02-03 10:00:00",
+            >>>     "2022-02-10 10:00:00", "dataset", format="parquet",
+            >>>     chunk_rows=50_000)
+            >>> # => [PosixPath("dataset/part-00000.parquet"), ...]
+        """
+        export_format = kwargs.pop("format", "parquet")
+        chunk_rows = kwargs.pop("chunk_rows", 10_000)
+        scale_factor = kwargs.pop("scale_factor", 0)
+        kwargs.setdefault("prefetch", 64)
+        kwargs["lazy"] = True  # the payload is parsed only for decoding
+        packages = self.walk(topic, start, stop, **kwargs)
+        return export(
+            packages,
+            path,
+            export_format,
+            chunk_rows,
+            decode=lambda package: self._decode(package, scale_factor),
+        )
+
+    def subscribe_data(
+        self, topic: str, handler: Callable[[DriftDataPackage], None], **kwargs
+    ) -> Optional[MessageDispatcher]:
         """Subscribes to selected topic from initialised Device
 
         Args:
             topic: MQTT topic
             handler: Handler - own handler function to be used, e.g.
                 `def package_handler(package):`
+        KwArgs:
+            blocking: If True, packages are handled in the network thread
+                and the call blocks forever. Otherwise, the call returns
+                a `MessageDispatcher` immediately which passes packages
+                to a pool of workers through a bounded queue. Default: True
+            workers: Number of workers for non-blocking mode. Default: 1
+            processes: If True, workers are processes and the handler must be
+                picklable, otherwise threads. Default: False
+            queue_size: Size of the queue for non-blocking mode. Default: 1000
+            overflow: What to do if the queue is full: "block" to wait for
+                a free slot, "drop-oldest" or "drop-newest" to drop a package.
+                Default: "block"
+        Returns:
+            Dispatcher with counters of the subscription in non-blocking mode,
+                `stop()` unsubscribes from the topic and stops the workers
+        Raises:
+            ValueError: if overflow policy is unknown
 
         Examples:
             >>> def package_handler(package: DriftDataPackage) -> None:
@@ -270,19 +692,103 @@ class DriftClient:
             >>>
             >>> client = DriftClient("127.0.0.1", "PASSWORD")
             >>> client.subscribe_data("topic-1", package_handler)
+            >>> # or handle packages in background
+            >>> dispatcher = client.subscribe_data("topic-1", package_handler,
+            >>>     blocking=False, workers=4, overflow="drop-oldest")
+            >>> print(dispatcher.stats)
+            >>> dispatcher.stop()
         """
+        if kwargs.get("blocking", True):
+            self._mqtt_client.connect()
+            self._mqtt_client.subscribe(
+                topic, lambda message: handle_payload(handler, message.payload)
+            )
+            self._mqtt_client.loop_forever()
+            return None
+
+        self._start_mqtt()
+        subscription = None
+
+        def unsubscribe():
+            if subscription is not None:
+                self._mqtt_client.unsubscribe(subscription)
+
+        dispatcher = MessageDispatcher(
+            handler,
+            workers=kwargs.get("workers", 1),
+            queue_size=kwargs.get("queue_size", 1000),
+            overflow=kwargs.get("overflow", "block"),
+            processes=kwargs.get("processes", False),
+            on_stop=unsubscribe,
+        )
+        dispatcher.instrument(self._hook)
+        try:
+            subscription = self._mqtt_client.subscribe(
+                topic, lambda message: dispatcher.submit(message.payload)
+            )
+        except Exception:
+            dispatcher.stop()
+            raise
 
-        def package_handler(message):
-            try:
-                output = DriftDataPackage(message.payload)
-            except DecodeError as exc:
-                raise DecodeError("Payload is no Drift Package") from exc
-            handler(output)
+        self._dispatchers.append(dispatcher)
+        return dispatcher
 
-        self._mqtt_client.connect()
-        self._mqtt_client.subscribe(topic, package_handler)
+    async def stream(
+        self, topic: str, maxsize: int = 1000, overflow: str = "drop-oldest"
+    ) -> AsyncIterator[DriftDataPackage]:
+        """Subscribes to selected topic and iterates received packages in
+        asyncio code. The packages are passed from the network thread through
+        a bounded queue, the topic is unsubscribed when the iteration stops.
+
+        Args:
+            topic: MQTT topic
+            maxsize: Maximal number of packages waiting in the queue
+            overflow: What to do if the queue is full: "block" to wait for
+                a free slot in the network thread, "drop-oldest" or
+                "drop-newest" to drop a package. Default: "drop-oldest"
+        Returns:
+            Asynchronous iterator with packages
+        Raises:
+            ValueError: if overflow policy is unknown
 
-        self._mqtt_client.loop_forever()
+        Examples:
+            >>> client = DriftClient("127.0.0.1", "PASSWORD")
+            >>> async for package in client.stream("topic-1", maxsize=100):
+            >>>     print(package.meta)
+        """
+        check_overflow(overflow)
+        loop = asyncio.get_running_loop()
+        payloads = queue.Queue(maxsize=maxsize)
+        ready = asyncio.Event()
+
+        def on_message(message):
+            put_with_overflow(payloads, message.payload, overflow)
+            if not ready.is_set():
+                loop.call_soon_threadsafe(ready.set)
+
+        self._start_mqtt()
+        subscription = self._mqtt_client.subscribe(topic, on_message)
+        try:
+            while True:
+                try:
+                    payload = payloads.get_nowait()
+                except queue.Empty:
+                    ready.clear()
+                    if payloads.empty():
+                        await ready.wait()
+                    continue
+
+                try:
+                    package = self._parse(payload)
+                except DecodeError:
+                    logger.warning("Payload from '%s' is no Drift Package", topic)
+                    continue
+                yield package
+        finally:
+            self._mqtt_client.unsubscribe(subscription)
+            # release network thread if it waits for a free slot
+            while not payloads.empty():
+                payloads.get_nowait()
 
     def publish_data(self, topic: str, payload: bytes):
         """Publishes payload to selected topic on initialised Device
@@ -294,11 +800,113 @@ class DriftClient:
             >>> client = DriftClient("127.0.0.1", "PASSWORD")
             >>> client.publish_data("topic-2", b"hello")
         """
+        self._start_mqtt()
+        self._mqtt_client.publish(topic, payload)
+
+    def publish_many(
+        self,
+        topic: str,
+        payloads: Iterable[bytes],
+        qos: int = 1,
+        max_inflight: int = 100,
+    ) -> PublishStats:
+        """Publishes payloads to selected topic keeping up to `max_inflight`
+        messages which aren't acknowledged by the broker yet
+
+        Args:
+            topic: MQTT topic
+            payloads: Payloads to publish, can be a generator
+            qos: Quality of service
+            max_inflight: Maximal number of messages in flight
+        Returns:
+            Number of published messages and bytes and time spent
+        Raises:
+            DriftClientError: if failed to publish a message or
+                it isn't acknowledged within the timeout
+
+        Examples
+            >>> client = DriftClient("127.0.0.1", "PASSWORD")
+            >>> stats = client.publish_many("topic-2", (pkg.blob for pkg in
+            >>>     client.walk("topic-1", "2022-02-03 10:00:00",
+            >>>         "2022-02-03 10:00:10")), max_inflight=50)
+            >>> print(stats.messages_per_second, stats.bytes_per_second)
+        """
+        self._start_mqtt()
+        previous = self._mqtt_client.max_inflight_messages
+        self._mqtt_client.max_inflight_messages_set(max_inflight)
+
+        inflight = deque()
+        messages = 0
+        size = 0
+        started = time.monotonic()
+        try:
+            for payload in payloads:
+                if len(inflight) >= max_inflight:
+                    self._wait_for_publish(inflight.popleft())
+
+                inflight.append(self._mqtt_client.publish(topic, payload, qos=qos))
+                messages += 1
+                size += len(payload)
+
+            while inflight:
+                self._wait_for_publish(inflight.popleft())
+        finally:
+            self._mqtt_client.max_inflight_messages_set(previous)
+
+        return PublishStats(
+            messages=messages, bytes=size, seconds=time.monotonic() - started
+        )
+
+    def _start_mqtt(self):
         if not self._mqtt_client.is_connected():
             self._mqtt_client.connect()
             self._mqtt_client.loop_start()
 
-        self._mqtt_client.publish(topic, payload)
+    def _wait_for_publish(self, info: MQTTMessageInfo):
+        try:
+            info.wait_for_publish(self._timeout)
+        except (ValueError, RuntimeError) as err:
+            raise DriftClientError(f"Failed to publish message: {err}") from err
+
+        if not info.is_published():
+            raise DriftClientError(
+                f"Message {info.mid} isn't published in {self._timeout} seconds"
+            )
+
+    def _parse(self, blob: bytes, **kwargs) -> DriftDataPackage:
+        hook = self._hook
+        if not hook:
+            return DriftDataPackage(blob, **kwargs)
+
+        started = time.perf_counter()
+        package = DriftDataPackage(blob, **kwargs)
+        hook("drift_client", PARSE_SECONDS, time.perf_counter() - started)
+        return package
+
+    def _decode(self, package: DriftDataPackage, scale_factor: int) -> np.ndarray:
+        hook = self._hook
+        if not hook:
+            return package.as_np(scale_factor)
+
+        started = time.perf_counter()
+        signal = package.as_np(scale_factor)
+        hook("drift_client", DECODE_SECONDS, time.perf_counter() - started)
+        return signal
+
+    def _walk_blobs(
+        self,
+        topic: str,
+        start: Union[float, datetime, str],
+        stop: Union[float, datetime, str],
+        **kwargs,
+    ) -> Iterator[bytes]:
+        if self._blob_storage.name() == "minio" or self._cache is not None:
+            packages = self.get_package_names(topic, start, stop)
+            return self._blob_storage.fetch_many(packages, kwargs.get("max_workers", 8))
+
+        start = _convert_type(start)
+        stop = _convert_type(stop)
+        return self._blob_storage.walk(topic, start, stop, **kwargs)
 
     def get_metrics(
         self,
@@ -306,7 +914,8 @@ class DriftClient:
         start: Union[float, datetime, str],
         stop: Union[float, datetime, str],
         names: Optional[List[str]] = None,
-    ) -> List[Dict[str, Any]]:
+        **kwargs,
+    ) -> Union[List[Dict[str, Any]], Dict[str, np.ndarray]]:
         """Reads history metrics from timeseries database
 
         Args:
@@ -316,6 +925,19 @@ class DriftClient:
             stop: End of request timeframe,
                 Format: ISO string, datetime or float timestamp
             names: Name of metrics, if None get all metrics for the topic
+        KwArgs:
+            format: "rows" to return a dictionary for each timestamp or
+                "columns" to return numpy arrays pivoted on the server with
+                "time" column in nanoseconds, numeric metrics are float64 with
+                NaN for missing values. Default: "rows"
+            every: Duration of windows to aggregate metrics in InfluxDB,
+                e.g. "1s" or "1m". If None raw values are returned. Default: None
+            fn: Aggregate function or list of functions ("mean", "median",
+                "min", "max", "sum", "count", "first", "last", "spread",
+                "stddev"). For a list the names of metrics get suffix
+                "_<fn>", e.g. "field_mean". Default: "mean"
+        Raises:
+            ValueError: if format, every or fn is invalid
 
         Examples
 
@@ -323,26 +945,23 @@ class DriftClient:
             >>> client.get_metrics("topic", "2022-02-03 10:00:00",
             >>>    "2022-02-03 10:00:10", names=["status", "field"])
             >>> #=> [{"status": 0, "field": 0.1231}, ....]
+            >>> client.get_metrics("topic", "2022-02-03 10:00:00",
+            >>>    "2022-02-03 10:00:10", format="columns")
+            >>> #=> {"time": array([...]), "status": array([...]), ...}
+            >>> client.get_metrics("topic", "2022-02-03 10:00:00",
+            >>>    "2022-02-03 11:00:00", every="1m", fn=["min", "max"])
+            >>> #=> [{"field_min": 0.1, "field_max": 0.3, "time": ...}, ....]
         """
 
         start = _convert_type(start)
         stop = _convert_type(stop)
 
-        aligned_data = {}
-        influxdb_values = self._influx_client.query_data(
-            topic, start, stop, fields=names
+        metrics_format, aggregation = _parse_metrics_options(kwargs)
+        if metrics_format == "columns":
+            return self._influx_client.query_table(
+                topic, start, stop, fields=names, **aggregation
+            )
+        columns = self._influx_client.query_columns(
+            topic, start, stop, fields=names, **aggregation
         )
-
-        for field, values in influxdb_values.items():
-            for dt, value in values:
-                if dt not in aligned_data:
-                    aligned_data[dt] = {}
-
-                aligned_data[dt][field] = value
-
-        data = []
-        for dt, fields in aligned_data.items():
-            fields["time"] = dt
-            data.append(fields)
-
-        return data
+        return _align_metrics(columns)
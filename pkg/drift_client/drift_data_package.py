@@ -1,22 +1,83 @@
 """Wrapper around DriftPackage"""
 
-from typing import Optional, Dict
+from typing import Optional, Dict, Tuple, Iterator, Union
 
 from drift_bytes import Variant, InputBuffer
 from wavelet_buffer import WaveletBuffer  # pylint: disable=no-name-in-module
 from drift_protocol.common import DataPayload, DriftPackage, StatusCode
 from drift_protocol.meta import MetaInfo
+from google.protobuf.any_pb2 import Any as AnyMsg  # pylint: disable=no-name-in-module
+from google.protobuf.message import DecodeError
 
 import numpy as np
 
 
+_DATA_FIELD = DriftPackage.DESCRIPTOR.fields_by_name["data"].number
+_ANY_TYPE_URL_FIELD = AnyMsg.DESCRIPTOR.fields_by_name["type_url"].number
+_ANY_VALUE_FIELD = AnyMsg.DESCRIPTOR.fields_by_name["value"].number
+_PAYLOAD_DATA_FIELD = DataPayload.DESCRIPTOR.fields_by_name["data"].number
+
+_WIRE_VARINT = 0
+_WIRE_FIXED64 = 1
+_WIRE_LENGTH_DELIMITED = 2
+_WIRE_FIXED32 = 5
+
+
+def _read_varint(buffer: memoryview, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = buffer[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _scan_fields(
+    buffer: memoryview, start: int, end: int
+) -> Iterator[Tuple[int, int, int, int]]:
+    """Iterate over the fields of a serialized message without parsing them
+
+    Returns:
+        Iterator with field number, start of the field with its tag,
+            start and end of the value
+    """
+    pos = start
+    try:
+        while pos < end:
+            field_start = pos
+            key, pos = _read_varint(buffer, pos)
+            wire_type = key & 0x07
+            if wire_type == _WIRE_VARINT:
+                _, value_end = _read_varint(buffer, pos)
+            elif wire_type == _WIRE_FIXED64:
+                value_end = pos + 8
+            elif wire_type == _WIRE_LENGTH_DELIMITED:
+                length, pos = _read_varint(buffer, pos)
+                value_end = pos + length
+            elif wire_type == _WIRE_FIXED32:
+                value_end = pos + 4
+            else:
+                raise DecodeError(f"Unsupported wire type {wire_type}")
+
+            if value_end > end:
+                raise DecodeError("Truncated message")
+
+            yield key >> 3, field_start, pos, value_end
+            pos = value_end
+    except IndexError as err:
+        raise DecodeError("Truncated message") from err
+
+
 def check_status(func):
     """Check Package status"""
 
-    def dec(self, **kwargs):
+    def dec(self, *args, **kwargs):
         if self._pkg.status != StatusCode.GOOD:  # pylint: disable=protected-access
             raise ValueError("Bad package")
-        return func(self, **kwargs)
+        return func(self, *args, **kwargs)
 
     return dec
 
@@ -27,15 +88,17 @@ class DriftDataPackage:  # pylint: disable=no-member
     _blob: bytes
     _pkg: DriftPackage
 
-    def __init__(self, blob: bytes):
+    def __init__(self, blob: bytes, lazy: bool = False):
         """Parsed Drift Package
 
         Args:
             blob: Serialized  package from database or stream
+            lazy: If True, only the header of the package is parsed and
+                the data payload is read from the blob when it is accessed
         """
         self._blob = blob
         pkg = DriftPackage()
-        pkg.ParseFromString(blob)
+        pkg.ParseFromString(self._strip_data(blob) if lazy else blob)
         self._pkg = pkg
 
     TS_PRECISION = 1000
@@ -97,37 +160,51 @@ class DriftDataPackage:  # pylint: disable=no-member
         return self._pkg.meta
 
     @check_status
-    def as_raw(self) -> Optional[bytes]:
+    def as_raw(self, copy: bool = True) -> Optional[Union[bytes, memoryview]]:
         """Data payload as raw
 
+        Args:
+            copy: If False, returns a view into the serialized package
+                instead of a copy, defaults to True
         Returns:
             Data payload as raw. None if no payload in the package
         """
-        data = None
-        for proto_data in self._pkg.data:
-            if proto_data.Is(DataPayload.DESCRIPTOR):
-                payload = DataPayload()
-                proto_data.Unpack(payload)
-                data = payload.data
-
+        data = self._payload_view()
+        if copy and data is not None:
+            return bytes(data)
         return data
 
+    @check_status
+    def as_memoryview(self) -> Optional[memoryview]:
+        """Data payload as a view into the serialized package without copying
+
+        Returns:
+            Data payload as memoryview. None if no payload in the package
+        """
+        return self._payload_view()
+
     @check_status
     def as_buffer(self) -> WaveletBuffer:
         """Data payload as Wavelet Buffer
 
         Returns:
             Data payload as Wavelet Buffer
+        Raises:
+            ValueError: if no payload in the package
         """
-        return WaveletBuffer.parse(self.as_raw())
+        return WaveletBuffer.parse(self._payload_bytes())
 
     @check_status
     def as_typed_data(self) -> Dict[str, Optional[Variant.SUPPORTED_TYPES]]:
-        """Data payload as typed data"""
+        """Data payload as typed data
+
+        Raises:
+            ValueError: if the package has no typed data payload
+        """
         if self.meta.type != MetaInfo.TYPED_DATA:
             raise ValueError("Only typed data supported")
 
-        buffer = InputBuffer(self.as_raw())
+        buffer = InputBuffer(self._payload_bytes())
         data = {}
         for item in self.meta.typed_data_info.items:
             value = buffer.pop()
@@ -157,3 +234,66 @@ class DriftDataPackage:  # pylint: disable=no-member
             labels[label.key] = label.value
 
         return labels
+
+    def _payload_view(self) -> Optional[memoryview]:
+        """Find DataPayload.data in the serialized package without parsing it"""
+        view = memoryview(self._blob)
+        data = None
+        for number, _, start, end in _scan_fields(view, 0, len(view)):
+            if number != _DATA_FIELD:
+                continue
+
+            type_url = None
+            value = (end, end)
+            for any_number, _, any_start, any_end in _scan_fields(view, start, end):
+                if any_number == _ANY_TYPE_URL_FIELD:
+                    type_url = bytes(view[any_start:any_end])
+                elif any_number == _ANY_VALUE_FIELD:
+                    value = (any_start, any_end)
+
+            if type_url is None:
+                continue
+            if (
+                type_url.rsplit(b"/", maxsplit=1)[-1].decode()
+                != DataPayload.DESCRIPTOR.full_name
+            ):
+                continue
+
+            data = view[0:0]
+            for payload_number, _, payload_start, payload_end in _scan_fields(
+                view, *value
+            ):
+                if payload_number == _PAYLOAD_DATA_FIELD:
+                    data = view[payload_start:payload_end]
+
+        return data
+
+    def _payload_bytes(self) -> bytes:
+        """Copy of DataPayload.data for parsers which accept only bytes"""
+        data = self._payload_view()
+        if data is None:
+            raise ValueError("No data payload in the package")
+        return bytes(data)
+
+    @staticmethod
+    def _strip_data(blob: bytes) -> bytes:
+        """Serialized package without data payload"""
+        view = memoryview(blob)
+        return b"".join(
+            view[field_start:end]
+            for number, field_start, _, end in _scan_fields(view, 0, len(view))
+            if number != _DATA_FIELD
+        )
+
+
+def compose(blob: bytes, scale_factor: int = 0) -> np.ndarray:
+    """Parse serialized package and compose its data payload to NumPy Array,
+    it can be used as a picklable function in process pool
+
+    Args:
+        blob: Serialized package from database or stream
+        scale_factor: Wavelet composition factor, defaults to 0
+    Returns:
+        Data payload as NumPy Array
+    """
+    return DriftDataPackage(blob).as_np(scale_factor=scale_factor)
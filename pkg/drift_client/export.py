@@ -0,0 +1,245 @@
+"""Export of Drift packages to chunked Parquet or NPZ datasets"""
+
+import json
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+from drift_protocol.meta import MetaInfo
+
+from drift_client.drift_data_package import DriftDataPackage
+
+EXPORT_FORMATS = ("parquet", "npz")
+
+_METADATA = ("package_id", "source_timestamp", "publish_timestamp", "status", "labels")
+
+
+class _Chunk:
+    """Metadata and decoded payloads of packages in a chunk"""
+
+    def __init__(self, decode: Callable[[DriftDataPackage], np.ndarray]):
+        self._decode = decode
+        self._metadata: Dict[str, list] = {name: [] for name in _METADATA}
+        self._signals: List[Optional[np.ndarray]] = []
+        self._items: Dict[str, list] = {}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, pkg: DriftDataPackage):
+        """Add metadata and decoded payload of package
+
+        Raises:
+            ValueError: if the package is broken
+        """
+        self._metadata["package_id"].append(pkg.package_id)
+        self._metadata["source_timestamp"].append(pkg.source_timestamp)
+        self._metadata["publish_timestamp"].append(pkg.publish_timestamp)
+        self._metadata["status"].append(pkg.status_code)
+        self._metadata["labels"].append(json.dumps(pkg.labels) if pkg.labels else "")
+
+        if pkg.meta.type == MetaInfo.TYPED_DATA:
+            items = pkg.as_typed_data() if pkg.status_code == 0 else {}
+            for name in items.keys() - self._items.keys():
+                # item is missing in the previous packages
+                self._items[name] = [None] * self._size
+            for name, values in self._items.items():
+                values.append(items.get(name))
+            self._signals.append(None)
+        else:
+            signal = self._decode(pkg) if pkg.status_code == 0 else None
+            self._signals.append(signal)
+            for values in self._items.values():
+                values.append(None)
+
+        self._size += 1
+
+    def metadata(self) -> Dict[str, np.ndarray]:
+        """Metadata columns"""
+        return {
+            "package_id": np.array(self._metadata["package_id"], dtype=np.uint64),
+            "source_timestamp": np.array(
+                self._metadata["source_timestamp"], dtype=np.float64
+            ),
+            "publish_timestamp": np.array(
+                self._metadata["publish_timestamp"], dtype=np.float64
+            ),
+            "status": np.array(self._metadata["status"], dtype=np.int32),
+            "labels": np.array(self._metadata["labels"], dtype=np.str_),
+        }
+
+    def signals(self) -> List[Optional[np.ndarray]]:
+        """Signals of packages, None for packages without signal"""
+        return self._signals
+
+    def items(self) -> Dict[str, list]:
+        """Values of typed data by name, None for missing values"""
+        return self._items
+
+
+def _stack_signals(signals: List[Optional[np.ndarray]]) -> Optional[np.ndarray]:
+    """Stack signals into an array, rows without signal are filled with NaN
+    or empty strings"""
+    shapes = {signal.shape for signal in signals if signal is not None}
+    if not shapes:
+        return None
+    if len(shapes) > 1:
+        raise ValueError(f"Values have different shapes: {sorted(shapes)}")
+
+    shape = shapes.pop()
+    dtype = np.result_type(*(signal for signal in signals if signal is not None))
+    missing: Any = "" if dtype.kind in "US" else np.nan
+    if any(signal is None for signal in signals) and dtype.kind in "biu":
+        dtype = np.result_type(dtype, np.float32)
+
+    stacked = np.empty((len(signals), *shape), dtype=dtype)
+    for idx, signal in enumerate(signals):
+        stacked[idx] = missing if signal is None else signal
+    return stacked
+
+
+def _item_array(values: List[Any]) -> np.ndarray:
+    """Convert values of a typed data item, lists are stacked into rows"""
+    arrays = [None if value is None else np.asarray(value) for value in values]
+    stacked = _stack_signals(arrays)
+    if stacked is None:
+        return np.full(len(values), np.nan)
+    return stacked
+
+
+def _write_npz(chunk: _Chunk, file: Path):
+    columns = chunk.metadata()
+    signals = _stack_signals(chunk.signals())
+    if signals is not None:
+        columns["signal"] = signals
+    for name, values in chunk.items().items():
+        columns[f"data.{name}"] = _item_array(values)
+    np.savez(file, **columns)
+
+
+def _write_parquet(chunk: _Chunk, file: Path):
+    # pylint: disable=import-outside-toplevel
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = {name: pa.array(array) for name, array in chunk.metadata().items()}
+    signals = chunk.signals()
+    present = [signal for signal in signals if signal is not None]
+    if present:
+        # signals are flattened into lists, their shapes are kept in columns
+        # "signal_shape" to restore multidimensional signals. The lists have
+        # 64-bit offsets, a chunk can have more than 2^31 samples
+        offsets = np.zeros(len(signals) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([0 if s is None else s.size for s in signals])
+        values = np.concatenate([signal.ravel() for signal in present])
+        mask = pa.array([signal is None for signal in signals])
+        columns["signal"] = pa.LargeListArray.from_arrays(
+            pa.array(offsets), pa.array(values), mask=mask
+        )
+        columns["signal_shape"] = pa.array(
+            [None if s is None else list(s.shape) for s in signals],
+            type=pa.large_list(pa.int64()),
+        )
+    for name, values in chunk.items().items():
+        columns[f"data.{name}"] = pa.array(values)
+
+    pq.write_table(pa.table(columns), file)
+
+
+def _check_parquet():
+    try:
+        import pyarrow  # pylint: disable=import-outside-toplevel,unused-import
+    except ImportError as err:
+        raise ImportError(
+            "Parquet export requires pyarrow, install drift-python-client[export]"
+        ) from err
+
+
+def export(  # pylint: disable=too-many-arguments
+    packages: Iterable[DriftDataPackage],
+    path: Union[str, Path],
+    export_format: str = "parquet",
+    chunk_rows: int = 10_000,
+    scale_factor: int = 0,
+    decode: Optional[Callable[[DriftDataPackage], np.ndarray]] = None,
+) -> List[Path]:
+    """Write packages to a directory as files with up to `chunk_rows` packages.
+    A chunk is written in a background thread while the next one is decoded,
+    so that memory is bounded by two chunks.
+
+    Each file has columns "package_id", "source_timestamp", "publish_timestamp"
+    (in seconds), "status", "labels" (JSON) and the payload: "signal" for
+    WaveletBuffer packages and "data.<name>" for each item of typed data.
+    In Parquet, signals are flattened lists with their shapes in "signal_shape",
+    in NPZ, signals are stacked into an array and must have the same shape.
+    Payloads of bad packages are null in Parquet and NaN in NPZ.
+
+    Args:
+        packages: Packages to export
+        path: Directory for the files `part-<number>.<format>`,
+            created if it doesn't exist
+        export_format: "parquet" or "npz"
+        chunk_rows: Maximal number of packages in a file
+        scale_factor: Wavelet composition factor
+        decode: Function which composes the signal of a package,
+            `DriftDataPackage.as_np` with `scale_factor` if None
+    Returns:
+        Paths of written files
+    Raises:
+        ValueError: if format or chunk_rows is invalid or a package is broken
+        ImportError: if pyarrow isn't installed for Parquet
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(
+            f"Unknown format '{export_format}', "
+            f"supported: {', '.join(EXPORT_FORMATS)}"
+        )
+    if chunk_rows <= 0:
+        raise ValueError("chunk_rows must be positive")
+    if export_format == "parquet":
+        _check_parquet()
+
+    if decode is None:
+
+        def decode(pkg: DriftDataPackage) -> np.ndarray:
+            return pkg.as_np(scale_factor)
+
+    write = _write_parquet if export_format == "parquet" else _write_npz
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    files: List[Path] = []
+    pending: List[Tuple[Future, Path]] = []  # file being written
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+
+        def wait():
+            """Wait for the file being written, a partial file is removed on error"""
+            while pending:
+                future, file = pending.pop()
+                try:
+                    future.result()
+                except BaseException:
+                    file.unlink(missing_ok=True)
+                    raise
+                files.append(file)
+
+        def flush(chunk: _Chunk):
+            wait()
+            file = path / f"part-{len(files):05d}.{export_format}"
+            pending.append((executor.submit(write, chunk, file), file))
+
+        chunk = _Chunk(decode)
+        for pkg in packages:
+            chunk.add(pkg)
+            if len(chunk) == chunk_rows:
+                flush(chunk)
+                chunk = _Chunk(decode)
+
+        if len(chunk) > 0:
+            flush(chunk)
+        wait()
+
+    return files
@@ -1,13 +1,346 @@
 """ Simple InfluxDB client
 """
 
-from typing import List, Tuple, Any, Union, Dict
+import codecs
+import csv
+import io
+import re
+import time
+from typing import List, Tuple, Any, Union, Dict, Iterable, Iterator, Optional
 from urllib.parse import urlparse
 
-from influxdb_client import InfluxDBClient as Client
+import numpy as np
+from influxdb_client import InfluxDBClient as Client, Dialect
+from influxdb_client.client.flux_table import TableList
+from influxdb_client.client.influxdb_client_async import (
+    InfluxDBClientAsync as AsyncClient,
+)
 
+from drift_client.error import DriftClientError
+from drift_client.instrumentation import (
+    BYTES,
+    PARSE_SECONDS,
+    REQUEST_SECONDS,
+    Instrumented,
+)
 
-class InfluxDBClient:
+Columns = Dict[str, Tuple[np.ndarray, np.ndarray]]
+
+_CSV_DIALECT = Dialect(header=True, annotations=["datatype", "group"])
+
+AGGREGATE_FUNCTIONS = (
+    "mean",
+    "median",
+    "min",
+    "max",
+    "sum",
+    "count",
+    "first",
+    "last",
+    "spread",
+    "stddev",
+)
+
+_DURATION = re.compile(r"(\d+(ns|us|µs|ms|s|mo|m|h|d|w|y))+")
+
+_SERVICE_COLUMNS = {"", "result", "table", "_start", "_stop", "_time", "_measurement"}
+
+_VALUE_TYPES = {
+    "double": np.float64,
+    "long": np.int64,
+    "unsignedLong": np.uint64,
+    "boolean": np.bool_,
+}
+
+
+def _make_measurements_query(bucket: str) -> str:
+    return f"""\
+            import \"influxdata/influxdb/schema\"
+
+            schema.measurements(bucket: \"{bucket}\")
+            """
+
+
+def _make_aggregation(every: str, functions: Union[str, List[str]]) -> List[str]:
+    if not _DURATION.fullmatch(every):
+        raise ValueError(f"Invalid duration '{every}'")
+
+    names = [functions] if isinstance(functions, str) else functions
+    for name in names:
+        if name not in AGGREGATE_FUNCTIONS:
+            raise ValueError(
+                f"Unknown aggregate function '{name}', "
+                f"supported: {', '.join(AGGREGATE_FUNCTIONS)}"
+            )
+
+    stages = [
+        f"aggregateWindow(every: {every}, fn: {name}, createEmpty: false)"
+        for name in names
+    ]
+    if isinstance(functions, str):
+        return stages
+
+    # keep results of each function as a separate field with suffix
+    return [
+        f'{stage} |> map(fn: (r) => ({{r with _field: r._field + "_{name}"}}))'
+        for stage, name in zip(stages, names)
+    ]
+
+
+def _make_data_query(  # pylint: disable=too-many-arguments
+    bucket: str,
+    measurement: str,
+    start: int,
+    stop: int,
+    fields: Union[str, List[str], None] = None,
+    pivot: bool = False,
+    **kwargs,
+) -> str:
+    if isinstance(fields, str):
+        fields = [fields]
+
+    filters = ""
+    if fields is not None:
+        filters = (
+            "and (" + " or".join([f' r._field == "{field}"' for field in fields]) + ")"
+        )
+
+    query = (
+        f'from(bucket:"{bucket}") '
+        f"|> range(start:{start}, stop: {stop}) "
+        f'|> filter(fn: (r) => r._measurement == "{measurement}" {filters})'
+    )
+    if kwargs.get("every") is not None:
+        stages = _make_aggregation(kwargs["every"], kwargs.get("fn", "mean"))
+        if len(stages) == 1:
+            query += f" |> {stages[0]}"
+        else:
+            tables = ", ".join(f"data |> {stage}" for stage in stages)
+            query = f"data = {query}\nunion(tables: [{tables}])"
+
+    if pivot:
+        query += (
+            ' |> pivot(rowKey: ["_time"], columnKey: ["_field"], valueColumn: "_value")'
+        )
+    return query
+
+
+def _parse_measurements(response: TableList) -> List[str]:
+    data = []
+    for table in response:
+        for record in table.records:
+            data.append(record.get_value())
+
+    return data
+
+
+def _parse_data(response: TableList) -> Dict[str, List[Tuple[float, Any]]]:
+    data = {}
+    for table in response:
+        for record in table.records:
+            field = record.get_field()
+            if field not in data:
+                data[field] = []
+            data[field].append((record.get_time().timestamp(), record.get_value()))
+
+    return data
+
+
+def _pivot_kind(kind: str) -> str:
+    """Numeric fields are converted to float after pivot to keep missing values"""
+    return "double" if kind in ("long", "unsignedLong") else kind
+
+
+def _convert(cells: List[str], kind: str) -> np.ndarray:
+    if kind.startswith("dateTime"):
+        # numpy doesn't parse timezones, InfluxDB returns UTC time
+        return np.array(
+            [cell.rstrip("Z") or "NaT" for cell in cells], dtype="datetime64[ns]"
+        ).view(np.int64)
+    if kind == "boolean":
+        return np.array(cells) == "true"
+    if kind == "double" and "" in cells:
+        return np.array([cell or "nan" for cell in cells], dtype=np.float64)
+    return np.array(cells, dtype=_VALUE_TYPES.get(kind, object))
+
+
+class _Array:
+    """Array of CSV cells which grows chunk by chunk"""
+
+    def __init__(self, kind: str, chunk_size: int):
+        """
+        :param kind: datatype annotation of the column
+        :param chunk_size: number of cells converted at once
+        """
+        self._kind = kind
+        self._chunk_size = chunk_size
+        dtype = np.int64 if kind.startswith("dateTime") else _VALUE_TYPES.get(kind)
+        self._array = np.empty(chunk_size, dtype=dtype or object)
+        self._size = 0
+        self._chunk: List[str] = []
+
+    def __len__(self) -> int:
+        return self._size + len(self._chunk)
+
+    def append(self, cell: str):
+        """Add a cell, the chunk is converted when it is full"""
+        self._chunk.append(cell)
+        if len(self._chunk) >= self._chunk_size:
+            self.flush()
+
+    def set_kind(self, kind: str):
+        """Change type of cells, numbers of different types are converted to float,
+        other types are kept as objects converted by their own type"""
+        if kind == self._kind:
+            return
+
+        self.flush()
+        numeric = ("double", "long", "unsignedLong")
+        if self._array.dtype != object and self._kind in numeric and kind in numeric:
+            self._kind = "double"
+            self._array = self._array.astype(np.float64)
+        else:
+            self._kind = kind
+            self._array = self._array.astype(object)
+
+    def flush(self):
+        """Convert the current chunk and copy it into the array"""
+        count = len(self._chunk)
+        if count == 0:
+            return
+
+        size = self._size + count
+        if size > len(self._array):
+            self._array = np.resize(self._array, max(size, 2 * len(self._array)))
+
+        self._array[self._size : size] = _convert(self._chunk, self._kind)
+        self._size = size
+        self._chunk.clear()
+
+    def array(self) -> np.ndarray:
+        """Return converted cells"""
+        self.flush()
+        return self._array[: self._size]
+
+
+def _iter_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    tail = ""
+    for chunk in chunks:
+        lines = (tail + decoder.decode(chunk)).splitlines(keepends=True)
+        tail = lines.pop() if lines and not lines[-1].endswith("\n") else ""
+        yield from lines
+
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def _measure_chunks(chunks: Iterable[bytes], transfer: list) -> Iterator[bytes]:
+    """Add size of chunks and time to receive them to `transfer`"""
+    iterator = iter(chunks)
+    while True:
+        started = time.perf_counter()
+        chunk = next(iterator, None)
+        transfer[1] += time.perf_counter() - started
+        if chunk is None:
+            return
+        transfer[0] += len(chunk)
+        yield chunk
+
+
+def _read_rows(
+    lines: Iterable[str],
+) -> Iterator[Tuple[List[str], Dict[str, List[str]], List[str]]]:
+    """Read rows of annotated CSV with the header and annotations of their table"""
+    annotations: Dict[str, List[str]] = {}
+    header: Optional[List[str]] = None
+    for row in csv.reader(lines):
+        if not row or row == [""]:
+            # tables with different schemas are separated by an empty line
+            header = None
+        elif row[0].startswith("#"):
+            annotations[row[0]] = row
+            header = None
+        elif header is None:
+            header = row
+        elif "error" in header:
+            raise DriftClientError(
+                f"Failed to query InfluxDB: {row[header.index('error')]}"
+            )
+        else:
+            yield header, annotations, row
+
+
+def _parse_columns(lines: Iterable[str], chunk_size: int) -> Columns:
+    """Parse annotated CSV response of InfluxDB into numpy arrays per field"""
+    columns: Dict[str, Tuple[_Array, _Array]] = {}
+    current = None
+    for header, annotations, row in _read_rows(lines):
+        if header is not current:
+            current = header
+            time_idx = header.index("_time")
+            value_idx = header.index("_value")
+            field_idx = header.index("_field")
+            datatypes = annotations.get("#datatype")
+            kind = datatypes[value_idx] if datatypes else "string"
+
+        field = row[field_idx]
+        if field not in columns:
+            columns[field] = (_Array("dateTime", chunk_size), _Array(kind, chunk_size))
+        times, values = columns[field]
+        values.set_kind(kind)
+        times.append(row[time_idx])
+        values.append(row[value_idx])
+
+    return {
+        field: (times.array(), values.array())
+        for field, (times, values) in columns.items()
+    }
+
+
+def _parse_table(  # pylint: disable=too-many-locals
+    lines: Iterable[str], chunk_size: int
+) -> Dict[str, np.ndarray]:
+    """Parse annotated CSV response of pivoted query into numpy arrays
+    with a shared time column"""
+    times = _Array("dateTime", chunk_size)
+    fields: Dict[str, _Array] = {}
+    current = None
+    for header, annotations, row in _read_rows(lines):
+        if header is not current:
+            current = header
+            groups = annotations.get("#group", [])
+            datatypes = annotations.get("#datatype", [])
+            time_idx = header.index("_time")
+            field_idx = {}
+            for idx, name in enumerate(header):
+                if name in _SERVICE_COLUMNS or groups[idx : idx + 1] == ["true"]:
+                    continue
+
+                kind = _pivot_kind(datatypes[idx] if datatypes else "string")
+                if name not in fields:
+                    fields[name] = _Array(kind, chunk_size)
+                    # field is missing in the previous tables
+                    for _ in range(len(times)):
+                        fields[name].append("")
+                fields[name].set_kind(kind)
+                field_idx[name] = idx
+
+            missing = [array for name, array in fields.items() if name not in field_idx]
+
+        times.append(row[time_idx])
+        for name, idx in field_idx.items():
+            fields[name].append(row[idx])
+        for array in missing:
+            array.append("")
+
+    table = {"time": times.array()}
+    table.update((name, array.array()) for name, array in fields.items())
+    return table
+
+
+class InfluxDBClient(Instrumented):
     """Wrapper around `InfluxDBClient`"""
 
     def __init__(
@@ -41,55 +374,245 @@ class InfluxDBClient:
         :return: List of measurements
         :rtype: List[str]
         """
-        response = self.__query_api.query(
-            f"""\
-            import \"influxdata/influxdb/schema\"
+        response = self.__query_api.query(_make_measurements_query(self.__bucket))
+        return _parse_measurements(response)
 
-            schema.measurements(bucket: \"{self.__bucket}\")
-            """
+    def query_data(
+        self,
+        measurement: str,
+        start: int,
+        stop: int,
+        fields: Union[str, List[str], None] = None,
+    ) -> Dict[str, List[Tuple[float, Any, str]]]:
+        """InfluxDB queries for values"""
+        query = _make_data_query(self.__bucket, measurement, start, stop, fields)
+        response = self.__query_api.query(query)
+        return _parse_data(response)
+
+    def query_columns(  # pylint: disable=too-many-arguments
+        self,
+        measurement: str,
+        start: int,
+        stop: int,
+        fields: Union[str, List[str], None] = None,
+        chunk_size: int = 10_000,
+        **kwargs,
+    ) -> Columns:
+        """InfluxDB queries for values streaming the response into numpy arrays
+
+        :param measurement: measurement
+        :type measurement: str
+        :param start: start of time range, UNIX timestamp in seconds
+        :type start: int
+        :param stop: stop of time range, UNIX timestamp in seconds
+        :type stop: int
+        :param fields: name or names of fields, if None all fields are queried
+        :type fields: Union[str, List[str], None]
+        :param chunk_size: number of rows converted into arrays at once
+        :type chunk_size: int
+        :key every: duration of windows to aggregate values on the server,
+            e.g. "1s" or "1m", if None raw values are queried
+        :key fn: aggregate function or list of functions, for a list the names
+            of fields get suffix "_<fn>". Default: "mean"
+        :return: times in nanoseconds (int64) and values for each field
+        :rtype: Dict[str, Tuple[np.ndarray, np.ndarray]]
+        """
+        query = _make_data_query(
+            self.__bucket, measurement, start, stop, fields, **kwargs
         )
+        return self.__query_csv(query, _parse_columns, chunk_size)
 
-        data = []
-        for table in response:
-            for record in table.records:
-                data.append(record.get_value())
+    def query_table(  # pylint: disable=too-many-arguments
+        self,
+        measurement: str,
+        start: int,
+        stop: int,
+        fields: Union[str, List[str], None] = None,
+        chunk_size: int = 10_000,
+        **kwargs,
+    ) -> Dict[str, np.ndarray]:
+        """InfluxDB queries for values pivoted by time on the server
 
-        return data
+        :param measurement: measurement
+        :type measurement: str
+        :param start: start of time range, UNIX timestamp in seconds
+        :type start: int
+        :param stop: stop of time range, UNIX timestamp in seconds
+        :type stop: int
+        :param fields: name or names of fields, if None all fields are queried
+        :type fields: Union[str, List[str], None]
+        :param chunk_size: number of rows converted into arrays at once
+        :type chunk_size: int
+        :key every: duration of windows to aggregate values on the server,
+            e.g. "1s" or "1m", if None raw values are queried
+        :key fn: aggregate function or list of functions, for a list the names
+            of fields get suffix "_<fn>". Default: "mean"
+        :return: column "time" with times in nanoseconds (int64) and
+            a column for each field, numeric fields are float64 with NaN
+            for missing values
+        :rtype: Dict[str, np.ndarray]
+        """
+        query = _make_data_query(
+            self.__bucket, measurement, start, stop, fields, pivot=True, **kwargs
+        )
+        return self.__query_csv(query, _parse_table, chunk_size)
 
-    def query_data(
+    def close(self):
+        """Close HTTP connections"""
+        self.__client.close()
+
+    def __query_csv(self, query: str, parse, chunk_size: int):
+        hook = self._hook
+        started = time.perf_counter() if hook else 0.0
+        response = self.__query_api.query_raw(query, dialect=_CSV_DIALECT)
+        transfer = [0, time.perf_counter() - started if hook else 0.0]
+        try:
+            chunks = response.stream()
+            if hook:
+                chunks = _measure_chunks(chunks, transfer)
+            result = parse(_iter_lines(chunks), chunk_size)
+        finally:
+            response.release_conn()
+
+        if hook:
+            size, request = transfer
+            hook("influxdb", REQUEST_SECONDS, request)
+            hook("influxdb", BYTES, size)
+            hook("influxdb", PARSE_SECONDS, time.perf_counter() - started - request)
+        return result
+
+
+class AsyncInfluxDBClient(Instrumented):
+    """Wrapper around `InfluxDBClientAsync`"""
+
+    def __init__(
+        self, uri: str, org: str, token: str, secure: bool, timeout: float
+    ):  # pylint: disable=too-many-arguments
+        """Create asynchronous Client for InfluxDB access,
+        must be created inside a running event loop
+
+        :param uri: URI, format: <protocol>://<host>:<port>
+        :type uri: str
+        :param org: organisation
+        :type org: str
+        :param token: token
+        :type token: str
+        :param secure: encryption enabled
+        :type secure: bool
+        """
+        self.__uri = urlparse(uri)
+        self.__client = AsyncClient(
+            url=f"{self.__uri.scheme}://{self.__uri.netloc}",
+            org=org,
+            token=token,
+            verify_ssl=secure,
+            timeout=int(timeout * 1000),
+        )
+        self.__query_api = self.__client.query_api()
+        self.__bucket = "data"
+
+    async def query_measurements(self) -> List[str]:
+        """InfluxDB query for measurements
+
+        :return: List of measurements
+        :rtype: List[str]
+        """
+        response = await self.__query_api.query(_make_measurements_query(self.__bucket))
+        return _parse_measurements(response)
+
+    async def query_data(
         self,
         measurement: str,
         start: int,
         stop: int,
         fields: Union[str, List[str], None] = None,
-    ) -> Dict[str, List[Tuple[float, Any, str]]]:
+    ) -> Dict[str, List[Tuple[float, Any]]]:
         """InfluxDB queries for values"""
-        # Change time format for request
-        if isinstance(fields, str):
-            fields = [fields]
-
-        filters = ""
-        if fields is not None:
-            filters = (
-                "and ("
-                + " or".join([f' r._field == "{field}"' for field in fields])
-                + ")"
-            )
+        query = _make_data_query(self.__bucket, measurement, start, stop, fields)
+        response = await self.__query_api.query(query)
+        return _parse_data(response)
 
-        query = (
-            f'from(bucket:"{self.__bucket}") '
-            f"|> range(start:{start}, stop: {stop}) "
-            f'|> filter(fn: (r) => r._measurement == "{measurement}" {filters})'
+    async def query_columns(  # pylint: disable=too-many-arguments
+        self,
+        measurement: str,
+        start: int,
+        stop: int,
+        fields: Union[str, List[str], None] = None,
+        chunk_size: int = 10_000,
+        **kwargs,
+    ) -> Columns:
+        """InfluxDB queries for values parsing the response into numpy arrays
+
+        :param measurement: measurement
+        :type measurement: str
+        :param start: start of time range, UNIX timestamp in seconds
+        :type start: int
+        :param stop: stop of time range, UNIX timestamp in seconds
+        :type stop: int
+        :param fields: name or names of fields, if None all fields are queried
+        :type fields: Union[str, List[str], None]
+        :param chunk_size: number of rows converted into arrays at once
+        :type chunk_size: int
+        :key every: duration of windows to aggregate values on the server,
+            e.g. "1s" or "1m", if None raw values are queried
+        :key fn: aggregate function or list of functions, for a list the names
+            of fields get suffix "_<fn>". Default: "mean"
+        :return: times in nanoseconds (int64) and values for each field
+        :rtype: Dict[str, Tuple[np.ndarray, np.ndarray]]
+        """
+        query = _make_data_query(
+            self.__bucket, measurement, start, stop, fields, **kwargs
         )
+        return await self.__query_csv(query, _parse_columns, chunk_size)
 
-        response = self.__query_api.query(query)
+    async def query_table(  # pylint: disable=too-many-arguments
+        self,
+        measurement: str,
+        start: int,
+        stop: int,
+        fields: Union[str, List[str], None] = None,
+        chunk_size: int = 10_000,
+        **kwargs,
+    ) -> Dict[str, np.ndarray]:
+        """InfluxDB queries for values pivoted by time on the server
+
+        :param measurement: measurement
+        :type measurement: str
+        :param start: start of time range, UNIX timestamp in seconds
+        :type start: int
+        :param stop: stop of time range, UNIX timestamp in seconds
+        :type stop: int
+        :param fields: name or names of fields, if None all fields are queried
+        :type fields: Union[str, List[str], None]
+        :param chunk_size: number of rows converted into arrays at once
+        :type chunk_size: int
+        :key every: duration of windows to aggregate values on the server,
+            e.g. "1s" or "1m", if None raw values are queried
+        :key fn: aggregate function or list of functions, for a list the names
+            of fields get suffix "_<fn>". Default: "mean"
+        :return: column "time" with times in nanoseconds (int64) and
+            a column for each field, numeric fields are float64 with NaN
+            for missing values
+        :rtype: Dict[str, np.ndarray]
+        """
+        query = _make_data_query(
+            self.__bucket, measurement, start, stop, fields, pivot=True, **kwargs
+        )
+        return await self.__query_csv(query, _parse_table, chunk_size)
+
+    async def close(self):
+        """Close HTTP session"""
+        await self.__client.close()
 
-        data = {}
-        for table in response:
-            for record in table.records:
-                field = record.get_field()
-                if field not in data:
-                    data[field] = []
-                data[field].append((record.get_time().timestamp(), record.get_value()))
+    async def __query_csv(self, query: str, parse, chunk_size: int):
+        hook = self._hook
+        started = time.perf_counter() if hook else 0.0
+        response = await self.__query_api.query_raw(query, dialect=_CSV_DIALECT)
+        received = time.perf_counter() if hook else 0.0
+        result = parse(io.StringIO(response, newline=""), chunk_size)
 
-        return data
+        if hook:
+            hook("influxdb", REQUEST_SECONDS, received - started)
+            hook("influxdb", BYTES, len(response))
+            hook("influxdb", PARSE_SECONDS, time.perf_counter() - received)
+        return result
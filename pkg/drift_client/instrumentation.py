@@ -0,0 +1,154 @@
+"""Instrumentation of the hot paths of the client
+
+The clients report measurements to a hook, a function which is called with
+the name of the source (e.g. "reductstore", "influxdb", "mqtt"), the name of
+the metric and its value. Without a hook, the clients don't measure anything.
+"""
+
+import math
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+Hook = Callable[[str, str, float], None]
+
+REQUEST_SECONDS = "request_seconds"
+"""Time of a request or of receiving a record from storage"""
+BYTES = "bytes"
+"""Size of a transferred record, response or message"""
+PARSE_SECONDS = "parse_seconds"
+"""Time to parse a package or a query response"""
+DECODE_SECONDS = "decode_seconds"
+"""Time to compose data of a package to a NumPy array"""
+QUEUE_WAIT_SECONDS = "queue_wait_seconds"
+"""Time which an item waits in a queue or a consumer waits for an item"""
+HANDLER_SECONDS = "handler_seconds"
+"""Time of a message handler"""
+
+# 4 buckets per power of 2, so that quantiles have error less than 19%
+_BUCKETS_PER_OCTAVE = 4
+
+
+class Instrumented:  # pylint: disable=too-few-public-methods
+    """Mixin of clients which report measurements to a hook"""
+
+    _hook: Optional[Hook] = None
+
+    def instrument(self, hook: Optional[Hook]):
+        """Set hook for measurements
+
+        Args:
+            hook: Function called with source, metric and value,
+                None disables instrumentation
+        """
+        self._hook = hook
+
+
+@dataclass
+class Histogram:
+    """Histogram of values with logarithmic buckets,
+    zero and negative values are counted in a separate underflow bucket"""
+
+    count: int = 0
+    total: float = 0.0
+    min: float = math.inf
+    max: float = -math.inf
+    underflow: int = 0
+    buckets: Dict[int, int] = field(default_factory=dict, repr=False)
+
+    def add(self, value: float):
+        """Add value to histogram"""
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if value <= 0:
+            self.underflow += 1
+            return
+
+        bucket = math.floor(math.log2(value) * _BUCKETS_PER_OCTAVE)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    @property
+    def mean(self) -> float:
+        """Mean value"""
+        return self.total / self.count if self.count else math.nan
+
+    def quantile(self, quantile: float) -> float:
+        """Estimate quantile by upper bound of its bucket
+
+        Args:
+            quantile: Quantile between 0 and 1
+        Returns:
+            Estimated value, NaN if histogram is empty
+        """
+        if not self.count:
+            return math.nan
+        if quantile <= 0:
+            return self.min
+
+        rank = quantile * self.count
+        seen = self.underflow
+        if seen >= rank:
+            return max(self.min, min(0.0, self.max))
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                upper = 2 ** ((bucket + 1) / _BUCKETS_PER_OCTAVE)
+                return max(self.min, min(upper, self.max))
+        return self.max
+
+    def copy(self) -> "Histogram":
+        """Copy of histogram"""
+        return Histogram(
+            self.count,
+            self.total,
+            self.min,
+            self.max,
+            self.underflow,
+            dict(self.buckets),
+        )
+
+
+class Stats:
+    """Hook which collects measurements into histograms per source and metric
+
+    Examples:
+        >>> stats = Stats()
+        >>> client = DriftClient("127.0.0.1", "PASSWORD", instrumentation=stats)
+        >>> for pkg in client.walk("topic-1", "2022-02-03 10:00:00",
+        >>>         "2022-02-03 10:00:10"):
+        >>>     pass
+        >>> for (source, metric), hist in stats.snapshot().items():
+        >>>     print(source, metric, hist.count, hist.quantile(0.99))
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+
+    def __call__(self, source: str, metric: str, value: float):
+        with self._lock:
+            key = (source, metric)
+            if key not in self._histograms:
+                self._histograms[key] = Histogram()
+            self._histograms[key].add(value)
+
+    def snapshot(self) -> Dict[Tuple[str, str], Histogram]:
+        """Copy of histograms by source and metric"""
+        with self._lock:
+            return {key: hist.copy() for key, hist in self._histograms.items()}
+
+    def reset(self):
+        """Remove all measurements"""
+        with self._lock:
+            self._histograms.clear()
+
+    def report(self) -> List[str]:
+        """Lines with count, mean, p50, p99 and max of each histogram"""
+        return [
+            f"{source} {metric}: count={hist.count} mean={hist.mean:.6g} "
+            f"p50={hist.quantile(0.5):.6g} p99={hist.quantile(0.99):.6g} "
+            f"max={hist.max:.6g}"
+            for (source, metric), hist in sorted(self.snapshot().items())
+        ]
@@ -0,0 +1,576 @@
+"""Local archive of packages and metrics to replay data without a device
+
+An archive is a directory with the following layout for each topic:
+
+* `<topic>.pack` - pack file of `drift_client.pack`, or
+* `<topic>/<timestamp>.dp` - a file per package, the same layout as
+  in the storage of a device and in the cache of `DriftClient`
+* `<topic>.metrics/<name>.npy` - columns of a metrics table, "time" in
+  nanoseconds and a column for each metric, see `save_metrics`
+
+`LocalStorageClient` is used in place of `ReductStoreClient` or `MinIOClient`
+and `LocalMetricsClient` in place of `InfluxDBClient`, when `DriftClient`
+is created with the option `archive_dir`.
+"""
+
+import math
+import mmap
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+
+from drift_client.aggregation import parse_window
+from drift_client.error import DriftClientError
+from drift_client.influxdb_client import AGGREGATE_FUNCTIONS, Columns
+from drift_client.instrumentation import BYTES, REQUEST_SECONDS, Instrumented
+from drift_client.pack import PackReader
+
+_PACK_SUFFIX = ".pack"
+_METRICS_SUFFIX = ".metrics"
+
+_FUNCTIONS: Dict[str, Callable[[np.ndarray], Any]] = {
+    "mean": np.mean,
+    "median": np.median,
+    "min": np.min,
+    "max": np.max,
+    "sum": np.sum,
+    "count": len,
+    "first": lambda values: values[0],
+    "last": lambda values: values[-1],
+    "spread": np.ptp,
+    "stddev": lambda values: np.std(values, ddof=1) if len(values) > 1 else math.nan,
+}
+_ANY_TYPE_FUNCTIONS = ("count", "first", "last")
+
+
+def list_topics(path: Union[str, Path]) -> List[str]:
+    """Topics in archive directory
+
+    Args:
+        path: Archive directory
+    Returns:
+        Sorted names of topics with packages or metrics
+    """
+    topics = set()
+    for entry in Path(path).iterdir():
+        if entry.name.startswith("."):
+            continue
+        if entry.is_dir() and entry.name.endswith(_METRICS_SUFFIX):
+            topics.add(entry.name[: -len(_METRICS_SUFFIX)])
+        elif entry.is_dir() or entry.name.endswith(_PACK_SUFFIX):
+            topics.add(
+                entry.name[: -len(_PACK_SUFFIX)] if entry.is_file() else entry.name
+            )
+    return sorted(topics)
+
+
+def _check_name(name: str) -> str:
+    if name in ("", ".", "..") or "/" in name or os.sep in name:
+        raise ValueError(f"Invalid name '{name}'")
+    return name
+
+
+def _parse_path(path: str) -> Tuple[str, int]:
+    """Topic and timestamp in milliseconds of package path `topic/timestamp.dp`"""
+    try:
+        topic, name = path.split("/")
+        if not name.endswith(".dp"):
+            raise ValueError(f"Invalid package name '{path}'")
+        return _check_name(topic), int(name[:-3])
+    except ValueError as err:
+        raise DriftClientError(f"Could not read item at {path}") from err
+
+
+def _read_file(file: Path) -> memoryview:
+    if file.stat().st_size == 0:
+        return memoryview(b"")
+    with open(file, "rb") as package_file:
+        return memoryview(mmap.mmap(package_file.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+class LocalStorageClient(Instrumented):
+    """Storage which reads packages from a local archive through memory maps"""
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Args:
+            path: Archive directory
+        Raises:
+            FileNotFoundError: if the directory doesn't exist
+        """
+        self._path = Path(path)
+        if not self._path.is_dir():
+            raise FileNotFoundError(f"Archive directory {path} doesn't exist")
+
+        self._lock = threading.Lock()
+        self._readers: Dict[str, PackReader] = {}
+        self._indexes: Dict[str, np.ndarray] = {}
+
+    def check_package_list(self, package_names: List[str]) -> list:
+        """Check if packages exist in archive"""
+        return [name for name in package_names if self._contains(name)]
+
+    def fetch_data(self, path: str) -> Optional[memoryview]:
+        """Read package from archive
+
+        Args:
+            path: path in format `topic/timestamp.dp`
+        Returns:
+            Memory mapped package
+        Raises:
+            DriftClientError: if the package isn't in archive
+        """
+        hook = self._hook
+        started = time.perf_counter() if hook else 0.0
+
+        topic, timestamp = _parse_path(path)
+        reader = self._reader(topic)
+        data = None
+        if reader is not None:
+            data = reader.find(timestamp / 1000)
+        elif self._index(topic) is not None:
+            try:
+                data = _read_file(self._path / topic / f"{timestamp}.dp")
+            except FileNotFoundError:
+                pass
+
+        if data is None:
+            raise DriftClientError(f"Could not read item at {path}")
+
+        if hook:
+            hook(self.name(), REQUEST_SECONDS, time.perf_counter() - started)
+            hook(self.name(), BYTES, len(data))
+        return data
+
+    def fetch_many(
+        self, paths: Iterable[str], max_workers: int, ordered: bool = True
+    ) -> Iterator[memoryview]:
+        """Read packages from archive one by one, memory maps don't need
+        concurrent requests
+
+        Args:
+            paths: paths in format `topic/timestamp.dp`
+            max_workers: ignored
+            ordered: ignored, packages are always returned in order of paths
+        Raises:
+            DriftClientError: if a package isn't in archive
+        """
+        _ = max_workers, ordered
+        for path in paths:
+            yield self.fetch_data(path)
+
+    def walk(self, entry: str, start: int, stop: int, **kwargs) -> Iterator[memoryview]:
+        """
+        Walk through the packages of a topic between start and stop
+        in order of source timestamp.
+        Args:
+            entry: topic name
+            start: start timestamp UNIX in seconds
+            stop: stop timestamp UNIX in seconds
+        Keyword Args:
+            ttl, prefetch, shards: ignored, packages are read from memory maps
+        Raises:
+            DriftClientError: if the topic isn't in archive
+        """
+        _ = kwargs
+        hook = self._hook
+        reader = self._reader(entry)
+        if reader is not None:
+            blobs = reader.range(start, stop)
+        else:
+            index = self._index(entry)
+            if index is None:
+                raise DriftClientError(
+                    f"Failed to fetch data from {entry}: not found in {self._path}"
+                )
+            first, last = np.searchsorted(index, (start * 1000, stop * 1000))
+            blobs = (
+                _read_file(self._path / entry / f"{timestamp}.dp")
+                for timestamp in index[first:last].tolist()
+            )
+
+        started = time.perf_counter() if hook else 0.0
+        for blob in blobs:
+            if hook:
+                hook(self.name(), REQUEST_SECONDS, time.perf_counter() - started)
+                hook(self.name(), BYTES, len(blob))
+            yield blob
+            if hook:
+                started = time.perf_counter()
+
+    def close(self):
+        """Release memory maps of pack files"""
+        with self._lock:
+            for reader in self._readers.values():
+                reader.close()
+            self._readers.clear()
+            self._indexes.clear()
+
+    @staticmethod
+    def name() -> str:
+        """Return name of the storage"""
+        return "local"
+
+    def _contains(self, path: str) -> bool:
+        try:
+            topic, timestamp = _parse_path(path)
+        except DriftClientError:
+            return False
+
+        reader = self._reader(topic)
+        index = reader.timestamps if reader is not None else self._index(topic)
+        if index is None:
+            return False
+        idx = np.searchsorted(index, timestamp)
+        return idx < len(index) and index[idx] == timestamp
+
+    def _reader(self, topic: str) -> Optional[PackReader]:
+        with self._lock:
+            if topic not in self._readers:
+                file = self._path / f"{_check_name(topic)}{_PACK_SUFFIX}"
+                if not file.is_file():
+                    return None
+                self._readers[topic] = PackReader(file)
+            return self._readers[topic]
+
+    def _index(self, topic: str) -> Optional[np.ndarray]:
+        """Sorted timestamps in milliseconds of packages in topic directory"""
+        with self._lock:
+            if topic not in self._indexes:
+                directory = self._path / _check_name(topic)
+                if not directory.is_dir():
+                    return None
+                timestamps = [
+                    int(entry.name[:-3])
+                    for entry in os.scandir(directory)
+                    if entry.name.endswith(".dp") and entry.name[:-3].isdigit()
+                ]
+                self._indexes[topic] = np.sort(np.array(timestamps, dtype=np.int64))
+            return self._indexes[topic]
+
+
+def _is_missing(values: np.ndarray) -> np.ndarray:
+    """Missing values of pivoted table: NaN or empty string"""
+    if values.dtype.kind == "f":
+        return np.isnan(values)
+    if values.dtype.kind == "U":
+        return values == ""
+    if values.dtype.kind == "O":
+        return np.array([value is None or value == "" for value in values], bool)
+    return np.zeros(len(values), dtype=bool)
+
+
+def _aggregate(
+    times: np.ndarray, values: np.ndarray, every: int, stop: int, function: str
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Aggregate values in windows aligned to UNIX epoch as `aggregateWindow`
+    of InfluxDB, the time of a window is its end"""
+    if len(times) == 0:
+        return times, values
+
+    windows = times // every
+    starts = np.flatnonzero(np.diff(windows, prepend=windows[0] - 1))
+    ends = np.append(starts[1:], len(times))
+    aggregated = np.array(
+        [_FUNCTIONS[function](values[begin:end]) for begin, end in zip(starts, ends)]
+    )
+    return np.minimum((windows[starts] + 1) * every, stop), aggregated
+
+
+def _pivot(columns: Columns) -> Dict[str, np.ndarray]:
+    """Align columns on time, numeric columns become float64 with NaN for
+    missing values as in pivoted query of InfluxDB"""
+    times = np.unique(np.concatenate([t for t, _ in columns.values()]))
+    table = {"time": times}
+    for name, (field_times, values) in columns.items():
+        if values.dtype.kind in "UO":
+            column = np.full(len(times), "", dtype=object)
+        else:
+            column = np.full(len(times), np.nan)
+        column[np.searchsorted(times, field_times)] = values
+        table[name] = column
+    return table
+
+
+def _check_aggregation(every: str, functions: Union[str, List[str]]):
+    names = [functions] if isinstance(functions, str) else functions
+    for name in names:
+        if name not in AGGREGATE_FUNCTIONS:
+            raise ValueError(
+                f"Unknown aggregate function '{name}', "
+                f"supported: {', '.join(AGGREGATE_FUNCTIONS)}"
+            )
+    try:
+        seconds = parse_window(every)
+    except ValueError as err:
+        raise ValueError(f"Invalid duration '{every}'") from err
+    return int(seconds * 1e9), names
+
+
+class LocalMetricsClient(Instrumented):
+    """Metrics tables in a local archive with the interface of `InfluxDBClient`
+
+    The columns of the tables are memory-mapped and the rows of a time range
+    are found by binary search of the sorted time column.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Args:
+            path: Archive directory
+        """
+        self._path = Path(path)
+
+    def query_measurements(self) -> List[str]:
+        """Topics in archive"""
+        return list_topics(self._path)
+
+    def query_data(
+        self,
+        measurement: str,
+        start: int,
+        stop: int,
+        fields: Union[str, List[str], None] = None,
+    ) -> Dict[str, List[Tuple[float, Any]]]:
+        """Values of metrics with timestamps in seconds"""
+        columns = self.query_columns(measurement, start, stop, fields)
+        return {
+            field: list(zip((times / 1e9).tolist(), values.tolist()))
+            for field, (times, values) in columns.items()
+        }
+
+    def query_columns(  # pylint: disable=too-many-arguments,too-many-locals
+        self,
+        measurement: str,
+        start: int,
+        stop: int,
+        fields: Union[str, List[str], None] = None,
+        chunk_size: int = 10_000,
+        **kwargs,
+    ) -> Columns:
+        """Read values of metrics in time range without missing values
+
+        Args:
+            measurement: topic
+            start: start of time range, UNIX timestamp in seconds
+            stop: stop of time range, UNIX timestamp in seconds
+            fields: name or names of metrics, if None all metrics are read
+            chunk_size: ignored
+        KwArgs:
+            every: duration of windows to aggregate values, e.g. "1s" or "1m",
+                if None raw values are read
+            fn: aggregate function or list of functions, for a list the names
+                of metrics get suffix "_<fn>". Default: "mean"
+        Returns:
+            Times in nanoseconds (int64) and values for each metric
+        Raises:
+            ValueError: if every or fn is invalid
+        """
+        _ = chunk_size
+        table = self._read_table(measurement, start, stop, fields)
+        if not table:
+            return {}
+
+        times = table.pop("time")
+        columns = {}
+        for name, values in table.items():
+            present = ~_is_missing(values)
+            columns[name] = (times[present], values[present])
+
+        if kwargs.get("every") is None:
+            return columns
+
+        function_option = kwargs.get("fn", "mean")
+        every, functions = _check_aggregation(kwargs["every"], function_option)
+        aggregated = {}
+        for function in functions:
+            for name, (field_times, values) in columns.items():
+                if values.dtype.kind in "UO" and function not in _ANY_TYPE_FUNCTIONS:
+                    continue
+                if not isinstance(function_option, str):
+                    name = f"{name}_{function}"
+                aggregated[name] = _aggregate(
+                    field_times, values, every, stop * 1_000_000_000, function
+                )
+        return aggregated
+
+    def query_table(  # pylint: disable=too-many-arguments
+        self,
+        measurement: str,
+        start: int,
+        stop: int,
+        fields: Union[str, List[str], None] = None,
+        chunk_size: int = 10_000,
+        **kwargs,
+    ) -> Dict[str, np.ndarray]:
+        """Read metrics in time range as a table
+
+        Args:
+            measurement: topic
+            start: start of time range, UNIX timestamp in seconds
+            stop: stop of time range, UNIX timestamp in seconds
+            fields: name or names of metrics, if None all metrics are read
+            chunk_size: ignored
+        KwArgs:
+            every: duration of windows to aggregate values, e.g. "1s" or "1m",
+                if None raw values are read
+            fn: aggregate function or list of functions, for a list the names
+                of metrics get suffix "_<fn>". Default: "mean"
+        Returns:
+            Column "time" with times in nanoseconds (int64) and a column
+                for each metric, numeric metrics are float64 with NaN
+                for missing values
+        Raises:
+            ValueError: if every or fn is invalid
+        """
+        if kwargs.get("every") is not None:
+            columns = self.query_columns(
+                measurement, start, stop, fields, chunk_size, **kwargs
+            )
+            return _pivot(columns) if columns else {}
+
+        table = self._read_table(measurement, start, stop, fields)
+        for name, values in table.items():
+            if name != "time" and values.dtype.kind in "biu":
+                table[name] = values.astype(np.float64)
+        return table
+
+    def close(self):
+        """Nothing to close, memory maps are released with arrays"""
+
+    def _read_table(
+        self,
+        measurement: str,
+        start: int,
+        stop: int,
+        fields: Union[str, List[str], None],
+    ) -> Dict[str, np.ndarray]:
+        directory = self._path / f"{_check_name(measurement)}{_METRICS_SUFFIX}"
+        if not (directory / "time.npy").is_file():
+            return {}
+
+        if isinstance(fields, str):
+            fields = [fields]
+        if fields is None:
+            fields = sorted(
+                file.stem for file in directory.glob("*.npy") if file.stem != "time"
+            )
+
+        times = np.load(directory / "time.npy", mmap_mode="r")
+        first, last = np.searchsorted(
+            times, (start * 1_000_000_000, stop * 1_000_000_000)
+        )
+        table = {"time": np.array(times[first:last])}
+        for field in fields:
+            file = directory / f"{_check_name(field)}.npy"
+            if file.is_file():
+                table[field] = np.array(np.load(file, mmap_mode="r")[first:last])
+        return table
+
+
+def _to_saveable(values: np.ndarray) -> np.ndarray:
+    """Convert object arrays to numbers or strings to save them without pickle"""
+    if values.dtype.kind != "O":
+        return values
+    try:
+        return values.astype(np.float64)
+    except (TypeError, ValueError):
+        return np.array(["" if value is None else str(value) for value in values])
+
+
+def _fill(values: Optional[np.ndarray], size: int, like: np.ndarray) -> np.ndarray:
+    if values is not None:
+        return values
+    if size == 0:
+        return np.empty(0, dtype=like.dtype)
+    if like.dtype.kind == "U":
+        return np.full(size, "", dtype=like.dtype)
+    return np.full(size, math.nan)
+
+
+def _merge(
+    saved: Dict[str, np.ndarray], table: Dict[str, np.ndarray]
+) -> Dict[str, np.ndarray]:
+    """Merge tables sorted by time, values of table replace saved values
+    with the same time"""
+    sizes = (len(saved.get("time", [])), len(table["time"]))
+    merged = {}
+    for name in dict.fromkeys([*saved, *table]):
+        like = table[name] if name in table else saved[name]
+        merged[name] = np.concatenate(
+            (
+                _fill(saved.get(name), sizes[0], like),
+                _fill(table.get(name), sizes[1], like),
+            )
+        )
+
+    # stable sort keeps the new value last for the same time
+    order = np.argsort(merged["time"], kind="stable")
+    times = merged["time"][order]
+    order = order[np.append(times[1:] != times[:-1], True)[: len(times)]]
+    return {name: values[order] for name, values in merged.items()}
+
+
+def save_metrics(path: Union[str, Path], topic: str, table: Dict[str, np.ndarray]):
+    """Save metrics of topic to archive, they are merged with the saved metrics
+    and the new rows replace the saved rows with the same time. The metrics are
+    written to a temporary directory which replaces the saved one, if a previous
+    call was interrupted during the replacement, the saved metrics are restored
+
+    Args:
+        path: Archive directory, created if it doesn't exist
+        topic: Topic name
+        table: Column "time" with times in nanoseconds and a column for each
+            metric, e.g. the result of `DriftClient.get_metrics` with
+            `format="columns"`
+
+    Examples:
+        >>> client = DriftClient("127.0.0.1", "PASSWORD")
+        >>> save_metrics("archive", "topic-1", client.get_metrics("topic-1",
+        >>>     "2022-02-03 10:00:00", "2022-02-04 10:00:00", format="columns"))
+    """
+    directory = Path(path) / f"{_check_name(topic)}{_METRICS_SUFFIX}"
+    directory.parent.mkdir(parents=True, exist_ok=True)
+    table = {
+        _check_name(name): _to_saveable(np.asarray(v)) for name, v in table.items()
+    }
+    table["time"] = table["time"].astype(np.int64)
+
+    old_dir = directory.with_name(f".{directory.name}.old")
+    if old_dir.exists():
+        if directory.exists():
+            shutil.rmtree(old_dir)
+        else:
+            # interrupted between moving the saved metrics away and replacing them
+            os.replace(old_dir, directory)
+
+    saved = {}
+    if (directory / "time.npy").is_file():
+        saved = {file.stem: np.load(file) for file in directory.glob("*.npy")}
+    merged = _merge(saved, table)
+
+    tmp_dir = directory.with_name(f".{directory.name}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir()
+    for name, values in merged.items():
+        np.save(tmp_dir / f"{name}.npy", values)
+
+    if directory.exists():
+        os.replace(directory, old_dir)
+    os.replace(tmp_dir, directory)
+    shutil.rmtree(old_dir, ignore_errors=True)
@@ -1,16 +1,25 @@
 """ Simple MinIO client
 """
 
-from typing import Optional, List
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Optional, List, Iterator, Iterable, AsyncIterator
 
 from urllib.parse import urlparse
+
+import certifi
+import urllib3
 from minio import Minio
 from minio.error import S3Error
 
 from .error import DriftClientError
+from .instrumentation import BYTES, REQUEST_SECONDS, Hook, Instrumented
+from .pipeline import map_concurrently, amap_concurrently
 
 
-class MinIOClient:
+class MinIOClient(Instrumented):
     """Wrapper around `Minio`"""
 
     # pylint: disable=too-few-public-methods
@@ -21,7 +30,8 @@ class MinIOClient:
         access_key: str,
         secret_key: str,
         secure: bool,
-    ):
+        max_connections: int = 10,
+    ):  # pylint: disable=too-many-arguments
         """Create Client for MinIO access
 
         :param uri: URI, format: <protocol>://<host>:<port>
@@ -32,13 +42,27 @@ class MinIOClient:
         :type secret_key: str
         :param secure: encryption enabled
         :type secure: bool
+        :param max_connections: size of the pool of keep-alive connections
+        :type max_connections: int
         """
+        timeout = 300
         self.__uri = urlparse(uri)
+        self.__max_connections = max_connections
+        self.__http = urllib3.PoolManager(
+            timeout=urllib3.util.Timeout(connect=timeout, read=timeout),
+            maxsize=max_connections,
+            cert_reqs="CERT_REQUIRED",
+            ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+            retries=urllib3.Retry(
+                total=5, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504]
+            ),
+        )
         self.__client = Minio(
             self.__uri.netloc,
             access_key=access_key,
             secret_key=secret_key,
             secure=secure,
+            http_client=self.__http,
         )
         self.__bucket = "data"
 
@@ -58,6 +82,8 @@ class MinIOClient:
 
         response = None
         data = None
+        hook = self._hook
+        started = time.perf_counter() if hook else 0.0
 
         try:
             response = self.__client.get_object(self.__bucket, path)
@@ -69,8 +95,119 @@ class MinIOClient:
                 response.close()
                 response.release_conn()
 
+        if hook:
+            hook(self.name(), REQUEST_SECONDS, time.perf_counter() - started)
+            hook(self.name(), BYTES, len(data))
         return data
 
+    def fetch_many(
+        self, paths: Iterable[str], max_workers: int, ordered: bool = True
+    ) -> Iterator[bytes]:
+        """Fetch objects from Minio concurrently over the pool of connections
+
+        :param paths: paths in format `path/to/file`
+        :type paths: Iterable[str]
+        :param max_workers: number of concurrent requests, limited to
+            the size of the pool of connections
+        :type max_workers: int
+        :param ordered: return objects in order of paths or in order of completion
+        :type ordered: bool
+        :return: iterator with Drift packages
+        :rtype: Iterator[bytes]
+        """
+        max_workers = min(max_workers, self.__max_connections)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            yield from map_concurrently(
+                self.fetch_data, paths, executor, max_workers, ordered
+            )
+
+    @property
+    def max_connections(self) -> int:
+        """Size of the pool of keep-alive connections"""
+        return self.__max_connections
+
+    def close(self):
+        """Close pooled connections"""
+        self.__http.clear()
+
     def name(self):
         """Return name of client"""
         return "minio"
+
+
+class AsyncMinIOClient:
+    """Asynchronous wrapper around `MinIOClient`,
+    blocking calls are executed in an executor"""
+
+    def __init__(
+        self,
+        uri: str,
+        access_key: str,
+        secret_key: str,
+        secure: bool,
+        executor: Optional[Executor] = None,
+    ):  # pylint: disable=too-many-arguments
+        """Create asynchronous Client for MinIO access
+
+        :param uri: URI, format: <protocol>://<host>:<port>
+        :type uri: str
+        :param access_key: MinIO access key
+        :type access_key: str
+        :param secret_key: MinIO secret key
+        :type secret_key: str
+        :param secure: encryption enabled
+        :type secure: bool
+        :param executor: executor for blocking calls, default executor if None
+        :type executor: Executor
+        """
+        self.__client = MinIOClient(uri, access_key, secret_key, secure)
+        self.__executor = executor
+
+    async def check_package_list(self, package_names: List[str]) -> list:
+        """Check if packages exist in Minio"""
+        return self.__client.check_package_list(package_names)
+
+    async def fetch_data(self, path: str) -> Optional[bytes]:
+        """Fetch object from Minio
+
+        :param path: path in format `path/to/file`
+        :type path: str
+        :return: Drift package
+        :rtype: dp
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.__executor, self.__client.fetch_data, path
+        )
+
+    def fetch_many(
+        self, paths: Iterable[str], max_workers: int, ordered: bool = True
+    ) -> AsyncIterator[bytes]:
+        """Fetch objects from Minio concurrently
+
+        :param paths: paths in format `path/to/file`
+        :type paths: Iterable[str]
+        :param max_workers: number of concurrent requests, limited to
+            the size of the pool of connections
+        :type max_workers: int
+        :param ordered: return objects in order of paths or in order of completion
+        :type ordered: bool
+        :return: asynchronous iterator with Drift packages
+        :rtype: AsyncIterator[bytes]
+        """
+        max_workers = min(max_workers, self.__client.max_connections)
+        return amap_concurrently(self.fetch_data, paths, max_workers, ordered)
+
+    def instrument(self, hook: Optional[Hook]):
+        """Set hook for measurements of requests
+
+        :param hook: function called with source, metric and value,
+            None disables instrumentation
+        :type hook: Callable[[str, str, float], None]
+        """
+        self.__client.instrument(hook)
+
+    @staticmethod
+    def name():
+        """Return name of client"""
+        return "minio"
@@ -2,12 +2,15 @@
 """
 
 import logging
-from dataclasses import dataclass
-from typing import Callable
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List
 from urllib.parse import urlparse
 
 import paho.mqtt.client as mqtt
 
+from drift_client.instrumentation import BYTES, HANDLER_SECONDS, Instrumented
+
 logger = logging.getLogger("drift-mqtt")
 
 
@@ -20,7 +23,122 @@ class Subscription:
     handler: Callable
 
 
-class MQTTClient:
+@dataclass
+class PublishStats:
+    """Statistics of publishing"""
+
+    messages: int
+    bytes: int
+    seconds: float
+
+    @property
+    def messages_per_second(self) -> float:
+        """Published messages per second"""
+        return self.messages / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        """Published bytes per second"""
+        return self.bytes / self.seconds if self.seconds > 0 else 0.0
+
+
+@dataclass
+class _TopicNode:
+    children: Dict[str, "_TopicNode"] = field(default_factory=dict)
+    values: List[Any] = field(default_factory=list)
+
+
+def _check_filter(topic_filter: str):
+    levels = topic_filter.split("/")
+    for idx, level in enumerate(levels):
+        if "#" in level and (level != "#" or idx != len(levels) - 1):
+            raise ValueError(f"Invalid topic filter '{topic_filter}'")
+        if "+" in level and level != "+":
+            raise ValueError(f"Invalid topic filter '{topic_filter}'")
+
+
+class TopicTree:
+    """Tree of MQTT topic filters to find the filters matching a topic
+    with time proportional to the depth of the topic.
+    `+` matches one level, `#` matches the parent level and any number of
+    child levels, topics starting with `$` aren't matched by wildcards
+    at the first level.
+    """
+
+    def __init__(self):
+        self._root = _TopicNode()
+
+    def add(self, topic_filter: str, value: Any):
+        """Add value for a topic filter
+
+        :param topic_filter: MQTT topic filter with wildcards
+        :param value: value returned for matching topics
+        :raises ValueError: if topic filter is invalid
+        """
+        _check_filter(topic_filter)
+        node = self._root
+        for level in topic_filter.split("/"):
+            node = node.children.setdefault(level, _TopicNode())
+        node.values.append(value)
+
+    def remove(self, topic_filter: str, value: Any) -> bool:
+        """Remove value of a topic filter
+
+        :param topic_filter: MQTT topic filter with wildcards
+        :param value: value to remove
+        :return: True if the value was found
+        """
+        path = [self._root]
+        for level in topic_filter.split("/"):
+            node = path[-1].children.get(level)
+            if node is None:
+                return False
+            path.append(node)
+
+        if value not in path[-1].values:
+            return False
+        path[-1].values.remove(value)
+
+        # remove empty branch
+        for parent, level, node in reversed(
+            list(zip(path[:-1], topic_filter.split("/"), path[1:]))
+        ):
+            if node.values or node.children:
+                break
+            del parent.children[level]
+        return True
+
+    def match(self, topic: str) -> List[Any]:
+        """Find values of all topic filters matching the topic
+
+        :param topic: topic of a message without wildcards
+        :return: values of matching topic filters
+        """
+        values = []
+        nodes = [self._root]
+        for idx, level in enumerate(topic.split("/")):
+            wildcards = not (idx == 0 and level.startswith("$"))
+            next_nodes = []
+            for node in nodes:
+                if wildcards and "#" in node.children:
+                    values.extend(node.children["#"].values)
+                if wildcards and "+" in node.children:
+                    next_nodes.append(node.children["+"])
+                if level in node.children:
+                    next_nodes.append(node.children[level])
+            nodes = next_nodes
+            if not nodes:
+                return values
+
+        for node in nodes:
+            values.extend(node.values)
+            # "a/#" matches "a" as well
+            if "#" in node.children:
+                values.extend(node.children["#"].values)
+        return values
+
+
+class MQTTClient(Instrumented):
     """Wrapper around `paho.mqtt.Client`
     * correctly handles subscription after reconnect
     * supports connection strings (i.e. protocol://domain:port)
@@ -43,20 +161,38 @@ class MQTTClient:
         self._client.reconnect_delay_set(min_delay=1, max_delay=30)
         self._client.enable_logger()
         self._subscriptions = []
+        self._router = TopicTree()
+        self._max_inflight_messages = 20  # default of paho client
 
     def on_message(self, _client, _userdata, message: mqtt.MQTTMessage):
         """Message read callback"""
-        for sub in self._subscriptions:
-            if message.topic.startswith(sub.topic):
-                try:
-                    sub.handler(message)
-                except Exception:  # pylint: disable=broad-except
-                    logger.exception("Error in a message handler")
+        hook = self._hook
+        if hook:
+            hook("mqtt", BYTES, len(message.payload))
+
+        for sub in self._router.match(message.topic):
+            started = time.perf_counter() if hook else 0.0
+            try:
+                sub.handler(message)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Error in a message handler")
+            if hook:
+                hook("mqtt", HANDLER_SECONDS, time.perf_counter() - started)
 
     def __getattr__(self, item):
         """Forward unknown methods to MQTT client"""
         return getattr(self._client, item)
 
+    @property
+    def max_inflight_messages(self) -> int:
+        """Maximal number of QoS > 0 messages which aren't acknowledged yet"""
+        return self._max_inflight_messages
+
+    def max_inflight_messages_set(self, inflight: int):
+        """Set maximal number of QoS > 0 messages which aren't acknowledged yet"""
+        self._client.max_inflight_messages_set(inflight)
+        self._max_inflight_messages = inflight
+
     def connect(self):
         """Connect to mqtt, blocking call, will wait until response.
         It is safe to call subscribe after this.
@@ -104,10 +240,28 @@ class MQTTClient:
         if subs:
             self._client.subscribe(subs)
 
-    def subscribe(self, topic, handler: Callable, quality_service=0):
+    def subscribe(self, topic, handler: Callable, quality_service=0) -> Subscription:
         """Subscription proxy to delay subscription until we connect to broker"""
-        self._subscriptions.append(
-            Subscription(topic=topic, quality_service=quality_service, handler=handler)
+        sub = Subscription(
+            topic=topic, quality_service=quality_service, handler=handler
         )
+        self._router.add(topic, sub)
+        self._subscriptions.append(sub)
         if self._client.is_connected():
             self._subscribe()
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        """Remove subscription, the topic is unsubscribed on broker
+        if there are no other subscriptions to it
+
+        :param sub: subscription returned by subscribe
+        """
+        if not self._router.remove(sub.topic, sub):
+            return
+
+        self._subscriptions.remove(sub)
+        if self._client.is_connected() and all(
+            other.topic != sub.topic for other in self._subscriptions
+        ):
+            self._client.unsubscribe(sub.topic)
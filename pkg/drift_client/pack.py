@@ -0,0 +1,343 @@
+"""Append-only archive of Drift packages in a single file
+
+A pack consists of two files:
+
+* `<name>.pack` with the magic bytes `DRIFTPK1` followed by records, each of
+  them is the source timestamp of the package in milliseconds (int64),
+  the size of the package (uint32) and the serialized package
+* `<name>.pack.idx` with the magic bytes `DRIFTIX1`, the number of records
+  (uint64), the size of the pack file covered by the index (uint64),
+  the sorted timestamps (int64) and the offsets of the records (uint64)
+
+All the numbers are little-endian. The index is rewritten when the writer
+is flushed or closed. If the writer crashed, the records which aren't
+in the index are found by scanning the tail of the pack file.
+"""
+
+import mmap
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from drift_client.drift_data_package import DriftDataPackage
+
+_PACK_MAGIC = b"DRIFTPK1"
+_INDEX_MAGIC = b"DRIFTIX1"
+_RECORD = struct.Struct("<qI")
+_INDEX_HEADER = struct.Struct("<8sQQ")
+
+
+def index_path(path: Union[str, Path]) -> Path:
+    """Path of the index of a pack file"""
+    path = Path(path)
+    return path.with_name(f"{path.name}.idx")
+
+
+def _to_ms(timestamp: float) -> int:
+    return int(round(timestamp * DriftDataPackage.TS_PRECISION))
+
+
+def _scan_records(buffer, start: int) -> Tuple[List[int], List[int], int]:
+    """Find records from start to the end of buffer
+
+    Returns:
+        Timestamps and offsets of the records and the end of the last
+            complete record
+    """
+    timestamps, offsets = [], []
+    pos = start
+    while pos + _RECORD.size <= len(buffer):
+        timestamp, size = _RECORD.unpack_from(buffer, pos)
+        if pos + _RECORD.size + size > len(buffer):
+            break  # truncated record
+        timestamps.append(timestamp)
+        offsets.append(pos)
+        pos += _RECORD.size + size
+    return timestamps, offsets, pos
+
+
+def _parse_index(path: Path, buffer) -> Tuple[np.ndarray, np.ndarray, int]:
+    """Parse index file
+
+    Returns:
+        Timestamps, offsets and size of the covered pack file
+    """
+    magic, count, covered = _INDEX_HEADER.unpack_from(buffer)
+    if magic != _INDEX_MAGIC:
+        raise ValueError(f"{path} isn't an index of a pack file")
+
+    offset = _INDEX_HEADER.size
+    timestamps = np.frombuffer(buffer, np.int64, count, offset)
+    offsets = np.frombuffer(buffer, np.uint64, count, offset + count * 8)
+    return timestamps, offsets, covered
+
+
+def _empty_index() -> Tuple[np.ndarray, np.ndarray, int]:
+    return np.empty(0, np.int64), np.empty(0, np.uint64), len(_PACK_MAGIC)
+
+
+def _check_magic(path: Path, buffer):
+    if bytes(buffer[: len(_PACK_MAGIC)]) != _PACK_MAGIC:
+        raise ValueError(f"{path} isn't a pack file")
+
+
+class PackWriter:
+    """Writer which appends packages to a pack file
+
+    The packages can be appended in any order, the index is sorted by
+    source timestamp when it is written. The writer is thread-safe,
+    so `append` can be used as a handler of a subscription.
+
+    Examples:
+        >>> client = DriftClient("127.0.0.1", "PASSWORD")
+        >>> with PackWriter("topic-1.pack") as writer:
+        >>>     writer.extend(client.walk("topic-1", "2022-02-03 10:00:00",
+        >>>         "2022-02-04 10:00:00", lazy=True))
+        >>> with PackWriter("topic-1.pack") as writer:
+        >>>     client.subscribe_data("topic-1", writer.append)
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Args:
+            path: pack file, created if it doesn't exist,
+                otherwise the packages are appended to it
+        Raises:
+            ValueError: if the file isn't a pack file
+        """
+        self._path = Path(path)
+        self._lock = threading.Lock()
+        self._timestamps: List[int] = []
+        self._offsets: List[int] = []
+
+        if not self._path.exists() or self._path.stat().st_size == 0:
+            self._file = open(self._path, "w+b")  # pylint: disable=consider-using-with
+            self._file.write(_PACK_MAGIC)
+            self._indexed = (np.empty(0, np.int64), np.empty(0, np.uint64))
+            return
+
+        self._file = open(self._path, "r+b")  # pylint: disable=consider-using-with
+        try:
+            try:
+                index = index_path(self._path).read_bytes()
+                timestamps, offsets, covered = _parse_index(self._path, index)
+            except FileNotFoundError:
+                timestamps, offsets, covered = _empty_index()
+            self._indexed = (timestamps, offsets)
+
+            with mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                _check_magic(self._path, data)
+                # records after a crash of the previous writer
+                self._timestamps, self._offsets, end = _scan_records(data, covered)
+            self._file.truncate(end)
+            self._file.seek(end)
+        except Exception:
+            self._file.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._indexed[0]) + len(self._timestamps)
+
+    def append(self, package: Union[DriftDataPackage, bytes]):
+        """Append package to the pack file
+
+        Args:
+            package: package or serialized package
+        """
+        if not isinstance(package, DriftDataPackage):
+            package = DriftDataPackage(package, lazy=True)
+
+        blob = package.blob
+        timestamp = _to_ms(package.source_timestamp)
+        with self._lock:
+            self._timestamps.append(timestamp)
+            self._offsets.append(self._file.tell())
+            self._file.write(_RECORD.pack(timestamp, len(blob)))
+            self._file.write(blob)
+
+    def extend(self, packages: Iterable[Union[DriftDataPackage, bytes]]) -> int:
+        """Append packages to the pack file, e.g. from `DriftClient.walk`
+
+        Args:
+            packages: packages or serialized packages
+        Returns:
+            Number of appended packages
+        """
+        count = 0
+        for package in packages:
+            self.append(package)
+            count += 1
+        return count
+
+    def flush(self):
+        """Write appended packages to disk and update the index"""
+        with self._lock:
+            self._file.flush()
+            covered = self._file.tell()
+            timestamps = np.concatenate(
+                (self._indexed[0], np.array(self._timestamps, np.int64))
+            )
+            offsets = np.concatenate(
+                (self._indexed[1], np.array(self._offsets, np.uint64))
+            )
+            # stable sort keeps order of appending for the same timestamp
+            order = np.argsort(timestamps, kind="stable")
+            self._indexed = (timestamps[order], offsets[order])
+            self._timestamps, self._offsets = [], []
+
+            path = index_path(self._path)
+            tmp_path = path.with_name(f".{path.name}.tmp")
+            with open(tmp_path, "wb") as file:
+                file.write(_INDEX_HEADER.pack(_INDEX_MAGIC, len(order), covered))
+                file.write(self._indexed[0].tobytes())
+                file.write(self._indexed[1].tobytes())
+            os.replace(tmp_path, path)
+
+    def close(self):
+        """Flush and close the pack file"""
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+
+class PackReader:
+    """Reader which memory-maps a pack file and finds packages by binary search
+
+    The packages are returned as `DriftDataPackage` with a view into
+    the memory map, so the data isn't copied. The reader sees the packages
+    which were written when it was opened.
+
+    Examples:
+        >>> with PackReader("topic-1.pack") as reader:
+        >>>     for pkg in reader.walk(1643882400, 1643968800):
+        >>>         print(pkg.source_timestamp, pkg.as_np())
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Args:
+            path: pack file
+        Raises:
+            FileNotFoundError: if the file doesn't exist
+            ValueError: if the file isn't a pack file
+        """
+        self._path = Path(path)
+        with open(self._path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._data = memoryview(self._mmap)
+        _check_magic(self._path, self._data)
+
+        self._index_mmap = None
+        try:
+            with open(index_path(self._path), "rb") as file:
+                self._index_mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            timestamps, offsets, covered = _parse_index(self._path, self._index_mmap)
+        except FileNotFoundError:
+            timestamps, offsets, covered = _empty_index()
+
+        tail_timestamps, tail_offsets, _ = _scan_records(self._data, covered)
+        if tail_timestamps:
+            timestamps = np.concatenate((timestamps, tail_timestamps))
+            offsets = np.concatenate((offsets, np.array(tail_offsets, np.uint64)))
+            order = np.argsort(timestamps, kind="stable")
+            timestamps, offsets = timestamps[order], offsets[order]
+
+        self._timestamps: np.ndarray = timestamps
+        self._offsets: np.ndarray = offsets
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._timestamps)
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """Sorted source timestamps of packages in milliseconds"""
+        return self._timestamps
+
+    def find(self, timestamp: float) -> Optional[memoryview]:
+        """Find first package with source timestamp
+
+        Args:
+            timestamp: UNIX timestamp in seconds with millisecond precision
+        Returns:
+            View of serialized package in the memory map, None if not found
+        """
+        timestamp = _to_ms(timestamp)
+        idx = np.searchsorted(self._timestamps, timestamp)
+        if idx == len(self._timestamps) or self._timestamps[idx] != timestamp:
+            return None
+        return self._record(idx)
+
+    def get(self, timestamp: float, lazy: bool = False) -> Optional[DriftDataPackage]:
+        """Get first package with source timestamp
+
+        Args:
+            timestamp: UNIX timestamp in seconds with millisecond precision
+            lazy: If True, the data payload is parsed when it is accessed
+        Returns:
+            Package or None if not found
+        """
+        blob = self.find(timestamp)
+        return None if blob is None else DriftDataPackage(blob, lazy=lazy)
+
+    def range(self, start: float, stop: float) -> Iterator[memoryview]:
+        """Iterate over packages in a time range ordered by source timestamp
+
+        Args:
+            start: Begin of the range as UNIX timestamp in seconds, inclusive
+            stop: End of the range as UNIX timestamp in seconds, exclusive
+        Returns:
+            Iterator with views of serialized packages in the memory map
+        """
+        first = np.searchsorted(self._timestamps, _to_ms(start), side="left")
+        last = np.searchsorted(self._timestamps, _to_ms(stop), side="left")
+        for idx in range(first, last):
+            yield self._record(idx)
+
+    def walk(
+        self, start: float, stop: float, lazy: bool = False
+    ) -> Iterator[DriftDataPackage]:
+        """Iterate over packages in a time range ordered by source timestamp
+
+        Args:
+            start: Begin of the range as UNIX timestamp in seconds, inclusive
+            stop: End of the range as UNIX timestamp in seconds, exclusive
+            lazy: If True, the data payload is parsed when it is accessed
+        Returns:
+            Iterator with packages
+        """
+        for blob in self.range(start, stop):
+            yield DriftDataPackage(blob, lazy=lazy)
+
+    def close(self):
+        """Release the memory maps, they stay open while packages use them"""
+        self._timestamps = self._offsets = np.empty(0, np.int64)
+        self._data.release()
+        for buffer in (self._mmap, self._index_mmap):
+            try:
+                if buffer is not None:
+                    buffer.close()
+            except BufferError:
+                pass  # still used by packages, closed by garbage collector
+
+    def _record(self, idx: int) -> memoryview:
+        offset = int(self._offsets[idx])
+        _, size = _RECORD.unpack_from(self._data, offset)
+        start = offset + _RECORD.size
+        return self._data[start : start + size]
@@ -0,0 +1,105 @@
+"""Helpers to run stages of data processing concurrently"""
+
+import asyncio
+from collections import deque
+from concurrent.futures import Executor, FIRST_COMPLETED, wait
+from typing import Callable, Iterable, Iterator, AsyncIterator, Awaitable, Any
+
+
+def map_concurrently(
+    func: Callable[..., Any],
+    items: Iterable,
+    executor: Executor,
+    max_inflight: int,
+    ordered: bool = True,
+) -> Iterator:
+    """Map function on items in executor keeping not more
+    than `max_inflight` tasks in flight
+
+    Args:
+        func: function to call for each item
+        items: items to map
+        executor: executor to run the function in
+        max_inflight: maximum number of submitted but not consumed tasks
+        ordered: if True results are in the order of items,
+            otherwise in the order of completion
+    Returns:
+        Iterator with results
+    """
+    items = iter(items)
+    pending = deque()
+
+    def submit() -> bool:
+        for item in items:
+            pending.append(executor.submit(func, item))
+            return True
+        return False
+
+    try:
+        while len(pending) < max_inflight and submit():
+            pass
+
+        while pending:
+            if ordered:
+                done = [pending.popleft()]
+            else:
+                done, not_done = wait(pending, return_when=FIRST_COMPLETED)
+                pending = deque(not_done)
+
+            for future in done:
+                result = future.result()
+                submit()
+                yield result
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+async def amap_concurrently(
+    func: Callable[..., Awaitable],
+    items: Iterable,
+    max_inflight: int,
+    ordered: bool = True,
+) -> AsyncIterator:
+    """Map coroutine function on items keeping not more
+    than `max_inflight` tasks in flight
+
+    Args:
+        func: coroutine function to call for each item
+        items: items to map
+        max_inflight: maximum number of started but not consumed tasks
+        ordered: if True results are in the order of items,
+            otherwise in the order of completion
+    Returns:
+        Asynchronous iterator with results
+    """
+    items = iter(items)
+    pending = deque()
+
+    def submit() -> bool:
+        for item in items:
+            pending.append(asyncio.ensure_future(func(item)))
+            return True
+        return False
+
+    try:
+        while len(pending) < max_inflight and submit():
+            pass
+
+        while pending:
+            if ordered:
+                done = [pending.popleft()]
+            else:
+                done, not_done = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                pending = deque(not_done)
+
+            for task in done:
+                result = await task
+                submit()
+                yield result
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
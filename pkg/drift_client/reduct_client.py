@@ -1,77 +1,193 @@
 """Reduct Storage client"""
 
 import asyncio
+import math
+import threading
+import time
+import weakref
 from asyncio import new_event_loop
-from typing import Tuple, List, Optional, Dict, Iterator
+from concurrent.futures import Future
+from contextlib import suppress
+from typing import (
+    Tuple,
+    List,
+    Optional,
+    Dict,
+    Iterator,
+    AsyncIterator,
+    AsyncGenerator,
+    Iterable,
+)
 
+import numpy as np
+from aiohttp import ClientSession, ClientTimeout
 from reduct import Client, Bucket, ReductError, EntryInfo
 
 from drift_client.error import DriftClientError
+from drift_client.instrumentation import (
+    BYTES,
+    QUEUE_WAIT_SECONDS,
+    REQUEST_SECONDS,
+    Hook,
+    Instrumented,
+)
+from drift_client.pipeline import amap_concurrently
 
 
-class ReductStoreClient:
-    """Wrapper around ReductStore client"""
+_SHARD_RECORDS = 64
+
+
+def _parse_minio_path(path: str) -> Tuple[str, int]:
+    entry, file = path.split("/")
+    return entry, int(file.replace(".dp", ""))
+
+
+def _filter_package_list(
+    package_names: List[str], entries_in_storage: List[EntryInfo]
+) -> List[str]:
+    entries = {entry.name: entry for entry in entries_in_storage}
+    entry_map: Dict[str, List[int]] = {}
+    # bad design, we don't know if all packages belong to the same entry
+    for package_name in package_names:
+        entry, timestamp = _parse_minio_path(package_name)
+        # remove not existing topics
+        if entry in entries:
+            entry_map.setdefault(entry, []).append(timestamp)
+
+    # check if the packages are still in storage
+    package_list = []
+    for entry, timestamps in entry_map.items():
+        info = entries[entry]
+        timestamps = np.sort(np.array(timestamps, dtype=np.int64))
+        records = timestamps * 1000
+        begin = np.searchsorted(records, info.oldest_record, side="left")
+        end = np.searchsorted(records, info.latest_record, side="right")
+
+        # restore entry/ts.db format
+        package_list.extend(
+            f"{entry}/{timestamp}.dp" for timestamp in timestamps[begin:end].tolist()
+        )
+
+    return package_list
+
+
+async def _prefetch(
+    ait: AsyncGenerator, size: int, hook: Optional[Hook] = None
+) -> AsyncIterator:
+    """Read items of an asynchronous iterator in a background task
+    and keep up to `size` of them in a queue"""
+    queue = asyncio.Queue(maxsize=size)
+    end = object()
+
+    async def produce():
+        try:
+            async for item in ait:
+                await queue.put((item, None))
+            await queue.put((end, None))
+        except Exception as err:  # pylint: disable=broad-except
+            await queue.put((end, err))
+
+    task = asyncio.ensure_future(produce())
+    try:
+        while True:
+            waited = time.perf_counter() if hook else 0.0
+            item, err = await queue.get()
+            if hook:
+                hook("reductstore", QUEUE_WAIT_SECONDS, time.perf_counter() - waited)
+            if err is not None:
+                raise err
+            if item is end:
+                break
+            yield item
+    finally:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+        await ait.aclose()
 
-    def __init__(self, url: str, token: str, timeout: float, loop=None):
+
+class AsyncReductStoreClient(Instrumented):
+    """Asynchronous wrapper around ReductStore client"""
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(
+        self,
+        url: str,
+        token: str,
+        timeout: float,
+        session: Optional[ClientSession] = None,
+        entry_list_ttl: float = 5.0,
+    ):  # pylint: disable=too-many-arguments
         """
         Args:
             url: ReductStore URL
             token: ReductStore API token
-            loop: asyncio event loop
+            timeout: timeout for requests
+            session: aiohttp session shared between requests,
+                if None the client opens its own keep-alive session
+                with the first request and closes it with `close`
+            entry_list_ttl: time in seconds to reuse the list of entries
+                in `check_package_list`, 0 disables caching
         """
-        self._client = Client(url, api_token=token, timeout=timeout)
+        self._url = url
+        self._token = token
+        self._timeout = timeout
+        self._session = session
+        self._own_session = session is None
+        self._client: Optional[Client] = None
         self._bucket = "data"
-        self._loop = loop if loop else new_event_loop()
-        _ = self._run(self._client.info())  # check connection for fallback to Minio
+        self._bucket_handle: Optional[Bucket] = None
+        self._entry_list_ttl = entry_list_ttl
+        self._entry_list: Optional[Tuple[float, List[EntryInfo]]] = None
 
-    def check_package_list(self, package_names: List[str]) -> list:
-        """Check if packages exist in Reduct Storage"""
-        entry_map: Dict[str, List[int]] = {}
-        # bad design, we don't know if all packages belong to the same entry
-        for package_name in package_names:
-            entry, timestamp = self._parse_minio_path(package_name)
-            if entry not in entry_map:
-                entry_map[entry] = [timestamp]
-            else:
-                entry_map[entry].append(timestamp)
-
-        # retrieve all entries
-        try:
-            bucket: Bucket = self._run(self._client.get_bucket(self._bucket))
-            entries_in_storage: List[EntryInfo] = self._run(bucket.get_entry_list())
-        except ReductError as err:
-            raise DriftClientError("Failed to list entries") from err
+    async def check_connection(self):
+        """Request server info to make sure that ReductStore is available
 
-        # check if the packages are still in storage
-        for entry in entries_in_storage:
-            if entry.name in entry_map:
-                entry_map[entry.name] = sorted(
-                    timestamp
-                    for timestamp in entry_map[entry.name]
-                    if entry.oldest_record <= timestamp * 1000 <= entry.latest_record
-                )
+        Raises:
+            ReductError: if server is not available
+        """
+        await self._get_client().info()
 
-        # remove not existing topics
-        for entry in list(entry_map.keys()):
-            if entry not in [e.name for e in entries_in_storage]:
-                del entry_map[entry]
+    async def close(self):
+        """Close own HTTP session"""
+        if self._own_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+            self._client = None
+            self._bucket_handle = None
 
-        # restore entry/ts.db format
-        return [
-            f"{entry}/{timestamp}.dp"
-            for entry, timestamps in entry_map.items()
-            for timestamp in timestamps
-        ]
+    async def check_package_list(self, package_names: List[str]) -> list:
+        """Check if packages exist in Reduct Storage"""
+        entries_in_storage = await self._get_entry_list()
+        return _filter_package_list(package_names, entries_in_storage)
 
-    def fetch_data(self, path: str) -> Optional[bytes]:
+    async def fetch_data(self, path: str) -> Optional[bytes]:
         """Fetch data from Reduct Storage via timestamp"""
-        entry, timestamp = self._parse_minio_path(path)
+        entry, timestamp = _parse_minio_path(path)
         try:
-            return self._run(self._read_by_timestamp(entry, timestamp))
+            return await self._read_by_timestamp(entry, timestamp)
         except ReductError as err:
+            self._check_bucket(err)
             raise DriftClientError(f"Could not read item at {path}") from err
 
-    def walk(self, entry: str, start: int, stop: int, **kwargs) -> Iterator[bytes]:
+    def fetch_many(
+        self, paths: Iterable[str], max_workers: int, ordered: bool = True
+    ) -> AsyncIterator[bytes]:
+        """Fetch data from Reduct Storage with concurrent requests
+
+        Args:
+            paths: paths in format `entry/timestamp.dp`
+            max_workers: number of concurrent requests
+            ordered: return records in order of paths or in order of completion
+        Raises:
+            DriftClientError: if failed to fetch data
+        """
+        return amap_concurrently(self.fetch_data, paths, max_workers, ordered)
+
+    async def walk(
+        self, entry: str, start: int, stop: int, **kwargs
+    ) -> AsyncIterator[bytes]:
         """
         Walk through the records of an entry between start and stop.
         Args:
@@ -80,46 +196,304 @@ class ReductStoreClient:
             stop: stop timestamp UNIX in seconds
         Keyword Args:
             ttl: time to live for the query
+            prefetch: number of records to read ahead in a background task,
+                0 disables read-ahead. Default: 0
+            shards: number of concurrent queries over small sub-ranges
+                of the time range, the records are returned in order. Default: 1
+            shard_records: expected number of records in each sub-range
+                if shards > 1. Default: 64
         Raises:
             DriftClientError: if failed to fetch data
         """
+        ttl = kwargs.get("ttl", 60)
+        prefetch = kwargs.get("prefetch", 0)
+        shards = kwargs.get("shards", 1)
+        shard_records = kwargs.get("shard_records", _SHARD_RECORDS)
 
-        bucket: Bucket = self._run(self._client.get_bucket(self._bucket))
+        start, stop = start * 1000_000, stop * 1000_000
+        if shards > 1:
+            records = self._query_shards(entry, start, stop, ttl, shards, shard_records)
+        else:
+            records = self._query(entry, start, stop, ttl)
+            if prefetch > 0:
+                records = _prefetch(records, prefetch, self._hook)
 
-        ttl = kwargs.get("ttl", 60)
-        ait = bucket.query(entry, start * 1000_000, stop * 1000_000, ttl=ttl)
+        try:
+            async for record in records:
+                yield record
+        finally:
+            await records.aclose()
 
-        async def get_next():
-            try:
-                pkg = await ait.__anext__()  # pylint: disable=unnecessary-dunder-call
-                return await pkg.read_all()
-            except StopAsyncIteration:
-                return None
+    @staticmethod
+    def name() -> str:
+        """Return name of the client"""
+        return "reductstore"
 
+    async def _query(
+        self, entry: str, start: int, stop: int, ttl: int
+    ) -> AsyncIterator[bytes]:
+        hook = self._hook
         try:
-            while True:
-                pkg = self._run(get_next())
-                if pkg is None:
-                    break
-                yield pkg
+            started = time.perf_counter() if hook else 0.0
+            bucket = await self._get_bucket()
+            async for record in bucket.query(entry, start, stop, ttl=ttl):
+                data = await record.read_all()
+                if hook:
+                    hook(self.name(), REQUEST_SECONDS, time.perf_counter() - started)
+                    hook(self.name(), BYTES, len(data))
+                yield data
+                if hook:
+                    started = time.perf_counter()
         except ReductError as err:
+            self._check_bucket(err)
             raise DriftClientError(
                 f"Failed to fetch data from {entry}: {err.message}"
             ) from err
 
-    def name(self) -> str:
-        """Return name of the client"""
-        return "reductstore"
+    async def _query_shards(  # pylint: disable=too-many-arguments
+        self, entry: str, start: int, stop: int, ttl: int, shards: int, records: int
+    ) -> AsyncIterator[bytes]:
+        """Split the range into small sub-ranges of about `records` records
+        and read them in a sliding window of `shards` concurrent queries,
+        the records are returned in order"""
+
+        async def read(sub_range: Tuple[int, int]) -> List[bytes]:
+            return [record async for record in self._query(entry, *sub_range, ttl=ttl)]
+
+        sub_ranges = await self._split_range(entry, start, stop, shards, records)
+        chunks = amap_concurrently(read, sub_ranges, shards)
+        try:
+            async for chunk in chunks:
+                for record in chunk:
+                    yield record
+        finally:
+            await chunks.aclose()
+
+    async def _split_range(  # pylint: disable=too-many-arguments
+        self, entry: str, start: int, stop: int, shards: int, records: int
+    ) -> List[Tuple[int, int]]:
+        """Split the range into at least `shards` sub-ranges with about
+        `records` records each, the density of records is estimated
+        from the entry info"""
+        count = shards
+        for info in await self._get_entry_list():
+            if info.name != entry or info.record_count == 0:
+                continue
+            span = info.latest_record - info.oldest_record + 1
+            overlap = min(stop, info.latest_record + 1) - max(start, info.oldest_record)
+            expected = info.record_count * max(overlap, 0) / span
+            count = min(max(count, math.ceil(expected / records)), max(stop - start, 1))
+
+        edges = [start + (stop - start) * idx // count for idx in range(count + 1)]
+        return [
+            (begin, end) for begin, end in zip(edges[:-1], edges[1:]) if begin < end
+        ]
+
+    async def _get_entry_list(self) -> List[EntryInfo]:
+        """Retrieve all entries or reuse them if they were listed recently"""
+        now = time.monotonic()
+        if self._entry_list is not None:
+            listed_at, entries = self._entry_list
+            if now - listed_at < self._entry_list_ttl:
+                return entries
+
+        try:
+            bucket = await self._get_bucket()
+            entries = await bucket.get_entry_list()
+        except ReductError as err:
+            self._check_bucket(err)
+            raise DriftClientError("Failed to list entries") from err
+
+        self._entry_list = (now, entries)
+        return entries
 
     async def _read_by_timestamp(self, entry: str, timestamp: int) -> bytes:
-        bucket: Bucket = await self._client.get_bucket(self._bucket)
+        hook = self._hook
+        started = time.perf_counter() if hook else 0.0
+        bucket = await self._get_bucket()
         async with bucket.read(entry, timestamp * 1000) as record:
-            return await record.read_all()
+            data = await record.read_all()
 
-    @staticmethod
-    def _parse_minio_path(path: str) -> Tuple[str, int]:
-        entry, file = path.split("/")
-        return entry, int(file.replace(".dp", ""))
+        if hook:
+            hook(self.name(), REQUEST_SECONDS, time.perf_counter() - started)
+            hook(self.name(), BYTES, len(data))
+        return data
+
+    def _get_client(self) -> Client:
+        if self._client is None:
+            if self._session is None:
+                self._session = ClientSession(timeout=ClientTimeout(self._timeout))
+            self._client = Client(
+                self._url,
+                api_token=self._token,
+                timeout=self._timeout,
+                session=self._session,
+            )
+        return self._client
+
+    async def _get_bucket(self) -> Bucket:
+        if self._bucket_handle is None:
+            self._bucket_handle = await self._get_client().get_bucket(self._bucket)
+        return self._bucket_handle
+
+    def _check_bucket(self, err: ReductError):
+        """Resolve bucket again with the next request if it wasn't found"""
+        if err.status_code == 404:
+            self._bucket_handle = None
+            self._entry_list = None
+
+
+async def _next(ait: AsyncGenerator):
+    """Return next item of asynchronous iterator or None if it is exhausted"""
+    try:
+        return await ait.__anext__()  # pylint: disable=unnecessary-dunder-call
+    except StopAsyncIteration:
+        return None
+
+
+def _serve_forever(loop):
+    loop.run_forever()
+    loop.close()
+
+
+def _close_client(loop, client: AsyncReductStoreClient, own_loop: bool):
+    if loop.is_closed():
+        return
+
+    if loop.is_running():
+        asyncio.run_coroutine_threadsafe(client.close(), loop).result()
+        if own_loop:
+            # the background thread closes the loop after it stops
+            loop.call_soon_threadsafe(loop.stop)
+    else:
+        loop.run_until_complete(client.close())
+        if own_loop:
+            loop.close()
+
+
+class ReductStoreClient:
+    """Wrapper around ReductStore client"""
+
+    def __init__(
+        self,
+        url: str,
+        token: str,
+        timeout: float,
+        loop=None,
+        entry_list_ttl: float = 5.0,
+    ):  # pylint: disable=too-many-arguments
+        """
+        Args:
+            url: ReductStore URL
+            token: ReductStore API token
+            loop: asyncio event loop, if None the client creates its own loop
+            entry_list_ttl: time in seconds to reuse the list of entries
+                in `check_package_list`, 0 disables caching
+        """
+        self._client = AsyncReductStoreClient(
+            url, token, timeout, entry_list_ttl=entry_list_ttl
+        )
+        self._own_loop = loop is None
+        self._loop = loop if loop else new_event_loop()
+        # the client keeps one HTTP session for its lifetime
+        self._finalizer = weakref.finalize(
+            self, _close_client, self._loop, self._client, self._own_loop
+        )
+        try:
+            # check connection for fallback to Minio
+            self._run(self._client.check_connection())
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        """Close HTTP session"""
+        self._finalizer()
+
+    def check_package_list(self, package_names: List[str]) -> list:
+        """Check if packages exist in Reduct Storage"""
+        return self._run(self._client.check_package_list(package_names))
+
+    def fetch_data(self, path: str) -> Optional[bytes]:
+        """Fetch data from Reduct Storage via timestamp"""
+        return self._run(self._client.fetch_data(path))
+
+    def fetch_many(
+        self, paths: Iterable[str], max_workers: int, ordered: bool = True
+    ) -> Iterator[bytes]:
+        """Fetch data from Reduct Storage with concurrent requests
+
+        Args:
+            paths: paths in format `entry/timestamp.dp`
+            max_workers: number of concurrent requests
+            ordered: return records in order of paths or in order of completion
+        Raises:
+            DriftClientError: if failed to fetch data
+        """
+        self._run_in_background()
+        return self._iterate(self._client.fetch_many(paths, max_workers, ordered))
+
+    def walk(self, entry: str, start: int, stop: int, **kwargs) -> Iterator[bytes]:
+        """
+        Walk through the records of an entry between start and stop.
+        Args:
+            entry: entry name
+            start: start timestamp UNIX in seconds
+            stop: stop timestamp UNIX in seconds
+        Keyword Args:
+            ttl: time to live for the query
+            prefetch: number of records to read ahead while the caller
+                processes the current one, 0 disables read-ahead. Default: 0
+            shards: number of sub-ranges of the time range which are queried
+                concurrently, the records are returned in order. Default: 1
+            shard_records: expected number of records in each sub-range
+                if shards > 1. Default: 64
+        Raises:
+            DriftClientError: if failed to fetch data
+        """
+        records = self._client.walk(entry, start, stop, **kwargs)
+        if kwargs.get("prefetch", 0) > 0 or kwargs.get("shards", 1) > 1:
+            self._run_in_background()
+
+        if self._loop.is_running():
+            # send the query right away, so that a few walks run concurrently
+            first = asyncio.run_coroutine_threadsafe(_next(records), self._loop)
+            return self._iterate(records, first)
+
+        return self._iterate(records)
+
+    def name(self) -> str:
+        """Return name of the client"""
+        return self._client.name()
+
+    def instrument(self, hook: Optional[Hook]):
+        """Set hook for measurements of requests
+
+        Args:
+            hook: Function called with source, metric and value,
+                None disables instrumentation
+        """
+        self._client.instrument(hook)
+
+    def _iterate(self, ait: AsyncGenerator, first: Optional[Future] = None) -> Iterator:
+        try:
+            item = first.result() if first else self._run(_next(ait))
+            while item is not None:
+                yield item
+                item = self._run(_next(ait))
+        finally:
+            self._run(ait.aclose())
+
+    def _run_in_background(self):
+        """Run own event loop in a background thread, so that the tasks
+        progress between the calls of the client"""
+        if not self._own_loop or self._loop.is_running():
+            return
+
+        started = threading.Event()
+        self._loop.call_soon(started.set)
+        threading.Thread(target=_serve_forever, args=(self._loop,), daemon=True).start()
+        started.wait()
 
     def _run(self, coro):
         if self._loop.is_running():
@@ -0,0 +1,130 @@
+"""Tests for windowed aggregation"""
+
+import math
+
+import numpy as np
+import pytest
+
+from drift_client.aggregation import (
+    BandEnergy,
+    Peak,
+    Reducer,
+    Std,
+    aggregate,
+    make_reducers,
+    parse_window,
+)
+
+
+class _Package:  # pylint: disable=too-few-public-methods
+    """Package with a signal"""
+
+    def __init__(self, timestamp: float, signal: np.ndarray):
+        self.source_timestamp = timestamp
+        self.signal = signal
+
+    def as_np(self, scale_factor: int = 0) -> np.ndarray:
+        """signal of package"""
+        _ = scale_factor
+        return self.signal
+
+
+@pytest.mark.parametrize(
+    "window, seconds",
+    [(10, 10.0), (0.5, 0.5), ("500ms", 0.5), ("10s", 10.0), ("1h30m", 5400.0)],
+)
+def test__parse_window(window, seconds):
+    """should convert window to seconds"""
+    assert parse_window(window) == seconds
+
+
+@pytest.mark.parametrize("window", ["10", "10 s", "1x", "", 0, -1])
+def test__parse_invalid_window(window):
+    """should raise error for invalid window"""
+    with pytest.raises(ValueError):
+        parse_window(window)
+
+
+def test__unknown_reducer():
+    """should raise error for unknown reducer"""
+    with pytest.raises(ValueError):
+        make_reducers(["mean", "avg"])
+
+
+def test__aggregate():
+    """should aggregate signals of packages in windows"""
+    packages = [
+        _Package(10.0, np.array([1.0, -3.0])),
+        _Package(15.0, np.array([3.0, 3.0])),
+        _Package(35.0, np.array([2.0, 2.0])),
+    ]
+
+    results = list(
+        aggregate(
+            iter(packages),
+            "10s",
+            ["mean", "rms", "std", "min", "max", "peak", "energy"],
+        )
+    )
+    assert len(results) == 2
+
+    assert results[0]["start"] == 10.0
+    assert results[0]["stop"] == 20.0
+    assert results[0]["count"] == 2
+    assert results[0]["mean"] == 1.0
+    assert results[0]["rms"] == math.sqrt(7.0)
+    assert results[0]["std"] == pytest.approx(math.sqrt(6.0))
+    assert results[0]["min"] == -3.0
+    assert results[0]["max"] == 3.0
+    assert results[0]["energy"] == 28.0
+
+    assert results[1] == {
+        "start": 30.0,
+        "stop": 40.0,
+        "count": 1,
+        "mean": 2.0,
+        "rms": 2.0,
+        "std": 0.0,
+        "min": 2.0,
+        "max": 2.0,
+        "peak": 2.0,
+        "energy": 8.0,
+    }
+
+
+def test__std_with_offset():
+    """should calculate standard deviation of samples with a large offset"""
+    std = Std()
+    std.update(np.array([0.0, 1.0]) + 1e9)
+    std.update(np.array([], dtype=np.float64))
+    std.update(np.array([2.0, 3.0]) + 1e9)
+    assert std.result() == pytest.approx(np.std([0.0, 1.0, 2.0, 3.0]))
+
+    std.reset()
+    assert math.isnan(std.result())
+
+
+def test__abstract_reducer():
+    """should not create reducer without implementation"""
+    with pytest.raises(TypeError):
+        Reducer()  # pylint: disable=abstract-class-instantiated
+
+
+def test__aggregate_empty():
+    """should return nothing for no packages"""
+    assert not list(aggregate([], 1, ["mean"]))
+
+
+def test__band_energy():
+    """should calculate energy of signals in frequency band"""
+    sample_rate = 1000
+    time = np.arange(1000) / sample_rate
+    signal = np.sin(2 * np.pi * 50 * time) + 0.5 * np.sin(2 * np.pi * 200 * time)
+
+    low = BandEnergy(10, 100, sample_rate)
+    high = BandEnergy(100, 500, sample_rate, name="high")
+    results = list(aggregate([_Package(0.0, signal)], 1, [low, high, Peak()]))
+
+    assert results[0]["band_energy_10_100"] == pytest.approx(500.0)
+    assert results[0]["high"] == pytest.approx(125.0)
+    assert results[0]["peak"] == pytest.approx(np.max(np.abs(signal)))
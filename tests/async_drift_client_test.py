@@ -0,0 +1,184 @@
+"""Tests for AsyncDriftClient"""
+
+import asyncio
+
+import numpy as np
+import pytest
+from reduct import ReductError
+
+from drift_client import AsyncDriftClient
+
+
+@pytest.fixture(name="minio_klass")
+def _mock_minio_class(mocker):
+    return mocker.patch("drift_client.async_drift_client.AsyncMinIOClient")
+
+
+@pytest.fixture(name="influxdb_client")
+def _mock_influx_client(mocker):
+    klass = mocker.patch("drift_client.async_drift_client.AsyncInfluxDBClient")
+    client = mocker.AsyncMock()
+    klass.return_value = client
+    return client
+
+
+@pytest.fixture(name="reduct_klass")
+def _mock_reduct_class(mocker):
+    return mocker.patch("drift_client.async_drift_client.AsyncReductStoreClient")
+
+
+@pytest.fixture(name="reduct_client")
+def _mock_reduct_client(mocker, reduct_klass):
+    client = mocker.AsyncMock()
+    client.name = mocker.Mock(return_value="reductstore")
+    reduct_klass.return_value = client
+    return client
+
+
+def test__password_required():
+    """should raise error if no password is not provided"""
+    with pytest.raises(ValueError):
+        _ = AsyncDriftClient("host_name", None)
+
+
+@pytest.mark.usefixtures("influxdb_client")
+def test__shared_session(reduct_klass, reduct_client):
+    """should connect once and share one session between requests"""
+    _ = reduct_client
+
+    async def _test():
+        async with AsyncDriftClient("host_name", "password") as client:
+            await client.connect()
+            session = reduct_klass.call_args.kwargs["session"]
+            assert not session.closed
+        return session
+
+    session = asyncio.run(_test())
+    assert session.closed
+    reduct_klass.assert_called_once()
+    assert reduct_klass.call_args.args == ("http://host_name:8383", "password", 30)
+
+
+@pytest.mark.usefixtures("influxdb_client")
+def test__minio_fallback(reduct_client, minio_klass, caplog):
+    """should use minio client if ReductStore is not available"""
+    reduct_client.check_connection.side_effect = ReductError(599, "Connection error")
+
+    async def _test():
+        async with AsyncDriftClient("host_name", "password"):
+            pass
+
+    asyncio.run(_test())
+    minio_klass.assert_called_with("http://host_name:9000", "panda", "password", False)
+    assert "Using MinIO Storage instead" in caplog.text
+
+
+@pytest.mark.parametrize(
+    "error", [ReductError(500, "Internal error"), asyncio.TimeoutError()]
+)
+def test__close_sessions_if_connect_failed(
+    reduct_klass, reduct_client, influxdb_client, error
+):
+    """should close sessions if connection check failed"""
+    reduct_client.check_connection.side_effect = error
+
+    async def _test():
+        client = AsyncDriftClient("host_name", "password")
+        with pytest.raises(type(error)):
+            await client.connect()
+        return reduct_klass.call_args.kwargs["session"]
+
+    session = asyncio.run(_test())
+    assert session.closed
+    influxdb_client.close.assert_awaited_once()
+
+
+def test__concurrent_get_item(mocker, reduct_client, influxdb_client):
+    """should run concurrent requests"""
+    _ = influxdb_client
+    package_klass = mocker.patch("drift_client.async_drift_client.DriftDataPackage")
+
+    async def fetch_data(path):
+        await asyncio.sleep(0.01)
+        return path.encode()
+
+    reduct_client.fetch_data.side_effect = fetch_data
+
+    async def _test():
+        async with AsyncDriftClient("host_name", "password") as client:
+            return await asyncio.gather(
+                *(client.get_item(f"topic/{i}.dp") for i in range(100))
+            )
+
+    items = asyncio.run(_test())
+    assert len(items) == 100
+    package_klass.assert_called_with(b"topic/99.dp")
+
+
+def test__walk_data(mocker, reduct_client, influxdb_client):
+    """should iterate data in reductstore asynchronously"""
+    mocker.patch("drift_client.async_drift_client.DriftDataPackage")
+
+    async def _walk(*_args, **_kwargs):
+        for item in [b"", b""]:
+            yield item
+
+    reduct_client.walk = mocker.Mock(side_effect=_walk)
+
+    async def _test():
+        async with AsyncDriftClient("host_name", "password") as client:
+            return [pkg async for pkg in client.walk("topic", 0.0, 1.0, ttl=10)]
+
+    data = asyncio.run(_test())
+    assert len(data) == 2
+
+    reduct_client.walk.assert_called_with("topic", 0, 1, ttl=10)
+    influxdb_client.query_data.assert_not_called()
+
+
+@pytest.mark.usefixtures("influxdb_client")
+def test__walk_data_close(mocker, reduct_client):
+    """should close walk in reductstore if iteration is stopped"""
+    mocker.patch("drift_client.async_drift_client.DriftDataPackage")
+    closed = []
+
+    async def _walk(*_args, **_kwargs):
+        try:
+            for item in [b"", b""]:
+                yield item
+        finally:
+            closed.append(True)
+
+    reduct_client.walk = mocker.Mock(side_effect=_walk)
+
+    async def _test():
+        async with AsyncDriftClient("host_name", "password") as client:
+            packages = client.walk("topic", 0.0, 1.0)
+            async for _ in packages:
+                break
+            await packages.aclose()
+            return list(closed)
+
+    assert asyncio.run(_test()) == [True]
+
+
+@pytest.mark.usefixtures("reduct_client")
+def test__get_metrics(influxdb_client):
+    """Should get metrics from InfluxDB and return it like a list of dictioniers"""
+    influxdb_client.query_columns.return_value = {
+        "filed_1": (np.array([10000, 10010]) * 1_000_000_000, np.array([1, 2])),
+        "filed_2": (np.array([10000, 10010]) * 1_000_000_000, np.array([3, 4])),
+    }
+
+    async def _test():
+        async with AsyncDriftClient("host_name", "password") as client:
+            return await client.get_metrics("topic", 0.0, 1.0, names=["filed_1"])
+
+    data = asyncio.run(_test())
+    assert data == [
+        {"filed_1": 1, "filed_2": 3, "time": 10000.0},
+        {"filed_1": 2, "filed_2": 4, "time": 10010.0},
+    ]
+    influxdb_client.query_columns.assert_called_with(
+        "topic", 0, 1, fields=["filed_1"], every=None, fn="mean"
+    )
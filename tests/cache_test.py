@@ -0,0 +1,135 @@
+"""Tests for PackageCache"""
+
+import os
+import time
+
+import pytest
+
+from drift_client.cache import PackageCache, CachedBlobStorage
+from drift_client.error import DriftClientError
+
+
+@pytest.fixture(name="cache")
+def _make_cache(tmp_path) -> PackageCache:
+    return PackageCache(tmp_path, 100)
+
+
+def test__put_get(cache):
+    """should keep package on disk and read it with mmap"""
+    cache.put("topic/1.dp", b"data")
+
+    assert "topic/1.dp" in cache
+    assert cache.get("topic/1.dp") == b"data"
+    assert isinstance(cache.get("topic/1.dp"), memoryview)
+    assert cache.get("topic/2.dp") is None
+    assert cache.size == 4
+
+
+def test__lru_eviction(cache):
+    """should remove least recently used packages if cache is full"""
+    cache.put("topic/1.dp", b"1" * 40)
+    cache.put("topic/2.dp", b"2" * 40)
+    _ = cache.get("topic/1.dp")
+    cache.put("topic/3.dp", b"3" * 40)
+
+    assert "topic/1.dp" in cache
+    assert "topic/2.dp" not in cache
+    assert "topic/3.dp" in cache
+    assert cache.size == 80
+
+
+def test__restore(tmp_path, cache):
+    """should restore cached packages and their order after restart"""
+    cache.put("topic/1.dp", b"1" * 40)
+    cache.put("topic/2.dp", b"2" * 40)
+    time.sleep(0.01)
+    _ = cache.get("topic/1.dp")
+
+    cache = PackageCache(tmp_path, 60)
+    assert len(cache) == 1
+    assert cache.get("topic/1.dp") == b"1" * 40
+    assert not os.path.exists(tmp_path / "topic" / "2.dp")
+
+
+def test__invalid_name(cache):
+    """should not write files outside of cache"""
+    with pytest.raises(ValueError):
+        cache.put("../1.dp", b"")
+
+
+def test__cached_storage(mocker, cache):
+    """should fetch only missing packages from storage"""
+    storage = mocker.Mock()
+    storage.fetch_many.side_effect = lambda paths, _: [p.encode() for p in paths]
+    storage.fetch_data.side_effect = lambda path: path.encode()
+
+    cached = CachedBlobStorage(storage, cache)
+    assert cached.fetch_data("topic/1.dp") == b"topic/1.dp"
+    assert list(cached.fetch_many(["topic/0.dp", "topic/1.dp", "topic/2.dp"], 4)) == [
+        b"topic/0.dp",
+        b"topic/1.dp",
+        b"topic/2.dp",
+    ]
+    storage.fetch_many.assert_called_with(["topic/0.dp", "topic/2.dp"], 4)
+
+    assert list(cached.fetch_many(["topic/3.dp", "topic/1.dp"], 4, False)) == [
+        b"topic/1.dp",
+        b"topic/3.dp",
+    ]
+    assert cached.fetch_data("topic/2.dp") == b"topic/2.dp"
+    storage.fetch_data.assert_called_once()
+
+
+def test__eviction_of_locked_file(mocker, cache):
+    """should keep package in cache if its file can't be removed"""
+    cache.put("topic/1.dp", b"1" * 40)
+    cache.put("topic/2.dp", b"2" * 40)
+
+    remove = os.remove
+
+    def _remove(path):
+        if str(path).endswith("1.dp"):
+            raise PermissionError("file is mapped")
+        remove(path)
+
+    mocker.patch("drift_client.cache.os.remove", side_effect=_remove)
+    cache.put("topic/3.dp", b"3" * 40)
+
+    assert "topic/1.dp" in cache
+    assert "topic/2.dp" not in cache
+    assert cache.get("topic/1.dp") == b"1" * 40
+    assert cache.size == 80
+
+
+def test__replace_locked_file(mocker, tmp_path, cache):
+    """should keep cached file if it can't be replaced"""
+    cache.put("topic/1.dp", b"data")
+    mocker.patch("drift_client.cache.os.replace", side_effect=PermissionError)
+    cache.put("topic/1.dp", b"data")
+
+    assert cache.get("topic/1.dp") == b"data"
+    assert cache.size == 4
+    assert not list((tmp_path / "topic").glob("*.tmp"))
+
+
+def test__remove_tmp_files(tmp_path):
+    """should remove files of interrupted writes"""
+    (tmp_path / "topic").mkdir()
+    (tmp_path / "topic" / ".1.dp.1234.tmp").write_bytes(b"1")
+
+    cache = PackageCache(tmp_path, 100)
+    assert not list((tmp_path / "topic").iterdir())
+    assert len(cache) == 0
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test__cached_storage_missing_item(mocker, cache, ordered):
+    """should raise error if storage doesn't return a package"""
+    storage = mocker.Mock()
+    storage.fetch_many.return_value = [b"topic/0.dp"]
+
+    cached = CachedBlobStorage(storage, cache)
+    with pytest.raises(DriftClientError, match="Could not read item at topic/1.dp"):
+        list(cached.fetch_many(["topic/0.dp", "topic/1.dp"], 4, ordered))
+    assert "topic/0.dp" in cache
+    assert "topic/1.dp" not in cache
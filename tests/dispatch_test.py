@@ -0,0 +1,172 @@
+"""Tests for MessageDispatcher"""
+
+import threading
+
+import pytest
+from drift_protocol.common import DriftPackage
+
+from drift_client.dispatch import MessageDispatcher
+
+PAYLOAD = DriftPackage(id=1).SerializeToString()
+
+
+def _ignore(_package):
+    pass
+
+
+@pytest.fixture(name="blocked")
+def _make_blocked_handler():
+    """handler which waits until the event is set"""
+    event = threading.Event()
+    handled = []
+
+    def handler(package):
+        event.wait()
+        handled.append(package.package_id)
+
+    yield event, handled, handler
+    event.set()
+
+
+def test__handle_in_workers():
+    """should parse payloads and call handler in worker threads"""
+    handled = []
+    dispatcher = MessageDispatcher(
+        lambda pkg: handled.append(pkg.package_id), workers=2
+    )
+    for _ in range(10):
+        dispatcher.submit(PAYLOAD)
+
+    dispatcher.stop()
+    assert handled == [1] * 10
+    assert dispatcher.stats.processed == 10
+    assert dispatcher.stats.received == 10
+
+
+def test__handle_errors():
+    """should count errors of handler and broken payloads"""
+
+    def handler(_package):
+        raise RuntimeError("test")
+
+    dispatcher = MessageDispatcher(handler)
+    dispatcher.submit(PAYLOAD)
+    dispatcher.submit(b"\xff")
+    dispatcher.stop()
+
+    assert dispatcher.stats.errors == 2
+    assert dispatcher.stats.processed == 0
+
+
+def _submit_when_blocked(blocked, overflow):
+    event, handled, handler = blocked
+    dispatcher = MessageDispatcher(handler, queue_size=2, overflow=overflow)
+    dispatcher.submit(DriftPackage(id=0).SerializeToString())
+    while dispatcher.stats.queue_depth > 0:  # wait for worker
+        pass
+
+    for idx in range(1, 5):
+        dispatcher.submit(DriftPackage(id=idx).SerializeToString())
+
+    stats = dispatcher.stats
+    event.set()
+    dispatcher.stop()
+    return stats, handled
+
+
+def test__drop_newest(blocked):
+    """should drop received payloads if queue is full"""
+    stats, handled = _submit_when_blocked(blocked, "drop-newest")
+    assert stats.queue_depth == 2
+    assert stats.dropped == 2
+    assert handled == [0, 1, 2]
+
+
+def test__drop_oldest(blocked):
+    """should drop the oldest payloads if queue is full"""
+    stats, handled = _submit_when_blocked(blocked, "drop-oldest")
+    assert stats.queue_depth == 2
+    assert stats.dropped == 2
+    assert handled == [0, 3, 4]
+
+
+def test__block(blocked):
+    """should wait for free slot if queue is full"""
+    event, handled, handler = blocked
+    dispatcher = MessageDispatcher(handler, queue_size=1)
+
+    def submit():
+        for _ in range(3):
+            dispatcher.submit(PAYLOAD)
+
+    thread = threading.Thread(target=submit)
+    thread.start()
+    thread.join(0.1)
+    assert thread.is_alive()
+
+    event.set()
+    thread.join()
+    dispatcher.stop()
+    assert handled == [1] * 3
+    assert dispatcher.stats.dropped == 0
+
+
+def test__stop_with_full_queue(blocked):
+    """should stop if the queue is full and payloads are still submitted"""
+    event, handled, handler = blocked
+    dispatcher = MessageDispatcher(handler, queue_size=1, overflow="drop-oldest")
+    dispatcher.submit(PAYLOAD)
+    while dispatcher.stats.queue_depth > 0:  # wait for worker
+        pass
+    for _ in range(2):
+        dispatcher.submit(PAYLOAD)
+
+    stop = threading.Thread(target=dispatcher.stop)
+    stop.start()
+    for _ in range(10):
+        dispatcher.submit(PAYLOAD)
+    event.set()
+    stop.join(1)
+
+    assert not stop.is_alive()
+    assert dispatcher.stopped
+    assert len(handled) == 2
+
+
+def test__submit_after_stop(blocked):
+    """should ignore payloads after stop and release blocked submit"""
+    event, _, handler = blocked
+    on_stop = threading.Event()
+    dispatcher = MessageDispatcher(handler, queue_size=1, on_stop=on_stop.set)
+    for _ in range(2):
+        dispatcher.submit(PAYLOAD)
+
+    submit = threading.Thread(target=dispatcher.submit, args=(PAYLOAD,))
+    submit.start()
+    dispatcher.stop(timeout=0.1)
+    submit.join(1)
+
+    assert not submit.is_alive()
+    assert on_stop.is_set()
+    dispatcher.submit(PAYLOAD)
+    assert dispatcher.stats.received == 3
+    assert dispatcher.stats.dropped == 1
+
+    event.set()
+    dispatcher.stop()
+
+
+def test__handle_in_processes():
+    """should handle payloads in a process pool"""
+    dispatcher = MessageDispatcher(_ignore, workers=2, processes=True)
+    for _ in range(4):
+        dispatcher.submit(PAYLOAD)
+    dispatcher.stop()
+
+    assert dispatcher.stats.processed == 4
+
+
+def test__unknown_overflow():
+    """should raise error for unknown overflow policy"""
+    with pytest.raises(ValueError):
+        MessageDispatcher(_ignore, overflow="drop")
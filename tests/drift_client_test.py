@@ -1,12 +1,20 @@
 """Tests for DriftClient"""
 
+import asyncio
+import threading
 from datetime import datetime
 from typing import Optional, List, Any
 
+import numpy as np
 import pytest
+from drift_protocol.common import DriftPackage
 from reduct import ReductError
 
 from drift_client import DriftClient
+from drift_client.error import DriftClientError
+from drift_client.local_storage import save_metrics
+from drift_client.pack import PackWriter
+from benchmarks.builders import make_signal_blob
 
 
 class Iter:  # pylint: disable=too-few-public-methods
@@ -20,6 +28,16 @@ class Iter:  # pylint: disable=too-few-public-methods
             yield item
 
 
+def _make_columns(**fields):
+    return {
+        field: (
+            np.array([int(ts * 1e9) for ts, _ in values], dtype=np.int64),
+            np.array([value for _, value in values]),
+        )
+        for field, values in fields.items()
+    }
+
+
 @pytest.fixture(name="minio_klass")
 def _mock_minio_class(mocker):
     return mocker.patch("drift_client.drift_client.MinIOClient")
@@ -105,7 +123,9 @@ def test__get_topic_data(influxdb_client, reduct_client, start_ts, stop_ts):
     """should get timestamp and values for records using start and stop timestamps
     from influxdb and make paths in minio"""
     client = DriftClient("host_name", "password")
-    influxdb_client.query_data.return_value = {"status": [(10000.0, 0), (10010.0, 512)]}
+    influxdb_client.query_columns.return_value = _make_columns(
+        status=[(10000.0, 0), (10010.0, 512)]
+    )
     expected = [
         "topic/10000000.dp",
         "topic/10010000.dp",
@@ -115,7 +135,7 @@ def test__get_topic_data(influxdb_client, reduct_client, start_ts, stop_ts):
     data = client.get_package_names("topic", start_ts, stop_ts)
     assert data == expected
 
-    influxdb_client.query_data.assert_called_with(
+    influxdb_client.query_columns.assert_called_with(
         "topic", 1640991600, 1640991600, fields="status"
     )
     reduct_client.check_package_list.assert_called_with(expected)
@@ -146,10 +166,10 @@ def test__walk_data(influxdb_client, reduct_client):
 def test__get_metrics(influxdb_client, start_ts, stop_ts):
     """Should get metrics from InfluxDB and return it like a list of dictioniers"""
     client = DriftClient("host_name", "password")
-    influxdb_client.query_data.return_value = {
-        "filed_1": [(10000.0, 1), (10010.0, 2)],
-        "filed_2": [(10000.0, 3), (10010.0, 4)],
-    }
+    influxdb_client.query_columns.return_value = _make_columns(
+        filed_1=[(10000.0, 1), (10010.0, 2)],
+        filed_2=[(10000.0, 3), (10010.0, 4)],
+    )
 
     data = client.get_metrics("topic", start_ts, stop_ts, names=["field_1", "field_2"])
     assert data == [
@@ -157,9 +177,444 @@ def test__get_metrics(influxdb_client, start_ts, stop_ts):
         {"filed_1": 2, "filed_2": 4, "time": 10010.0},
     ]
 
-    influxdb_client.query_data.assert_called_with(
+    influxdb_client.query_columns.assert_called_with(
         "topic",
         1640991600,
         1640991600,
         fields=["field_1", "field_2"],
+        every=None,
+        fn="mean",
+    )
+
+
+def test__get_items(mocker, reduct_client):
+    """should fetch items concurrently"""
+    package_klass = mocker.patch("drift_client.drift_client.DriftDataPackage")
+    client = DriftClient("host_name", "password")
+    reduct_client.fetch_many.return_value = Iter([b"1", b"2"])
+
+    data = list(client.get_items(["topic/1.dp", "topic/2.dp"], max_workers=4))
+    assert len(data) == 2
+
+    reduct_client.fetch_many.assert_called_with(["topic/1.dp", "topic/2.dp"], 4, True)
+    package_klass.assert_called_with(b"2")
+
+
+def test__instrumentation(mocker, influxdb_client, reduct_client):
+    """should pass hook to backends and measure parsing of packages"""
+    mqtt_client = mocker.patch("drift_client.drift_client.MQTTClient").return_value
+    hook = mocker.Mock()
+    client = DriftClient("host_name", "password", instrumentation=hook)
+
+    reduct_client.instrument.assert_called_with(hook)
+    influxdb_client.instrument.assert_called_with(hook)
+    mqtt_client.instrument.assert_called_with(hook)
+
+    reduct_client.fetch_data.return_value = DriftPackage(id=1).SerializeToString()
+    assert client.get_item("topic/1.dp").package_id == 1
+    source, metric, value = hook.call_args.args
+    assert (source, metric) == ("drift_client", "parse_seconds")
+    assert value >= 0
+
+    client.instrument(None)
+    reduct_client.instrument.assert_called_with(None)
+    hook.reset_mock()
+    client.get_item("topic/1.dp")
+    hook.assert_not_called()
+
+
+def test__walk_decode_np(reduct_client):
+    """should decode packages in process pool and keep order"""
+    client = DriftClient("host_name", "password")
+    signals = [np.full(16, i, dtype=np.float32) for i in range(20)]
+    reduct_client.walk.return_value = Iter([make_signal_blob(s) for s in signals])
+
+    data = list(client.walk("topic", 0.0, 1.0, decode="np", workers=2))
+    assert [list(s) for s in data] == [list(s) for s in signals]
+
+    data = list(client.walk("topic", 0.0, 1.0, decode="np", workers=2, scale_factor=1))
+    assert len(data[0]) == 8
+
+
+@pytest.mark.usefixtures("reduct_klass")
+def test__get_metrics_columns(influxdb_client):
+    """Should get metrics pivoted on the server as numpy arrays"""
+    client = DriftClient("host_name", "password")
+    table = {"time": np.array([1, 2]), "status": np.array([0.0, 1.0])}
+    influxdb_client.query_table.return_value = table
+
+    data = client.get_metrics("topic", 0.0, 1.0, names=["status"], format="columns")
+    assert data is table
+
+    influxdb_client.query_table.assert_called_with(
+        "topic", 0, 1, fields=["status"], every=None, fn="mean"
+    )
+    influxdb_client.query_columns.assert_not_called()
+
+
+@pytest.mark.usefixtures("reduct_klass")
+def test__get_metrics_aggregated(influxdb_client):
+    """Should aggregate metrics in InfluxDB"""
+    client = DriftClient("host_name", "password")
+    influxdb_client.query_columns.return_value = _make_columns(
+        field_min=[(60.0, 1.0)], field_max=[(60.0, 2.0)]
+    )
+
+    data = client.get_metrics("topic", 0.0, 60.0, every="1m", fn=["min", "max"])
+    assert data == [{"field_min": 1.0, "field_max": 2.0, "time": 60.0}]
+
+    influxdb_client.query_columns.assert_called_with(
+        "topic", 0, 60, fields=None, every="1m", fn=["min", "max"]
+    )
+
+
+@pytest.mark.usefixtures("reduct_klass", "influxdb_client")
+def test__get_metrics_unknown_format():
+    """Should raise error for unknown format"""
+    client = DriftClient("host_name", "password")
+    with pytest.raises(ValueError):
+        client.get_metrics("topic", 0.0, 1.0, format="pandas")
+
+
+def test__walk_many(reduct_client):
+    """should walk a few topics and merge packages by source timestamp"""
+    client = DriftClient("host_name", "password")
+    signal = np.zeros(4, dtype=np.float32)
+    timestamps = {"topic_1": [1000, 3000, 4000], "topic_2": [2000, 3000, 5000]}
+
+    def _walk(topic, *_args, **_kwargs):
+        for timestamp in timestamps[topic]:
+            yield make_signal_blob(signal, timestamp)
+
+    reduct_client.walk.side_effect = _walk
+
+    data = [
+        (topic, pkg.source_timestamp)
+        for topic, pkg in client.walk_many(["topic_1", "topic_2"], 0.0, 6.0, lazy=True)
+    ]
+    assert data == [
+        ("topic_1", 1.0),
+        ("topic_2", 2.0),
+        ("topic_1", 3.0),
+        ("topic_2", 3.0),
+        ("topic_1", 4.0),
+        ("topic_2", 5.0),
+    ]
+
+    reduct_client.walk.assert_any_call("topic_1", 0, 6, prefetch=16)
+    reduct_client.walk.assert_any_call("topic_2", 0, 6, prefetch=16)
+
+
+def test__walk_batches(reduct_client):
+    """should stack signals of packages in batches"""
+    client = DriftClient("host_name", "password")
+    signals = [np.full(4, i, dtype=np.float32) for i in range(5)]
+    reduct_client.walk.return_value = Iter(
+        [make_signal_blob(s, i * 1000) for i, s in enumerate(signals)]
     )
+
+    batches = [
+        (timestamps.copy(), data.copy())
+        for timestamps, _, data in client.walk_batches(
+            "topic", 0.0, 5.0, batch_size=2, ttl=10
+        )
+    ]
+    assert [len(timestamps) for timestamps, _ in batches] == [2, 2, 1]
+    assert np.concatenate([ts for ts, _ in batches]).tolist() == [0, 1, 2, 3, 4]
+    assert np.array_equal(np.concatenate([d for _, d in batches]), np.stack(signals))
+
+    reduct_client.walk.assert_called_with("topic", 0, 5, ttl=10)
+
+
+def test__walk_batches_different_shapes(reduct_client):
+    """should raise error if signals have different shapes"""
+    client = DriftClient("host_name", "password")
+    reduct_client.walk.return_value = Iter(
+        [
+            make_signal_blob(np.zeros(4, dtype=np.float32)),
+            make_signal_blob(np.zeros(8, dtype=np.float32)),
+        ]
+    )
+
+    with pytest.raises(ValueError):
+        list(client.walk_batches("topic", 0.0, 5.0))
+
+
+def test__aggregate(reduct_client):
+    """should aggregate signals of walked packages in windows"""
+    client = DriftClient("host_name", "password")
+    reduct_client.walk.return_value = Iter(
+        [make_signal_blob(np.full(4, i, dtype=np.float32), i * 1000) for i in range(4)]
+    )
+
+    results = list(
+        client.aggregate(
+            "topic", 0.0, 4.0, window="2s", reducers=["mean", "max"], lazy=False
+        )
+    )
+    assert results == [
+        {"start": 0.0, "stop": 2.0, "count": 2, "mean": 0.5, "max": 1.0},
+        {"start": 2.0, "stop": 4.0, "count": 2, "mean": 2.5, "max": 3.0},
+    ]
+
+
+def test__export(reduct_client, tmp_path):
+    """should export walked packages to files in chunks"""
+    client = DriftClient("host_name", "password")
+    signals = [np.full(4, i, dtype=np.float32) for i in range(3)]
+    reduct_client.walk.return_value = Iter(
+        [make_signal_blob(s, i * 1000) for i, s in enumerate(signals)]
+    )
+
+    files = client.export(
+        "topic", 0.0, 3.0, tmp_path, format="npz", chunk_rows=2, lazy=False
+    )
+    assert len(files) == 2
+    data = [np.load(file) for file in files]
+    assert np.concatenate([d["source_timestamp"] for d in data]).tolist() == [0, 1, 2]
+    assert np.array_equal(np.concatenate([d["signal"] for d in data]), signals)
+
+    reduct_client.walk.assert_called_with("topic", 0, 3, prefetch=64)
+
+
+def test__measure_decode(mocker, reduct_client, tmp_path):
+    """should measure decoding of packages in aggregate and export"""
+    hook = mocker.Mock()
+    client = DriftClient("host_name", "password", instrumentation=hook)
+
+    def decoded():
+        return [call.args[1] for call in hook.call_args_list].count("decode_seconds")
+
+    reduct_client.walk.side_effect = lambda *_args, **_kwargs: Iter(
+        [make_signal_blob(np.zeros(4, dtype=np.float32), i * 1000) for i in range(3)]
+    )
+    list(client.aggregate("topic", 0.0, 3.0, window="1s", reducers=["mean"]))
+    assert decoded() == 3
+
+    client.export("topic", 0.0, 3.0, tmp_path, format="npz")
+    assert decoded() == 6
+
+
+@pytest.mark.usefixtures("reduct_client", "influxdb_client")
+def test__subscribe_data_non_blocking(mocker):
+    """should return immediately and handle packages in workers"""
+    mqtt_client = mocker.patch("drift_client.drift_client.MQTTClient").return_value
+    mqtt_client.is_connected.return_value = False
+    client = DriftClient("host_name", "password")
+
+    handled = []
+    dispatcher = client.subscribe_data(
+        "topic", lambda pkg: handled.append(pkg.package_id), blocking=False
+    )
+    mqtt_client.loop_start.assert_called_once()
+    mqtt_client.loop_forever.assert_not_called()
+
+    topic, on_message = mqtt_client.subscribe.call_args.args
+    assert topic == "topic"
+    on_message(mocker.Mock(payload=DriftPackage(id=5).SerializeToString()))
+
+    dispatcher.join()
+    assert handled == [5]
+    assert dispatcher.stats.processed == 1
+
+    dispatcher.stop()
+    mqtt_client.unsubscribe.assert_called_once_with(mqtt_client.subscribe.return_value)
+    client.close()
+    mqtt_client.unsubscribe.assert_called_once()
+
+
+@pytest.mark.parametrize("method", ["connect", "subscribe"])
+@pytest.mark.usefixtures("reduct_client", "influxdb_client")
+def test__subscribe_data_non_blocking_error(mocker, method):
+    """should stop workers if failed to connect or subscribe"""
+    mqtt_client = mocker.patch("drift_client.drift_client.MQTTClient").return_value
+    mqtt_client.is_connected.return_value = False
+    getattr(mqtt_client, method).side_effect = ConnectionError("failed")
+    client = DriftClient("host_name", "password")
+
+    threads = threading.enumerate()
+    with pytest.raises(ConnectionError):
+        client.subscribe_data("topic", lambda pkg: None, blocking=False, workers=2)
+
+    assert threading.enumerate() == threads
+    mqtt_client.unsubscribe.assert_not_called()
+    client.close()
+
+
+@pytest.mark.usefixtures("reduct_client", "influxdb_client")
+def test__stream(mocker):
+    """should iterate packages received in network thread and unsubscribe"""
+    mqtt_client = mocker.patch("drift_client.drift_client.MQTTClient").return_value
+    mqtt_client.is_connected.return_value = False
+    client = DriftClient("host_name", "password")
+
+    def receive(package_ids):
+        _, on_message = mqtt_client.subscribe.call_args.args
+        on_message(mocker.Mock(payload=b"bad payload"))
+        for package_id in package_ids:
+            on_message(
+                mocker.Mock(payload=DriftPackage(id=package_id).SerializeToString())
+            )
+
+    async def _test():
+        ids = []
+        async for package in client.stream("topic", maxsize=10):
+            if not ids:
+                threading.Thread(target=receive, args=(range(3),)).start()
+            ids.append(package.package_id)
+            if len(ids) == 4:
+                break
+        return ids
+
+    async def _run():
+        task = asyncio.ensure_future(_test())
+        while not mqtt_client.subscribe.called:
+            await asyncio.sleep(0.001)
+        receive([10])
+        return await task
+
+    assert asyncio.run(_run()) == [10, 0, 1, 2]
+    mqtt_client.subscribe.assert_called_once()
+    mqtt_client.unsubscribe.assert_called_once_with(mqtt_client.subscribe.return_value)
+
+
+@pytest.mark.usefixtures("reduct_client", "influxdb_client")
+def test__stream_drop_oldest(mocker):
+    """should drop the oldest packages if the queue is full"""
+    mqtt_client = mocker.patch("drift_client.drift_client.MQTTClient").return_value
+    client = DriftClient("host_name", "password")
+
+    async def _test():
+        stream = client.stream("topic", maxsize=2)
+        first = asyncio.ensure_future(stream.__anext__())
+        while not mqtt_client.subscribe.called:
+            await asyncio.sleep(0.001)
+
+        _, on_message = mqtt_client.subscribe.call_args.args
+        for package_id in range(5):
+            on_message(
+                mocker.Mock(payload=DriftPackage(id=package_id).SerializeToString())
+            )
+
+        ids = [(await first).package_id, (await stream.__anext__()).package_id]
+        await stream.aclose()
+        return ids
+
+    assert asyncio.run(_test()) == [3, 4]
+    mqtt_client.unsubscribe.assert_called_once()
+
+    with pytest.raises(ValueError, match="Unknown overflow policy"):
+        asyncio.run(client.stream("topic", overflow="wrong").__anext__())
+
+
+@pytest.mark.usefixtures("reduct_client", "influxdb_client")
+def test__publish_many(mocker):
+    """should keep not more than max_inflight messages in flight"""
+    mqtt_client = mocker.patch("drift_client.drift_client.MQTTClient").return_value
+    mqtt_client.is_connected.return_value = False
+
+    inflight = []
+    max_inflight = [0]
+
+    def publish(*_args, **_kwargs):
+        info = mocker.Mock(rc=0)
+        info.wait_for_publish.side_effect = lambda _timeout: inflight.remove(info)
+        inflight.append(info)
+        max_inflight[0] = max(max_inflight[0], len(inflight))
+        return info
+
+    mqtt_client.publish.side_effect = publish
+    client = DriftClient("host_name", "password")
+
+    stats = client.publish_many("topic", (b"x" * 10 for _ in range(20)), max_inflight=4)
+    assert stats.messages == 20
+    assert stats.bytes == 200
+    assert max_inflight[0] == 4
+    assert not inflight
+    assert mqtt_client.max_inflight_messages_set.call_args_list == [
+        mocker.call(4),
+        mocker.call(mqtt_client.max_inflight_messages),
+    ]
+    mqtt_client.publish.assert_called_with("topic", b"x" * 10, qos=1)
+
+
+@pytest.mark.usefixtures("reduct_client", "influxdb_client")
+def test__publish_many_error(mocker):
+    """should raise DriftClientError if message isn't published"""
+    mqtt_client = mocker.patch("drift_client.drift_client.MQTTClient").return_value
+    info = mqtt_client.publish.return_value
+    info.wait_for_publish.side_effect = RuntimeError(
+        "The client is not currently connected."
+    )
+    client = DriftClient("host_name", "password")
+
+    with pytest.raises(DriftClientError, match="Failed to publish message"):
+        client.publish_many("topic", [b"data"])
+
+    info.wait_for_publish.side_effect = None
+    info.is_published.return_value = False
+    with pytest.raises(DriftClientError, match="isn't published"):
+        client.publish_many("topic", [b"data"])
+
+    mqtt_client.max_inflight_messages_set.assert_called_with(
+        mqtt_client.max_inflight_messages
+    )
+
+
+@pytest.mark.usefixtures("reduct_client")
+def test__walk_decode_unknown():
+    """should raise error for unknown decoding"""
+    client = DriftClient("host_name", "password")
+    with pytest.raises(ValueError):
+        list(client.walk("topic", 0.0, 1.0, decode="pandas"))
+
+
+def test__walk_with_cache(tmp_path, influxdb_client, reduct_client):
+    """should walk through cache if it is enabled"""
+    client = DriftClient("host_name", "password", cache_dir=tmp_path)
+    influxdb_client.query_columns.return_value = _make_columns(
+        status=[(1.0, 0), (2.0, 0)]
+    )
+    reduct_client.check_package_list.side_effect = lambda names: names
+    reduct_client.fetch_many.side_effect = lambda paths, _: [
+        make_signal_blob(np.zeros(4, dtype=np.float32)) for _ in paths
+    ]
+
+    assert len(list(client.walk("topic", 0.0, 3.0))) == 2
+    assert len(list(client.walk("topic", 0.0, 3.0))) == 2
+
+    reduct_client.walk.assert_not_called()
+    reduct_client.fetch_many.assert_called_once_with(
+        ["topic/1000.dp", "topic/2000.dp"], 8
+    )
+    assert (tmp_path / "topic" / "1000.dp").exists()
+
+
+def test__archive_dir(tmp_path, influxdb_klass, reduct_klass):
+    """should replay packages and metrics from local archive"""
+    signals = [np.full(4, i, dtype=np.float32) for i in range(3)]
+    with PackWriter(tmp_path / "topic.pack") as writer:
+        writer.extend(
+            make_signal_blob(s, (i + 1) * 1000) for i, s in enumerate(signals)
+        )
+    save_metrics(
+        tmp_path,
+        "topic",
+        {"time": np.array([1, 2, 3]) * 1_000_000_000, "status": np.zeros(3)},
+    )
+
+    with DriftClient("host_name", "", archive_dir=tmp_path) as client:
+        assert client.get_topics() == ["topic"]
+        names = client.get_package_names("topic", 0.0, 10.0)
+        assert names == ["topic/1000.dp", "topic/2000.dp", "topic/3000.dp"]
+        assert [pkg.as_np().tolist() for pkg in client.get_items(names)] == [
+            s.tolist() for s in signals
+        ]
+        assert [pkg.source_timestamp for pkg in client.walk("topic", 2.0, 10.0)] == [
+            2.0,
+            3.0,
+        ]
+        assert client.get_metrics("topic", 0.0, 2.0) == [{"status": 0.0, "time": 1.0}]
+
+    influxdb_klass.assert_not_called()
+    reduct_klass.assert_not_called()
@@ -0,0 +1,149 @@
+"""Tests for export to Parquet and NPZ"""
+
+import json
+from typing import Dict, List
+
+# pylint: disable=no-member
+import numpy as np
+import pytest
+from drift_protocol.common import DriftPackage, StatusCode
+
+from drift_client import DriftDataPackage
+from drift_client.export import export
+from benchmarks.builders import (
+    add_payload,
+    add_typed_data,
+    make_package,
+    serialize_signal,
+)
+
+
+def _make_package(package_id: int, status: int = StatusCode.GOOD) -> DriftPackage:
+    pkg = make_package(package_id, 1000 * package_id, status)
+    pkg.publish_timestamp.FromMilliseconds(1000 * package_id + 500)
+    return pkg
+
+
+def _make_signal_package(package_id: int, signal: np.ndarray) -> DriftDataPackage:
+    pkg = _make_package(package_id)
+    label = DriftPackage.Label()
+    label.key = "sensor"
+    label.value = str(package_id)
+    pkg.labels.append(label)
+    return DriftDataPackage(add_payload(pkg, serialize_signal(signal)))
+
+
+def _make_typed_package(package_id: int, values: Dict) -> DriftDataPackage:
+    return DriftDataPackage(add_typed_data(_make_package(package_id), values))
+
+
+@pytest.fixture(name="signals")
+def _make_signals() -> List[np.ndarray]:
+    return [np.full(4, i, dtype=np.float32) for i in range(5)]
+
+
+@pytest.fixture(name="packages")
+def _make_packages(signals) -> List[DriftDataPackage]:
+    packages = [_make_signal_package(i, s) for i, s in enumerate(signals)]
+    # bad package without payload
+    packages[3] = DriftDataPackage(_make_package(3, StatusCode.BAD).SerializeToString())
+    return packages
+
+
+def test__export_npz(tmp_path, packages, signals):
+    """should write packages in chunks to npz files"""
+    files = export(packages, tmp_path / "dataset", "npz", chunk_rows=2)
+    assert [file.name for file in files] == [
+        "part-00000.npz",
+        "part-00001.npz",
+        "part-00002.npz",
+    ]
+
+    chunks = [np.load(file) for file in files]
+    package_ids = np.concatenate([c["package_id"] for c in chunks])
+    assert package_ids.tolist() == [0, 1, 2, 3, 4]
+    assert chunks[0]["source_timestamp"].tolist() == [0.0, 1.0]
+    assert chunks[0]["publish_timestamp"].tolist() == [0.5, 1.5]
+    assert chunks[1]["status"].tolist() == [StatusCode.GOOD, StatusCode.BAD]
+    assert json.loads(chunks[0]["labels"][1]) == {"sensor": "1"}
+    assert chunks[1]["labels"][1] == ""
+
+    assert np.array_equal(chunks[0]["signal"], np.stack(signals[:2]))
+    assert chunks[1]["signal"][0].tolist() == signals[2].tolist()
+    assert np.isnan(chunks[1]["signal"][1]).all()
+
+
+def test__export_npz_typed_data(tmp_path):
+    """should write items of typed data as columns"""
+    packages = [
+        _make_typed_package(0, {"count": 1, "unit": "mm"}),
+        _make_typed_package(1, {"count": 2, "values": [1.0, 2.0]}),
+    ]
+
+    files = export(packages, tmp_path, "npz")
+    chunk = np.load(files[0])
+    assert "signal" not in chunk
+    assert chunk["data.count"].tolist() == [1, 2]
+    assert chunk["data.unit"].tolist() == ["mm", ""]
+    assert chunk["data.values"][1].tolist() == [1.0, 2.0]
+    assert np.isnan(chunk["data.values"][0]).all()
+
+
+def test__export_npz_different_shapes(tmp_path):
+    """should raise error if signals have different shapes"""
+    packages = [
+        _make_signal_package(0, np.zeros(4, dtype=np.float32)),
+        _make_signal_package(1, np.zeros(8, dtype=np.float32)),
+    ]
+    with pytest.raises(ValueError, match="different shapes"):
+        export(packages, tmp_path, "npz")
+
+
+def test__export_write_error(mocker, tmp_path, packages):
+    """should remove partial file if failed to write it"""
+    savez = np.savez
+
+    def write(file, **columns):
+        if file.name != "part-00000.npz":
+            file.write_bytes(b"partial")
+            raise OSError("No space left on device")
+        savez(file, **columns)
+
+    mocker.patch("drift_client.export.np.savez", side_effect=write)
+    with pytest.raises(OSError):
+        export(packages, tmp_path, "npz", chunk_rows=3)
+
+    assert [file.name for file in tmp_path.iterdir()] == ["part-00000.npz"]
+
+
+def test__export_parquet(tmp_path, packages, signals):
+    """should write packages in chunks to parquet files"""
+    pyarrow = pytest.importorskip("pyarrow")
+    parquet = pytest.importorskip("pyarrow.parquet")
+
+    files = export(packages, tmp_path, "parquet", chunk_rows=3)
+    assert [file.name for file in files] == ["part-00000.parquet", "part-00001.parquet"]
+
+    table = parquet.read_table(files[1]).to_pydict()
+    assert table["package_id"] == [3, 4]
+    assert table["source_timestamp"] == [3.0, 4.0]
+    assert table["status"] == [StatusCode.BAD, StatusCode.GOOD]
+    assert table["labels"] == ["", json.dumps({"sensor": "4"})]
+    assert table["signal"] == [None, signals[4].tolist()]
+    assert table["signal_shape"] == [None, [4]]
+
+    schema = parquet.read_schema(files[0])
+    assert schema.field("signal").type.equals(pyarrow.large_list(pyarrow.float32()))
+    assert schema.field("signal_shape").type.equals(pyarrow.large_list(pyarrow.int64()))
+
+
+@pytest.mark.parametrize("options", [{"export_format": "csv"}, {"chunk_rows": 0}])
+def test__export_invalid_options(tmp_path, options):
+    """should raise error if options are invalid"""
+    with pytest.raises(ValueError):
+        export([], tmp_path, **options)
+
+
+def test__export_without_packages(tmp_path):
+    """should not write files if there are no packages"""
+    assert not export([], tmp_path, "npz")
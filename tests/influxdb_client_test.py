@@ -2,9 +2,11 @@
 
 from datetime import datetime
 
+import numpy as np
 import pytest
 from influxdb_client.client.flux_table import FluxRecord
 
+from drift_client.error import DriftClientError
 from drift_client.influxdb_client import InfluxDBClient
 
 
@@ -98,3 +100,221 @@ def test__query_data_for_all_fields(response_multi, dt, query_api):
         'from(bucket:"data") |> range(start:1000, stop: 2000) |> '
         'filter(fn: (r) => r._measurement == "topic" )',
     )
+
+
+CSV_RESPONSE = (
+    b"#datatype,string,long,dateTime:RFC3339,double,string,string\r\n"
+    b",result,table,_time,_value,_field,_measurement\r\n"
+    b",_result,0,2022-01-01T00:00:00Z,1.5,field_1,topic\r\n"
+    b",_result,0,2022-01-01T00:00:01.000000001Z,2.5,field_1,topic\r\n"
+    b"\r\n"
+    b"#datatype,string,long,dateTime:RFC3339,long,string,string\r\n"
+    b",result,table,_time,_value,_field,_measurement\r\n"
+    b",_result,1,2022-01-01T00:00:00Z,512,status,topic\r\n"
+    b"\r\n"
+    b"#datatype,string,long,dateTime:RFC3339,string,string,string\r\n"
+    b",result,table,_time,_value,_field,_measurement\r\n"
+    b',_result,2,2022-01-01T00:00:00Z,"a,\r\nb",label,topic\r\n'
+    b"\r\n"
+)
+
+
+@pytest.fixture(name="raw_response")
+def _make_raw_response(mocker):
+    response = mocker.Mock()
+    # split response into small chunks to check parsing on their borders
+    response.stream.return_value = (
+        CSV_RESPONSE[i : i + 7] for i in range(0, len(CSV_RESPONSE), 7)
+    )
+    return response
+
+
+def test__query_columns(raw_response, query_api):
+    """Should stream data into numpy arrays for each field"""
+    query_api.query_raw.return_value = raw_response
+    influxdb_client = InfluxDBClient(
+        "http://localhost:8086", org="panda", secure=False, token="SECRET", timeout=30
+    )
+    data = influxdb_client.query_columns("topic", 1000, 2000, chunk_size=1)
+
+    times, values = data["field_1"]
+    assert times.dtype == np.int64
+    assert times.tolist() == [1640995200000000000, 1640995201000000001]
+    assert values.dtype == np.float64
+    assert values.tolist() == [1.5, 2.5]
+
+    times, values = data["status"]
+    assert times.tolist() == [1640995200000000000]
+    assert values.dtype == np.int64
+    assert values.tolist() == [512]
+
+    _, values = data["label"]
+    assert values.tolist() == ["a,\r\nb"]
+
+    raw_response.release_conn.assert_called_once()
+    assert query_api.query_raw.call_args.args == (
+        'from(bucket:"data") |> range(start:1000, stop: 2000) |> '
+        'filter(fn: (r) => r._measurement == "topic" )',
+    )
+
+
+def test__query_columns_instrumented(mocker, raw_response, query_api):
+    """Should report request time, size and parse time of the response"""
+    query_api.query_raw.return_value = raw_response
+    influxdb_client = InfluxDBClient(
+        "http://localhost:8086", org="panda", secure=False, token="SECRET", timeout=30
+    )
+    hook = mocker.Mock()
+    influxdb_client.instrument(hook)
+    influxdb_client.query_columns("topic", 1000, 2000)
+
+    assert [call.args[:2] for call in hook.call_args_list] == [
+        ("influxdb", "request_seconds"),
+        ("influxdb", "bytes"),
+        ("influxdb", "parse_seconds"),
+    ]
+    assert hook.call_args_list[1].args[2] == len(CSV_RESPONSE)
+    assert all(call.args[2] >= 0 for call in hook.call_args_list)
+
+
+def test__query_columns_error(mocker, query_api):
+    """Should raise error if InfluxDB reports it in the response"""
+    response = mocker.Mock()
+    response.stream.return_value = [
+        b"#datatype,string,string\r\n,error,reference\r\n,query failed,\r\n"
+    ]
+    query_api.query_raw.return_value = response
+    influxdb_client = InfluxDBClient(
+        "http://localhost:8086", org="panda", secure=False, token="SECRET", timeout=30
+    )
+
+    with pytest.raises(DriftClientError, match="query failed"):
+        influxdb_client.query_columns("topic", 1000, 2000)
+
+    response.release_conn.assert_called_once()
+
+
+MIXED_RESPONSE = (
+    b"#datatype,string,long,dateTime:RFC3339,long,string,string\r\n"
+    b",result,table,_time,_value,_field,_measurement\r\n"
+    b",_result,0,2022-01-01T00:00:00Z,512,value,topic\r\n"
+    b"\r\n"
+    b"#datatype,string,long,dateTime:RFC3339,double,string,string\r\n"
+    b",result,table,_time,_value,_field,_measurement\r\n"
+    b",_result,1,2022-01-01T00:00:01Z,1.5,value,topic\r\n"
+    b"\r\n"
+    b"#datatype,string,long,dateTime:RFC3339,string,string,string\r\n"
+    b",result,table,_time,_value,_field,_measurement\r\n"
+    b",_result,2,2022-01-01T00:00:02Z,ok,value,topic\r\n"
+    b"\r\n"
+)
+
+
+def test__query_columns_mixed_types(mocker, query_api):
+    """Should convert numbers of different types to float
+    and keep converted values as objects if a column mixes numbers with strings"""
+    response = mocker.Mock()
+    query_api.query_raw.return_value = response
+    influxdb_client = InfluxDBClient(
+        "http://localhost:8086", org="panda", secure=False, token="SECRET", timeout=30
+    )
+
+    tables = MIXED_RESPONSE.split(b"\r\n\r\n")
+    response.stream.return_value = [b"\r\n\r\n".join(tables[:2])]
+    data = influxdb_client.query_columns("topic", 1000, 2000, chunk_size=1)
+    assert data["value"][1].dtype == np.float64
+    assert data["value"][1].tolist() == [512.0, 1.5]
+
+    response.stream.return_value = [MIXED_RESPONSE]
+    data = influxdb_client.query_columns("topic", 1000, 2000)
+    assert data["value"][1].tolist() == [512.0, 1.5, "ok"]
+    assert [type(value) for value in data["value"][1]] == [float, float, str]
+
+
+PIVOT_RESPONSE = (
+    b"#datatype,string,long,string,dateTime:RFC3339,long,double\r\n"
+    b"#group,false,false,true,false,false,false\r\n"
+    b",result,table,_measurement,_time,status,value\r\n"
+    b",_result,0,topic,2022-01-01T00:00:00Z,0,1.5\r\n"
+    b",_result,0,topic,2022-01-01T00:00:01Z,512,\r\n"
+    b"\r\n"
+    b"#datatype,string,long,string,dateTime:RFC3339,string\r\n"
+    b"#group,false,false,true,false,false\r\n"
+    b",result,table,_measurement,_time,label\r\n"
+    b",_result,1,topic,2022-01-01T00:00:02Z,ok\r\n"
+    b"\r\n"
+)
+
+
+def test__query_table(mocker, query_api):
+    """Should query data pivoted by time into numpy arrays"""
+    response = mocker.Mock()
+    response.stream.return_value = [PIVOT_RESPONSE]
+    query_api.query_raw.return_value = response
+    influxdb_client = InfluxDBClient(
+        "http://localhost:8086", org="panda", secure=False, token="SECRET", timeout=30
+    )
+    data = influxdb_client.query_table("topic", 1000, 2000, fields=["status"])
+
+    assert list(data.keys()) == ["time", "status", "value", "label"]
+    assert data["time"].tolist() == [
+        1640995200000000000,
+        1640995201000000000,
+        1640995202000000000,
+    ]
+    assert data["status"].dtype == np.float64
+    np.testing.assert_equal(data["status"], [0.0, 512.0, np.nan])
+    np.testing.assert_equal(data["value"], [1.5, np.nan, np.nan])
+    assert data["label"].tolist() == ["", "", "ok"]
+
+    assert query_api.query_raw.call_args.args == (
+        'from(bucket:"data") |> range(start:1000, stop: 2000) |> '
+        'filter(fn: (r) => r._measurement == "topic" and ( r._field == "status")) '
+        '|> pivot(rowKey: ["_time"], columnKey: ["_field"], valueColumn: "_value")',
+    )
+
+
+def test__query_columns_aggregated(raw_response, query_api):
+    """Should aggregate values in InfluxDB"""
+    query_api.query_raw.return_value = raw_response
+    influxdb_client = InfluxDBClient(
+        "http://localhost:8086", org="panda", secure=False, token="SECRET", timeout=30
+    )
+    influxdb_client.query_columns("topic", 1000, 2000, every="1m", fn="max")
+
+    assert query_api.query_raw.call_args.args == (
+        'from(bucket:"data") |> range(start:1000, stop: 2000) |> '
+        'filter(fn: (r) => r._measurement == "topic" ) '
+        "|> aggregateWindow(every: 1m, fn: max, createEmpty: false)",
+    )
+
+
+def test__query_table_with_many_aggregates(raw_response, query_api):
+    """Should aggregate values with a few functions and add suffixes to fields"""
+    query_api.query_raw.return_value = raw_response
+    influxdb_client = InfluxDBClient(
+        "http://localhost:8086", org="panda", secure=False, token="SECRET", timeout=30
+    )
+    influxdb_client.query_table("topic", 1000, 2000, every="1h30m", fn=["min", "max"])
+
+    assert query_api.query_raw.call_args.args == (
+        'data = from(bucket:"data") |> range(start:1000, stop: 2000) |> '
+        'filter(fn: (r) => r._measurement == "topic" )\n'
+        "union(tables: ["
+        "data |> aggregateWindow(every: 1h30m, fn: min, createEmpty: false) "
+        '|> map(fn: (r) => ({r with _field: r._field + "_min"})), '
+        "data |> aggregateWindow(every: 1h30m, fn: max, createEmpty: false) "
+        '|> map(fn: (r) => ({r with _field: r._field + "_max"}))]) '
+        '|> pivot(rowKey: ["_time"], columnKey: ["_field"], valueColumn: "_value")',
+    )
+
+
+@pytest.mark.parametrize("every, func", [("1 m", "mean"), ("1m", "avg")])
+@pytest.mark.usefixtures("query_api")
+def test__query_invalid_aggregation(every, func):
+    """Should check window and aggregate function before query"""
+    influxdb_client = InfluxDBClient(
+        "http://localhost:8086", org="panda", secure=False, token="SECRET", timeout=30
+    )
+    with pytest.raises(ValueError):
+        influxdb_client.query_columns("topic", 1000, 2000, every=every, fn=func)
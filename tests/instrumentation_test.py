@@ -0,0 +1,70 @@
+"""Tests for instrumentation"""
+
+import math
+import threading
+
+import pytest
+
+from drift_client.instrumentation import Histogram, Stats
+
+
+def test__histogram():
+    """should keep count, sum, extremes and estimate quantiles"""
+    hist = Histogram()
+    assert math.isnan(hist.quantile(0.5))
+    assert math.isnan(hist.mean)
+
+    for value in range(1, 101):
+        hist.add(value / 1000)
+
+    assert hist.count == 100
+    assert hist.mean == pytest.approx(0.0505)
+    assert hist.min == 0.001
+    assert hist.max == 0.1
+    assert hist.quantile(0.5) == pytest.approx(0.05, rel=0.19)
+    assert hist.quantile(0.99) == pytest.approx(0.099, rel=0.19)
+    assert hist.quantile(1.0) == 0.1
+    assert hist.quantile(0.0) == 0.001
+
+
+def test__histogram_zero():
+    """should count zero values"""
+    hist = Histogram()
+    hist.add(0)
+    hist.add(0)
+    assert hist.quantile(0.5) == 0
+
+    for _ in range(3):
+        hist.add(1.1)
+    assert hist.underflow == 2
+    assert hist.quantile(0.4) == 0
+    assert hist.quantile(0.5) == pytest.approx(1.1)
+    assert hist.copy().underflow == 2
+
+
+def test__stats():
+    """should collect values from many threads per source and metric"""
+    stats = Stats()
+
+    def report():
+        for _ in range(1000):
+            stats("reductstore", "bytes", 100)
+            stats("influxdb", "request_seconds", 0.01)
+
+    threads = [threading.Thread(target=report) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    snapshot = stats.snapshot()
+    assert snapshot[("reductstore", "bytes")].count == 4000
+    assert snapshot[("reductstore", "bytes")].total == 400_000
+    assert snapshot[("influxdb", "request_seconds")].max == 0.01
+
+    report_lines = stats.report()
+    assert report_lines[0].startswith("influxdb request_seconds: count=4000")
+    assert report_lines[1].startswith("reductstore bytes: count=4000 mean=100")
+
+    stats.reset()
+    assert not stats.snapshot()
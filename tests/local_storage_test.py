@@ -0,0 +1,177 @@
+"""Tests for local archive"""
+
+import math
+from typing import List
+
+import numpy as np
+import pytest
+
+from drift_client.error import DriftClientError
+from drift_client.local_storage import (
+    LocalMetricsClient,
+    LocalStorageClient,
+    list_topics,
+    save_metrics,
+)
+from drift_client.pack import PackWriter
+from benchmarks.builders import make_package
+
+SECOND = 1_000_000_000
+
+
+@pytest.fixture(name="blobs")
+def _make_blobs() -> List[bytes]:
+    return [
+        make_package(idx, 1000 + idx * 1000).SerializeToString() for idx in range(4)
+    ]
+
+
+@pytest.fixture(name="archive")
+def _make_archive(tmp_path, blobs) -> str:
+    with PackWriter(tmp_path / "packed.pack") as writer:
+        writer.extend(blobs)
+
+    directory = tmp_path / "files"
+    directory.mkdir()
+    for idx, blob in enumerate(blobs):
+        (directory / f"{1000 + idx * 1000}.dp").write_bytes(blob)
+
+    save_metrics(
+        tmp_path,
+        "packed",
+        {
+            "time": np.array([1, 2, 3, 4]) * SECOND,
+            "status": np.array([0.0, 0.0, 1.0, 0.0]),
+            "value": np.array([1.0, math.nan, 3.0, 5.0]),
+        },
+    )
+    return tmp_path
+
+
+def test__list_topics(archive):
+    """should list topics with packages or metrics"""
+    assert list_topics(archive) == ["files", "packed"]
+
+
+@pytest.mark.parametrize("topic", ["packed", "files"])
+def test__walk(archive, blobs, topic):
+    """should walk through packages in time range"""
+    storage = LocalStorageClient(archive)
+    assert [bytes(blob) for blob in storage.walk(topic, 2, 4)] == blobs[1:3]
+    assert not list(storage.walk(topic, 10, 20))
+    storage.close()
+
+
+@pytest.mark.parametrize("topic", ["packed", "files"])
+def test__fetch_data(archive, blobs, topic):
+    """should read package by name"""
+    storage = LocalStorageClient(archive)
+    assert bytes(storage.fetch_data(f"{topic}/3000.dp")) == blobs[2]
+    assert [
+        bytes(blob)
+        for blob in storage.fetch_many([f"{topic}/4000.dp", f"{topic}/1000.dp"], 8)
+    ] == [blobs[3], blobs[0]]
+
+    with pytest.raises(DriftClientError, match="Could not read item"):
+        storage.fetch_data(f"{topic}/1500.dp")
+
+
+@pytest.mark.parametrize("path", ["unknown/1000.dp", "packed/1000.txt", "../1.dp"])
+def test__fetch_invalid_path(archive, path):
+    """should raise error if package isn't in archive"""
+    with pytest.raises(DriftClientError, match="Could not read item"):
+        LocalStorageClient(archive).fetch_data(path)
+
+
+def test__walk_unknown_topic(archive):
+    """should raise error if topic isn't in archive"""
+    with pytest.raises(DriftClientError, match="Failed to fetch data from unknown"):
+        list(LocalStorageClient(archive).walk("unknown", 0, 10))
+
+
+def test__check_package_list(archive):
+    """should keep only packages in archive"""
+    storage = LocalStorageClient(archive)
+    names = ["packed/1000.dp", "packed/1500.dp", "files/2000.dp", "other/1000.dp"]
+    assert storage.check_package_list(names) == ["packed/1000.dp", "files/2000.dp"]
+
+
+def test__query_table(archive):
+    """should read metrics in time range"""
+    metrics = LocalMetricsClient(archive)
+    table = metrics.query_table("packed", 2, 4)
+    assert table["time"].dtype == np.int64
+    assert table["time"].tolist() == [2 * SECOND, 3 * SECOND]
+    assert table["status"].tolist() == [0.0, 1.0]
+    assert math.isnan(table["value"][0])
+
+    assert list(metrics.query_table("packed", 1, 5, fields="value")) == [
+        "time",
+        "value",
+    ]
+    assert not metrics.query_table("files", 1, 5)
+
+
+def test__query_columns(archive):
+    """should read metrics without missing values"""
+    columns = LocalMetricsClient(archive).query_columns("packed", 1, 5)
+    times, values = columns["value"]
+    assert times.tolist() == [1 * SECOND, 3 * SECOND, 4 * SECOND]
+    assert values.tolist() == [1.0, 3.0, 5.0]
+    assert len(columns["status"][0]) == 4
+
+
+def test__query_aggregated(archive):
+    """should aggregate metrics in windows with time of window end"""
+    metrics = LocalMetricsClient(archive)
+    columns = metrics.query_columns("packed", 1, 5, fields="value", every="2s")
+    times, values = columns["value"]
+    assert times.tolist() == [2 * SECOND, 4 * SECOND, 5 * SECOND]
+    assert values.tolist() == [1.0, 3.0, 5.0]
+
+    table = metrics.query_table("packed", 0, 5, every="4s", fn=["max", "count"])
+    assert table["time"].tolist() == [4 * SECOND, 5 * SECOND]
+    assert table["value_max"].tolist() == [3.0, 5.0]
+    assert table["status_count"].tolist() == [3, 1]
+
+    with pytest.raises(ValueError):
+        metrics.query_columns("packed", 1, 5, every="2s", fn="unknown")
+    with pytest.raises(ValueError):
+        metrics.query_columns("packed", 1, 5, every="2x")
+
+
+def test__save_metrics_merge(archive):
+    """should merge metrics and replace values with the same time"""
+    save_metrics(
+        archive,
+        "packed",
+        {
+            "time": np.array([4, 5]) * SECOND,
+            "value": np.array([6.0, 7.0]),
+            "unit": np.array(["mm", "cm"], dtype=object),
+        },
+    )
+
+    table = LocalMetricsClient(archive).query_table("packed", 0, 10)
+    assert table["time"].tolist() == [s * SECOND for s in range(1, 6)]
+    assert table["value"].tolist()[2:] == [3.0, 6.0, 7.0]
+    assert table["unit"].tolist() == ["", "", "", "mm", "cm"]
+    assert np.isnan(table["status"][3:]).tolist() == [True, True]
+
+
+def test__save_metrics_after_interrupt(archive):
+    """should remove stale directory and restore metrics of interrupted save"""
+    directory = archive / "packed.metrics"
+    stale = archive / ".packed.metrics.old"
+    stale.mkdir()
+    (stale / "time.npy").write_bytes(b"")
+
+    save_metrics(archive, "packed", {"time": np.array([5]) * SECOND})
+    assert not stale.exists()
+
+    directory.rename(stale)
+    save_metrics(archive, "packed", {"time": np.array([6]) * SECOND})
+    assert not stale.exists()
+
+    table = LocalMetricsClient(archive).query_table("packed", 0, 10)
+    assert table["time"].tolist() == [s * SECOND for s in range(1, 7)]
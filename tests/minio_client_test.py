@@ -1,5 +1,7 @@
 """Minio Client"""
 
+import time
+
 import pytest
 
 from minio.error import S3Error
@@ -34,3 +36,75 @@ def test__rasise_drift_error(_minio_client):
     client = MinIOClient("localhost:9000", "user", "password", secure=False)
     with pytest.raises(DriftClientError, match=f"Could not read item at {test_path}"):
         client.fetch_data(test_path)
+
+
+@pytest.fixture(name="minio_client")
+def _make_minio_client_with_data(mocker):
+    """fake client which returns path as data with a delay"""
+    client_klass = mocker.patch("drift_client.minio_client.Minio")
+    client = mocker.Mock()
+
+    def get_object(_bucket, path):
+        response = mocker.Mock()
+
+        def read():
+            time.sleep(0.05 / int(path))
+            return path.encode()
+
+        response.read = read
+        return response
+
+    client.get_object = mocker.Mock(side_effect=get_object)
+    client_klass.return_value = client
+
+    return client
+
+
+@pytest.mark.usefixtures("minio_client")
+def test__fetch_many_ordered():
+    """should fetch objects concurrently in order of paths"""
+    client = MinIOClient("localhost:9000", "user", "password", secure=False)
+    paths = [str(i) for i in range(1, 11)]
+
+    started = time.time()
+    assert list(client.fetch_many(paths, max_workers=10)) == [
+        path.encode() for path in paths
+    ]
+    assert time.time() - started < 0.1
+
+
+@pytest.mark.usefixtures("minio_client")
+def test__fetch_many_unordered():
+    """should fetch objects concurrently in order of completion"""
+    client = MinIOClient("localhost:9000", "user", "password", secure=False)
+    paths = ["1", "5"]
+
+    assert list(client.fetch_many(paths, max_workers=2, ordered=False)) == [
+        b"5",
+        b"1",
+    ]
+
+
+def test__fetch_many_limited_by_pool(mocker):
+    """should not run more requests than connections in the pool"""
+    client_klass = mocker.patch("drift_client.minio_client.Minio")
+    running = []
+    peak = []
+
+    def get_object(_bucket, path):
+        running.append(path)
+        peak.append(len(running))
+        time.sleep(0.01)
+        running.remove(path)
+        return mocker.Mock(read=mocker.Mock(return_value=path.encode()))
+
+    client_klass.return_value.get_object = mocker.Mock(side_effect=get_object)
+
+    client = MinIOClient(
+        "localhost:9000", "user", "password", secure=False, max_connections=4
+    )
+    paths = [str(i) for i in range(16)]
+    assert list(client.fetch_many(paths, max_workers=16)) == [
+        path.encode() for path in paths
+    ]
+    assert max(peak) <= 4
@@ -0,0 +1,122 @@
+"""Tests for MQTT client"""
+
+import pytest
+
+from drift_client.mqtt_client import MQTTClient, TopicTree
+
+
+@pytest.fixture(name="tree")
+def _make_tree() -> TopicTree:
+    tree = TopicTree()
+    for topic_filter in [
+        "a/b",
+        "a/+",
+        "a/#",
+        "+/b",
+        "#",
+        "a/+/c",
+        "$SYS/#",
+        "+/+",
+    ]:
+        tree.add(topic_filter, topic_filter)
+    return tree
+
+
+@pytest.mark.parametrize(
+    "topic, expected",
+    [
+        ("a/b", ["#", "a/#", "a/+", "a/b", "+/b", "+/+"]),
+        ("a", ["#", "a/#"]),
+        ("a/b/c", ["#", "a/#", "a/+/c"]),
+        ("ab", ["#"]),
+        ("x/b", ["#", "+/b", "+/+"]),
+        ("a/", ["#", "a/#", "a/+", "+/+"]),
+        ("$SYS/info", ["$SYS/#"]),
+    ],
+)
+def test__match_topic(tree, topic, expected):
+    """should match topic filters with MQTT wildcards"""
+    assert sorted(tree.match(topic)) == sorted(expected)
+
+
+@pytest.mark.parametrize("topic_filter", ["a/#/b", "a/b#", "a+/b", "#/"])
+def test__invalid_filter(topic_filter):
+    """should raise error for invalid filter"""
+    with pytest.raises(ValueError):
+        TopicTree().add(topic_filter, None)
+
+
+def test__remove_filter(tree):
+    """should remove values and empty branches"""
+    assert tree.remove("a/+/c", "a/+/c")
+    assert not tree.remove("a/+/c", "a/+/c")
+    assert not tree.remove("x/y", "x/y")
+    assert tree.match("a/b/c") == ["#", "a/#"]
+
+
+def test__route_messages(mocker):
+    """should call handlers of matching subscriptions only"""
+    mocker.patch("drift_client.mqtt_client.mqtt.Client")
+    client = MQTTClient("mqtt://localhost:1883")
+
+    handler_1 = mocker.Mock()
+    handler_2 = mocker.Mock(side_effect=RuntimeError("test"))
+    client.subscribe("sensor/+/temp", handler_1)
+    client.subscribe("sensor", handler_2)
+
+    message = mocker.Mock(topic="sensor/1/temp")
+    client.on_message(None, None, message)
+    client.on_message(None, None, mocker.Mock(topic="sensor"))
+    client.on_message(None, None, mocker.Mock(topic="sensor_2/1/temp"))
+
+    handler_1.assert_called_once_with(message)
+    handler_2.assert_called_once()
+
+
+def test__unsubscribe(mocker):
+    """should unsubscribe topic on broker when its last subscription is removed"""
+    mqtt_klass = mocker.patch("drift_client.mqtt_client.mqtt.Client")
+    mqtt_klass.return_value.is_connected.return_value = True
+    client = MQTTClient("mqtt://localhost:1883")
+
+    handler = mocker.Mock()
+    sub_1 = client.subscribe("sensor/#", handler)
+    sub_2 = client.subscribe("sensor/#", handler)
+
+    client.unsubscribe(sub_1)
+    mqtt_klass.return_value.unsubscribe.assert_not_called()
+    client.on_message(None, None, mocker.Mock(topic="sensor/1"))
+    handler.assert_called_once()
+
+    client.unsubscribe(sub_2)
+    client.unsubscribe(sub_2)
+    mqtt_klass.return_value.unsubscribe.assert_called_once_with("sensor/#")
+    client.on_message(None, None, mocker.Mock(topic="sensor/1"))
+    handler.assert_called_once()
+
+
+def test__instrumented_messages(mocker):
+    """should report size of messages and time of handlers"""
+    mocker.patch("drift_client.mqtt_client.mqtt.Client")
+    client = MQTTClient("mqtt://localhost:1883")
+    hook = mocker.Mock()
+    client.instrument(hook)
+    client.subscribe("sensor/#", mocker.Mock())
+
+    client.on_message(None, None, mocker.Mock(topic="sensor/1", payload=b"data"))
+    assert [call.args[:2] for call in hook.call_args_list] == [
+        ("mqtt", "bytes"),
+        ("mqtt", "handler_seconds"),
+    ]
+    assert hook.call_args_list[0].args[2] == 4
+
+
+def test__max_inflight_messages(mocker):
+    """should keep maximal number of messages in flight to restore it later"""
+    mqtt_klass = mocker.patch("drift_client.mqtt_client.mqtt.Client")
+    client = MQTTClient("mqtt://localhost:1883")
+    assert client.max_inflight_messages == 20
+
+    client.max_inflight_messages_set(50)
+    assert client.max_inflight_messages == 50
+    mqtt_klass.return_value.max_inflight_messages_set.assert_called_once_with(50)
@@ -0,0 +1,117 @@
+"""Tests for pack files"""
+
+from typing import List
+
+import numpy as np
+import pytest
+
+from drift_client import DriftDataPackage
+from drift_client.pack import PackReader, PackWriter, index_path
+from benchmarks.builders import make_signal_blob
+
+
+def _make_blob(package_id: int, timestamp: int) -> bytes:
+    return make_signal_blob(
+        np.full(4, package_id, dtype=np.float32), timestamp, package_id
+    )
+
+
+@pytest.fixture(name="blobs")
+def _make_blobs() -> List[bytes]:
+    # out of order and with the same timestamp
+    timestamps = [1000, 3000, 2000, 2000, 4500]
+    return [_make_blob(idx, ts) for idx, ts in enumerate(timestamps)]
+
+
+@pytest.fixture(name="pack_file")
+def _make_pack_file(tmp_path, blobs) -> str:
+    path = tmp_path / "topic.pack"
+    with PackWriter(path) as writer:
+        writer.append(blobs[0])
+        writer.extend(DriftDataPackage(blob) for blob in blobs[1:])
+    return path
+
+
+def test__find(pack_file, blobs):
+    """should find first package with timestamp"""
+    with PackReader(pack_file) as reader:
+        assert len(reader) == 5
+        assert reader.timestamps.tolist() == [1000, 2000, 2000, 3000, 4500]
+        assert bytes(reader.find(2.0)) == blobs[2]
+        assert bytes(reader.find(4.5)) == blobs[4]
+        assert reader.find(2.5) is None
+        assert reader.find(5.0) is None
+
+        pkg = reader.get(3.0)
+        assert pkg.package_id == 1
+        assert pkg.as_np().tolist() == [1, 1, 1, 1]
+        assert reader.get(0.5) is None
+
+
+def test__walk(pack_file):
+    """should iterate over packages in time range ordered by timestamp"""
+    with PackReader(pack_file) as reader:
+        packages = list(reader.walk(2.0, 4.5))
+        assert [pkg.package_id for pkg in packages] == [2, 3, 1]
+        assert isinstance(packages[0].blob, memoryview)
+        assert not list(reader.walk(5, 10))
+
+
+def test__append_to_existing(pack_file):
+    """should append packages to existing pack file"""
+    with PackWriter(pack_file) as writer:
+        assert len(writer) == 5
+        writer.append(_make_blob(5, 500))
+
+    with PackReader(pack_file) as reader:
+        assert reader.timestamps.tolist() == [500, 1000, 2000, 2000, 3000, 4500]
+        assert reader.get(0.5).package_id == 5
+
+
+def test__recover_after_crash(pack_file):
+    """should find records which aren't in index and drop truncated record"""
+    blob = _make_blob(5, 6000)
+    writer = PackWriter(pack_file)
+    writer.append(blob)
+    writer.append(_make_blob(6, 7000))
+    writer._file.flush()  # pylint: disable=protected-access
+    # simulate crash in the middle of the last record
+    with open(pack_file, "r+b") as file:
+        file.truncate(file.seek(0, 2) - 10)
+
+    with PackReader(pack_file) as reader:
+        assert reader.timestamps.tolist()[-1] == 6000
+        assert bytes(reader.find(6.0)) == blob
+
+    with PackWriter(pack_file) as writer:
+        assert len(writer) == 6
+        writer.append(_make_blob(7, 8000))
+
+    with PackReader(pack_file) as reader:
+        assert reader.timestamps.tolist()[-2:] == [6000, 8000]
+        assert reader.get(8.0).package_id == 7
+
+
+def test__without_index(pack_file):
+    """should scan pack file if index is missing"""
+    index_path(pack_file).unlink()
+    with PackReader(pack_file) as reader:
+        assert reader.timestamps.tolist() == [1000, 2000, 2000, 3000, 4500]
+
+
+def test__not_pack_file(tmp_path):
+    """should raise error if file isn't a pack file"""
+    path = tmp_path / "file.pack"
+    path.write_bytes(b"something else")
+    with pytest.raises(ValueError, match="isn't a pack file"):
+        PackReader(path)
+    with pytest.raises(ValueError, match="isn't a pack file"):
+        PackWriter(path)
+
+
+def test__close_with_packages_in_use(pack_file):
+    """should keep packages valid after reader is closed"""
+    reader = PackReader(pack_file)
+    pkg = reader.get(1.0)
+    reader.close()
+    assert pkg.as_np().tolist() == [0, 0, 0, 0]
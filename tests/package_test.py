@@ -6,6 +6,7 @@ from typing import Dict
 import numpy as np
 import pytest
 from google.protobuf.any_pb2 import Any  # pylint: disable=no-name-in-module)
+from google.protobuf.message import DecodeError
 
 from drift_bytes import Variant, OutputBuffer
 from drift_protocol.meta import TypedDataInfo, MetaInfo
@@ -135,3 +136,64 @@ def test__typed_data(typed_data_package, typed_data):
     """Should provide access to typed data"""
     pkg = DriftDataPackage(typed_data_package.SerializeToString())
     assert pkg.as_typed_data() == typed_data
+
+
+def test__lazy_parsing(good_package, buffer, signal):
+    """Should parse only header and payload on demand"""
+    pkg = DriftDataPackage(good_package.SerializeToString(), lazy=True)
+
+    assert pkg.package_id == good_package.id
+    assert pkg.status_code == StatusCode.GOOD
+    assert pkg.source_timestamp == good_package.source_timestamp.ToMilliseconds() / 1000
+    assert pkg.labels == {"key": "value"}
+
+    assert pkg.as_raw() == buffer.serialize()
+    assert pkg.as_buffer() == buffer
+    assert list(pkg.as_np()) == list(signal)
+
+
+def test__lazy_typed_data(typed_data_package, typed_data):
+    """Should provide access to typed data in lazy mode"""
+    pkg = DriftDataPackage(typed_data_package.SerializeToString(), lazy=True)
+    assert pkg.as_typed_data() == typed_data
+
+
+def test__lazy_parsing_broken(good_package):
+    """Should raise decode error for a truncated package"""
+    blob = good_package.SerializeToString()
+    with pytest.raises(DecodeError):
+        DriftDataPackage(blob[:-3], lazy=True)
+
+
+def test__zero_copy_payload(good_package, buffer):
+    """Should provide payload as a view into the blob"""
+    blob = good_package.SerializeToString()
+    pkg = DriftDataPackage(blob)
+
+    view = pkg.as_memoryview()
+    assert view.obj is blob
+    assert view == buffer.serialize()
+    assert pkg.as_raw(copy=False).obj is blob
+    assert isinstance(pkg.as_raw(), bytes)
+
+
+def test__no_payload():
+    """Should return None if no payload in the package"""
+    pkg = DriftPackage()
+    pkg.status = StatusCode.GOOD
+    pkg.id = 1
+
+    assert DriftDataPackage(pkg.SerializeToString()).as_raw() is None
+    assert DriftDataPackage(pkg.SerializeToString()).as_memoryview() is None
+
+
+def test__no_payload_decode():
+    """Should raise error if payload is decoded but there is no payload"""
+    pkg = DriftPackage()
+    pkg.status = StatusCode.GOOD
+    pkg.meta.type = MetaInfo.TYPED_DATA
+
+    with pytest.raises(ValueError, match="No data payload"):
+        DriftDataPackage(pkg.SerializeToString()).as_np()
+    with pytest.raises(ValueError, match="No data payload"):
+        DriftDataPackage(pkg.SerializeToString()).as_typed_data()
@@ -0,0 +1,37 @@
+"""Tests for concurrent pipelines"""
+
+import asyncio
+
+from drift_client.pipeline import amap_concurrently
+
+
+def test__amap_concurrently_ordered():
+    """should return results in the order of items"""
+
+    async def _double(item):
+        await asyncio.sleep(0.001 * (5 - item))
+        return item * 2
+
+    async def _test():
+        return [item async for item in amap_concurrently(_double, range(5), 3)]
+
+    assert asyncio.run(_test()) == [0, 2, 4, 6, 8]
+
+
+def test__amap_concurrently_stop():
+    """should cancel and await pending tasks if iteration is stopped"""
+    tasks = []
+
+    async def _wait(item):
+        tasks.append(asyncio.current_task())
+        await asyncio.sleep(0 if item == 0 else 10)
+        return item
+
+    async def _test():
+        results = amap_concurrently(_wait, range(10), 4)
+        async for _ in results:
+            break
+        await results.aclose()
+        return [task.done() for task in tasks]
+
+    assert asyncio.run(_test()) == [True] * 4
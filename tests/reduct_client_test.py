@@ -1,5 +1,8 @@
 """Reduct Storage Client"""
 
+import asyncio
+import threading
+import time
 from typing import Optional, List, Any
 
 import pytest
@@ -26,9 +29,13 @@ def _make_bucket(mocker) -> Bucket:
     return bucket
 
 
+@pytest.fixture(name="client_klass")
+def _make_client_klass(mocker):
+    return mocker.patch("drift_client.reduct_client.Client")
+
+
 @pytest.fixture(name="reduct_client")
-def _make_reduct_client(mocker, bucket):
-    client_klass = mocker.patch("drift_client.reduct_client.Client")
+def _make_reduct_client(mocker, bucket, client_klass):
     client = mocker.Mock(spec=Client)
     client.info.return_value = ServerInfo(
         version="1.0.0",
@@ -54,7 +61,9 @@ def test__check_server_available():
 @pytest.fixture(name="drift_client")
 def _make_drift_client(reduct_client):
     _ = reduct_client
-    return ReductStoreClient("http://localhost:8383", "password", 30)
+    client = ReductStoreClient("http://localhost:8383", "password", 30)
+    yield client
+    client.close()
 
 
 def test__check_packages_names_available(bucket, drift_client):
@@ -76,6 +85,47 @@ def test__check_packages_names_available(bucket, drift_client):
     assert drift_client.check_package_list(["unknown/3.dp", "unknown/4.dp"]) == []
 
 
+def test__check_packages_of_many_entries(bucket, drift_client):
+    """should filter packages of each entry and sort them by timestamp"""
+    bucket.get_entry_list.return_value = [
+        EntryInfo(
+            name=name,
+            size=100,
+            block_count=1,
+            record_count=1,
+            oldest_record=2000,
+            latest_record=3000,
+        )
+        for name in ("topic_1", "topic_2")
+    ]
+
+    assert drift_client.check_package_list(
+        ["topic_2/3.dp", "topic_1/4.dp", "topic_1/2.dp", "unknown/2.dp", "topic_2/1.dp"]
+    ) == ["topic_2/3.dp", "topic_1/2.dp"]
+
+
+def test__cache_entry_list(reduct_client, bucket):
+    """should reuse list of entries until it expires"""
+    _ = reduct_client
+    bucket.get_entry_list.return_value = []
+
+    client = ReductStoreClient(
+        "http://localhost:8383", "password", 30, entry_list_ttl=60
+    )
+    client.check_package_list(["topic/1.dp"])
+    client.check_package_list(["topic/2.dp"])
+    client.close()
+    assert bucket.get_entry_list.call_count == 1
+
+    client = ReductStoreClient(
+        "http://localhost:8383", "password", 30, entry_list_ttl=0
+    )
+    client.check_package_list(["topic/1.dp"])
+    client.check_package_list(["topic/2.dp"])
+    client.close()
+    assert bucket.get_entry_list.call_count == 3
+
+
 def test__fetch_package(mocker, bucket, drift_client):
     """should fetch package from reduct storage"""
 
@@ -129,6 +179,26 @@ def test__walk_records(bucket, drift_client):
     bucket.query.assert_called_with("topic", 0, 1000_000, ttl=60)
 
 
+def test__walk_instrumented(mocker, bucket, drift_client):
+    """should report time and size of each record"""
+
+    async def _iter():
+        for item in [b"1", b"22"]:
+            yield _Rec(item)
+
+    bucket.query.return_value = _iter()
+    hook = mocker.Mock()
+    drift_client.instrument(hook)
+    assert list(drift_client.walk("topic", 0, 1)) == [b"1", b"22"]
+
+    calls = [call.args for call in hook.call_args_list]
+    assert [call[:2] for call in calls] == [
+        ("reductstore", "request_seconds"),
+        ("reductstore", "bytes"),
+    ] * 2
+    assert [call[2] for call in calls if call[1] == "bytes"] == [1, 2]
+
+
 def test__walk_with_error(bucket, drift_client):
     """should raise error if failed to walk records"""
 
@@ -150,3 +220,205 @@ def test__walk_with_ttl(bucket, drift_client):
     bucket.query.return_value = _iter()
     list(drift_client.walk("topic", 0, 1, ttl=10))
     bucket.query.assert_called_with("topic", 0, 1000_000, ttl=10)
+
+
+def test__walk_with_prefetch(bucket, drift_client):
+    """should read records ahead in background"""
+
+    items = [b"1", b"2", b"3", b"4", b"5"]
+    read = []
+    ahead = threading.Event()
+
+    async def _iter():
+        for item in items:
+            read.append(item)
+            if len(read) == 4:
+                ahead.set()
+            yield _Rec(item)
+
+    bucket.query.return_value = _iter()
+
+    walk = drift_client.walk("topic", 0, 1, prefetch=2)
+    assert next(walk) == b"1"
+    assert ahead.wait(timeout=5)
+    assert len(read) == 4  # 1 consumed, 2 in queue, 1 waiting for free slot
+
+    assert list(walk) == items[1:]
+
+
+def test__walk_with_prefetch_starts_query(bucket, drift_client):
+    """should send query before the first record is requested"""
+
+    read = []
+    ahead = threading.Event()
+
+    async def _iter():
+        for item in [b"1", b"2"]:
+            read.append(item)
+            yield _Rec(item)
+        ahead.set()
+
+    bucket.query.return_value = _iter()
+
+    walk = drift_client.walk("topic", 0, 1, prefetch=2)
+    assert ahead.wait(timeout=5)
+    assert read == [b"1", b"2"]
+    assert list(walk) == [b"1", b"2"]
+
+
+def test__walk_with_shards(bucket, drift_client):
+    """should query sub-ranges concurrently and return records in order"""
+
+    started = []
+    all_started = threading.Event()
+
+    async def _query(_entry, start, stop, **_kwargs):
+        started.append(start)
+        if len(started) == 3:
+            all_started.set()
+        for timestamp in range(start, stop, 250_000):
+            await asyncio.sleep(0.001)
+            yield _Rec(str(timestamp).encode())
+
+    bucket.query.side_effect = _query
+
+    walk = drift_client.walk("topic", 0, 3, shards=3)
+    assert all_started.wait(timeout=5)
+    assert [call.args[1:] for call in bucket.query.call_args_list] == [
+        (0, 1000_000),
+        (1000_000, 2000_000),
+        (2000_000, 3000_000),
+    ]
+    assert list(walk) == [str(ts).encode() for ts in range(0, 3000_000, 250_000)]
+
+
+def test__walk_with_shards_overlap(bucket, drift_client):
+    """should keep all shards busy with small sub-ranges"""
+    bucket.get_entry_list.return_value = [
+        EntryInfo(
+            name="topic",
+            size=100,
+            block_count=1,
+            record_count=64,
+            oldest_record=0,
+            latest_record=3999_999,
+        )
+    ]
+    running = []
+    peak = []
+
+    async def _query(_entry, start, stop, **_kwargs):
+        running.append(start)
+        peak.append(len(running))
+        try:
+            for timestamp in range(start, stop, 62_500):
+                await asyncio.sleep(0.005)
+                yield _Rec(str(timestamp).encode())
+        finally:
+            running.remove(start)
+
+    bucket.query.side_effect = _query
+
+    records = list(drift_client.walk("topic", 0, 4, shards=4, shard_records=4))
+
+    assert records == [str(ts).encode() for ts in range(0, 4000_000, 62_500)]
+    assert bucket.query.call_count == 16
+    assert max(peak) == 4
+
+
+def test__walk_with_shards_error(bucket, drift_client):
+    """should raise error of a shard"""
+
+    async def _query(_entry, start, _stop, **_kwargs):
+        if start > 0:
+            raise ReductError(400, "test")
+        yield _Rec(b"1")
+
+    bucket.query.side_effect = _query
+
+    walk = drift_client.walk("topic", 0, 2, shards=2)
+    assert next(walk) == b"1"
+    with pytest.raises(DriftClientError):
+        next(walk)
+
+
+def test__walk_with_prefetch_error(bucket, drift_client):
+    """should raise error of prefetched walk"""
+
+    async def _iter():
+        yield _Rec(b"1")
+        raise ReductError(400, "test")
+
+    bucket.query.return_value = _iter()
+    with pytest.raises(DriftClientError):
+        list(drift_client.walk("topic", 0, 1, prefetch=10))
+
+
+def test__walk_with_prefetch_stop(bucket, drift_client):
+    """should stop reading ahead if walk is closed"""
+
+    read = []
+
+    async def _iter():
+        for idx in range(1000):
+            read.append(idx)
+            yield _Rec(str(idx).encode())
+
+    bucket.query.return_value = _iter()
+    walk = drift_client.walk("topic", 0, 1, prefetch=10)
+    assert next(walk) == b"0"
+    walk.close()
+
+    time.sleep(0.1)
+    assert len(read) < 20
+
+
+def test__fetch_many(mocker, bucket, drift_client):
+    """should fetch packages concurrently"""
+
+    def read(_entry, timestamp):
+        ctx = mocker.MagicMock()
+        ctx.__aenter__.return_value = _Rec(str(timestamp).encode())
+        return ctx
+
+    bucket.read.side_effect = read
+
+    paths = [f"topic/{i}.dp" for i in range(1, 20)]
+    assert list(drift_client.fetch_many(paths, max_workers=4)) == [
+        str(i * 1000).encode() for i in range(1, 20)
+    ]
+
+
+def test__reuse_bucket_and_session(
+    mocker, client_klass, reduct_client, bucket, drift_client
+):
+    """should resolve bucket once and keep one session for all requests"""
+    ctx = mocker.MagicMock()
+    ctx.__aenter__.return_value = _Rec(b"test")
+    bucket.read.return_value = ctx
+
+    for _ in range(3):
+        assert drift_client.fetch_data("topic/1.dp") == b"test"
+
+    reduct_client.get_bucket.assert_called_once()
+
+    client_klass.assert_called_once()
+    session = client_klass.call_args.kwargs["session"]
+    assert not session.closed
+    drift_client.close()
+    assert session.closed
+
+
+def test__refresh_bucket(mocker, reduct_client, bucket, drift_client):
+    """should resolve bucket again if it wasn't found"""
+    bucket.read.side_effect = ReductError(404, "Not found")
+    with pytest.raises(DriftClientError):
+        drift_client.fetch_data("topic/1.dp")
+
+    ctx = mocker.MagicMock()
+    ctx.__aenter__.return_value = _Rec(b"test")
+    bucket.read.side_effect = None
+    bucket.read.return_value = ctx
+
+    assert drift_client.fetch_data("topic/1.dp") == b"test"
+    assert reduct_client.get_bucket.call_count == 2